@@ -0,0 +1,142 @@
+"""
+Shared fixtures and reporting for the variable explorer benchmarks.
+
+Run with:
+    $ poetry run pytest benchmarks
+
+Each benchmark records the best wall-clock time (over a few repeats) and the peak traced memory
+of one stage for one namespace scenario. Results are written to `benchmarks/results.json` and
+compared against `benchmarks/baseline.json`; a benchmark fails if it regressed by more than
+the threshold. To accept the current numbers as the new baseline:
+    $ SIDECAR_BENCH_UPDATE_BASELINE=1 poetry run pytest benchmarks
+
+Environment variables:
+ - SIDECAR_BENCH_SCALE: multiplier for scenario sizes (default 1.0; use e.g. 0.01 for a smoke run)
+ - SIDECAR_BENCH_THRESHOLD: allowed relative regression before failing (default 0.5, i.e. +50%)
+ - SIDECAR_BENCH_REPEAT: number of timed runs per benchmark (default 3)
+ - SIDECAR_BENCH_UPDATE_BASELINE: set to 1 to overwrite the baseline with this run's results
+"""
+import json
+import os
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import pytest
+from IPython.core.interactiveshell import InteractiveShell
+
+from sidecar_comms.shell import Shell
+
+BENCHMARK_DIR = Path(__file__).parent
+BASELINE_PATH = BENCHMARK_DIR / "baseline.json"
+RESULTS_PATH = BENCHMARK_DIR / "results.json"
+
+SCALE = float(os.environ.get("SIDECAR_BENCH_SCALE", "1"))
+REGRESSION_THRESHOLD = float(os.environ.get("SIDECAR_BENCH_THRESHOLD", "0.5"))
+REPEAT = int(os.environ.get("SIDECAR_BENCH_REPEAT", "3"))
+UPDATE_BASELINE = os.environ.get("SIDECAR_BENCH_UPDATE_BASELINE") == "1"
+
+# differences below these are treated as noise
+MIN_REGRESSION_SECONDS = 0.005
+MIN_REGRESSION_BYTES = 1_000_000
+
+
+def scaled(n: int) -> int:
+    return max(int(n * SCALE), 1)
+
+
+class BenchmarkRecorder:
+    def __init__(self, baseline: Dict[str, dict]):
+        self.baseline = baseline
+        self.results: Dict[str, dict] = {}
+
+    def measure(self, key: str, fn: Callable[[], object], repeat: int = REPEAT) -> dict:
+        """Times `fn` (best of `repeat` runs), then runs it once more under tracemalloc
+        to record its peak memory usage, which is kept out of the timed runs.
+        """
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        try:
+            fn()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        result = {"seconds": min(timings), "peak_bytes": peak, "scale": SCALE}
+        self.results[key] = result
+        return result
+
+    def regression(self, key: str) -> Optional[str]:
+        """Returns a description of any regression against the baseline for `key`."""
+        result = self.results[key]
+        baseline = self.baseline.get(key)
+        if UPDATE_BASELINE or baseline is None or baseline.get("scale") != SCALE:
+            return
+
+        problems = []
+        max_seconds = baseline["seconds"] * (1 + REGRESSION_THRESHOLD)
+        if (
+            result["seconds"] > max_seconds
+            and result["seconds"] - baseline["seconds"] > MIN_REGRESSION_SECONDS
+        ):
+            problems.append(f"time {result['seconds']:.4f}s vs baseline {baseline['seconds']:.4f}s")
+        max_bytes = baseline["peak_bytes"] * (1 + REGRESSION_THRESHOLD)
+        if (
+            result["peak_bytes"] > max_bytes
+            and result["peak_bytes"] - baseline["peak_bytes"] > MIN_REGRESSION_BYTES
+        ):
+            problems.append(
+                f"peak memory {result['peak_bytes']:,}B vs baseline {baseline['peak_bytes']:,}B"
+            )
+        if problems:
+            return f"{key} regressed: " + ", ".join(problems)
+
+
+_recorder: Optional[BenchmarkRecorder] = None
+
+
+@pytest.fixture(scope="session")
+def recorder() -> BenchmarkRecorder:
+    global _recorder
+    baseline = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+    _recorder = BenchmarkRecorder(baseline)
+    return _recorder
+
+
+@pytest.fixture(scope="session", autouse=True)
+def tmp_ipython() -> InteractiveShell:
+    test_shell = InteractiveShell.instance()
+    Shell()._instance = test_shell
+    yield test_shell
+    Shell()._instance = None
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if _recorder is None or not _recorder.results:
+        return
+    RESULTS_PATH.write_text(json.dumps(_recorder.results, indent=2, sort_keys=True))
+    if UPDATE_BASELINE:
+        baseline = {**_recorder.baseline, **_recorder.results}
+        BASELINE_PATH.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus, config):
+    if _recorder is None or not _recorder.results:
+        return
+    terminalreporter.section("variable explorer benchmarks")
+    terminalreporter.write_line(
+        f"{'benchmark':<45} {'seconds':>10} {'baseline':>10} {'peak MB':>9}"
+    )
+    for key, result in sorted(_recorder.results.items()):
+        baseline = _recorder.baseline.get(key, {}).get("seconds")
+        baseline = f"{baseline:.4f}" if baseline is not None else "-"
+        terminalreporter.write_line(
+            f"{key:<45} {result['seconds']:>10.4f} {baseline:>10} "
+            f"{result['peak_bytes'] / 1e6:>9.1f}"
+        )
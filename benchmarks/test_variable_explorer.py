@@ -0,0 +1,176 @@
+"""
+Benchmarks for the variable explorer hot path.
+
+Each scenario builds a realistic namespace, and each stage of building a variable explorer
+snapshot is timed separately:
+ - get_kernel_variables: the full snapshot, as sent to the sidecar
+ - variable_to_model: inspecting every variable into a VariableModel
+ - json_clean: cleaning the resulting models for sending
+"""
+import time
+from typing import Callable, Dict
+
+import modin.pandas as mpd
+import numpy as np
+import pandas as pd
+import polars as pl
+import pytest
+
+from benchmarks.conftest import BenchmarkRecorder, scaled
+from sidecar_comms.handlers.memory import MemoryEstimator
+from sidecar_comms.handlers.variable_explorer import (
+    get_kernel_variables,
+    json_clean,
+    variable_to_model,
+)
+from sidecar_comms.shell import get_ipython_shell
+
+
+class SlowRepr(dict):
+    """A (JSON-safe) mapping that is expensive to repr, like a lazily loaded config.
+
+    It's large enough that its sample value is truncated, which is when it gets repr'd.
+    """
+
+    def __init__(self, i: int):
+        super().__init__({f"key_{key}": key for key in range(100)})
+        self.i = i
+
+    def __repr__(self):
+        time.sleep(0.01)
+        return f"SlowRepr({self.i})"
+
+
+class SlowLen:
+    """An object that is expensive to size, like a lazy remote table."""
+
+    def __init__(self, i: int):
+        self.i = i
+
+    def __len__(self):
+        time.sleep(0.01)
+        return self.i
+
+
+def scalars() -> dict:
+    n = scaled(10_000)
+    namespace = {}
+    for i in range(n):
+        kind = i % 3
+        if kind == 0:
+            namespace[f"int_{i}"] = i
+        elif kind == 1:
+            namespace[f"float_{i}"] = i / 3
+        else:
+            namespace[f"str_{i}"] = f"value {i}"
+    return namespace
+
+
+def nested() -> dict:
+    def build(depth: int, width: int):
+        if depth == 0:
+            return list(range(width))
+        return {f"key_{i}": [build(depth - 1, width), i] for i in range(width)}
+
+    return {f"nested_{i}": build(depth=4, width=6) for i in range(scaled(20))}
+
+
+def frame_data() -> dict:
+    rows = scaled(1_000_000)
+    return {
+        "ints": np.arange(rows),
+        "floats": np.random.default_rng(0).random(rows),
+        "strings": np.array(["a", "b", "c", "d"])[np.arange(rows) % 4],
+    }
+
+
+def pandas_frames() -> dict:
+    return {"pandas_df": pd.DataFrame(frame_data())}
+
+
+def polars_frames() -> dict:
+    return {"polars_df": pl.DataFrame(frame_data())}
+
+
+def modin_frames() -> dict:
+    return {"modin_df": mpd.DataFrame(frame_data())}
+
+
+def numpy_arrays() -> dict:
+    rows = scaled(1_000_000)
+    return {
+        "array_1d": np.arange(rows, dtype="float64"),
+        "array_2d": np.zeros((max(rows // 100, 1), 100)),
+        "array_view": np.arange(rows)[::2],
+    }
+
+
+def slow_reprs() -> dict:
+    namespace = {f"slow_repr_{i}": SlowRepr(i) for i in range(scaled(25))}
+    namespace.update({f"slow_len_{i}": SlowLen(i) for i in range(scaled(25))})
+    return namespace
+
+
+SCENARIOS: Dict[str, Callable[[], dict]] = {
+    "scalars": scalars,
+    "nested": nested,
+    "pandas": pandas_frames,
+    "polars": polars_frames,
+    "modin": modin_frames,
+    "numpy": numpy_arrays,
+    "slow_repr": slow_reprs,
+}
+
+
+@pytest.fixture(scope="module", params=list(SCENARIOS))
+def scenario(request, tmp_ipython):
+    """Builds a scenario's namespace once and swaps it into the user namespace."""
+    namespace = SCENARIOS[request.param]()
+    shell = get_ipython_shell()
+    original_ns = dict(shell.user_ns)
+    # only keep the scenario variables (and the hidden IPython ones)
+    shell.user_ns.clear()
+    shell.user_ns.update({k: v for k, v in original_ns.items() if k.startswith("_")})
+    shell.user_ns.update(namespace)
+    yield request.param, namespace
+    shell.user_ns.clear()
+    shell.user_ns.update(original_ns)
+
+
+def check(recorder: BenchmarkRecorder, key: str) -> None:
+    if (regression := recorder.regression(key)) is not None:
+        pytest.fail(regression)
+
+
+def test_get_kernel_variables(scenario, recorder: BenchmarkRecorder):
+    name, namespace = scenario
+    variables = get_kernel_variables()
+    assert set(namespace) <= set(variables)
+
+    key = f"{name}.get_kernel_variables"
+    recorder.measure(key, get_kernel_variables)
+    check(recorder, key)
+
+
+def test_variable_to_model(scenario, recorder: BenchmarkRecorder):
+    name, namespace = scenario
+
+    def run():
+        estimator = MemoryEstimator()
+        return [variable_to_model(k, v, estimator=estimator) for k, v in namespace.items()]
+
+    key = f"{name}.variable_to_model"
+    recorder.measure(key, run)
+    check(recorder, key)
+
+
+def test_json_clean(scenario, recorder: BenchmarkRecorder):
+    name, namespace = scenario
+    models = [variable_to_model(k, v).dict() for k, v in namespace.items()]
+
+    def run():
+        return [json_clean(model) for model in models]
+
+    key = f"{name}.json_clean"
+    recorder.measure(key, run)
+    check(recorder, key)
@@ -1,7 +1,7 @@
 import nox
 import nox_poetry
 
-LINT_PATHS = ["src/sidecar_comms", "noxfile.py", "tests"]
+LINT_PATHS = ["src/sidecar_comms", "noxfile.py", "tests", "benchmarks"]
 
 nox.options.reuse_existing_virtualenv = True
 nox.options.sessions = ["lint", "test"]
@@ -13,6 +13,12 @@ def test(session: nox_poetry.Session):
     session.run("pytest", "-v", "--cov=src/sidecar_comms")
 
 
+@nox_poetry.session(python="3.8")
+def benchmark(session: nox_poetry.Session):
+    session.run_always("poetry", "install", external=True)
+    session.run("pytest", "benchmarks", *session.posargs)
+
+
 @nox_poetry.session(python="3.8")
 def lint(session: nox_poetry.Session):
     session.notify("black_check")
@@ -0,0 +1,191 @@
+"""
+Negotiated compression for outbound comm message bodies.
+
+When the sidecar opens the inbound comm, it can list the codecs it's able to decode in the
+comm open data:
+
+{"compression": {"codecs": ["zlib", "lzma"], "threshold": 32768, "bandwidth": 5000000}}
+
+The first codec we also support is used from then on, for both replies to inbound messages
+and messages sent through `SidecarComm`s. Message bodies whose encoded JSON is at least
+`threshold` bytes are compressed and sent as a binary buffer; the message itself keeps its
+envelope (handler, comm_id, ...) with a null body and a `compression` entry describing
+the buffer:
+
+{"handler": "get_kernel_variables", "body": None, ...,
+ "compression": {"codec": "zlib", "level": 6, "buffer": 0, "nbytes": 1048576}}
+
+The compression level is adapted per message: compressing is only worth it while it takes
+less time than sending the bytes it saves, so the time spent compressing is compared against
+the transfer time saved at the connection's `bandwidth` (bytes/second, which the sidecar can
+measure and report, see `configure_compression`), lowering the level when compressing costs
+more than it saves and raising it when it's comfortably cheaper.
+"""
+import bz2
+import lzma
+import time
+import zlib
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from jupyter_client.session import json_packer
+
+from sidecar_comms.serialization import BoundedJSONSerializer
+
+DEFAULT_COMPRESSION_THRESHOLD = 32_768  # bytes
+# how much larger than BoundedJSONSerializer's estimate the encoded body can be
+# (separators, string escapes and multi-byte UTF-8 characters aren't counted)
+ESTIMATE_MARGIN = 4
+DEFAULT_BANDWIDTH = 10_000_000  # bytes/second
+# raise the level while compressing takes less than this fraction of the transfer time saved
+RAISE_LEVEL_RATIO = 0.25
+
+
+class Codec(NamedTuple):
+    compress: Callable[[bytes, int], bytes]
+    min_level: int
+    max_level: int
+    default_level: int
+
+
+CODECS: Dict[str, Codec] = {
+    "zlib": Codec(lambda data, level: zlib.compress(data, level), 1, 9, 6),
+    "bz2": Codec(lambda data, level: bz2.compress(data, level), 1, 9, 9),
+    "lzma": Codec(lambda data, level: lzma.compress(data, preset=level), 0, 9, 6),
+}
+
+
+class CompressionPolicy:
+    def __init__(
+        self,
+        codec: Optional[str] = None,
+        threshold: int = DEFAULT_COMPRESSION_THRESHOLD,
+        bandwidth: float = DEFAULT_BANDWIDTH,
+    ):
+        self.codec: Optional[str] = None
+        self.level: Optional[int] = None
+        self.threshold = threshold
+        self.bandwidth = bandwidth
+        self.select(codec)
+
+    @property
+    def enabled(self) -> bool:
+        return self.codec is not None
+
+    def select(self, codec: Optional[str]) -> None:
+        if codec is not None and codec not in CODECS:
+            raise ValueError(f"unsupported compression codec: {codec}")
+        self.codec = codec
+        self.level = None if codec is None else CODECS[codec].default_level
+
+    def settings(self) -> dict:
+        return {
+            "codec": self.codec,
+            "level": self.level,
+            "threshold": self.threshold,
+            "bandwidth": self.bandwidth,
+            "supported": list(CODECS),
+        }
+
+    def negotiate(self, options: Optional[dict]) -> dict:
+        """Picks the first of the sidecar's codecs that we support (or disables compression
+        if there's none) and returns the resulting settings for the connect handshake."""
+        options = options or {}
+        codec = next((name for name in options.get("codecs", []) if name in CODECS), None)
+        self.select(codec)
+        self.configure(threshold=options.get("threshold"), bandwidth=options.get("bandwidth"))
+        return self.settings()
+
+    def configure(self, threshold: Optional[int] = None, bandwidth: Optional[float] = None) -> None:
+        if threshold is not None:
+            self.threshold = threshold
+        if bandwidth is not None and bandwidth > 0:
+            self.bandwidth = bandwidth
+
+    def compress(
+        self, data: dict, buffers: Optional[List[Any]] = None
+    ) -> Tuple[dict, Optional[List[Any]]]:
+        """Returns the message data and buffers to send, with the body compressed into
+        an additional buffer if compression is enabled and the body is large enough."""
+        if not self.enabled or not isinstance(data, dict) or not data.get("body"):
+            return data, buffers
+        if self._below_threshold(data["body"]):
+            # ipykernel encodes the body again when sending it, so small bodies are
+            # only estimated here rather than encoded twice
+            return data, buffers
+
+        raw = json_packer(data["body"])
+        if len(raw) < self.threshold:
+            return data, buffers
+
+        level = self.level
+        start = time.perf_counter()
+        compressed = CODECS[self.codec].compress(raw, level)
+        self._adapt_level(len(raw), len(compressed), time.perf_counter() - start)
+        if len(compressed) >= len(raw):
+            return data, buffers
+
+        buffers = list(buffers or [])
+        data = {
+            **data,
+            "body": None,
+            "compression": {
+                "codec": self.codec,
+                "level": level,
+                "buffer": len(buffers),
+                "nbytes": len(raw),
+            },
+        }
+        buffers.append(compressed)
+        return data, buffers
+
+    def _below_threshold(self, body: Any) -> bool:
+        """Returns True if a body is certainly smaller than the threshold once encoded,
+        without encoding it. Only walks about threshold / ESTIMATE_MARGIN bytes of the body."""
+        max_bytes = self.threshold // ESTIMATE_MARGIN
+        # json_packer encodes bytes/dates as strings, which str() sizes closely enough
+        serializer = BoundedJSONSerializer(max_items=None, max_bytes=max_bytes, default=str)
+        serializer.serialize(body)
+        return not serializer.truncated and serializer.nbytes < max_bytes
+
+    def _adapt_level(self, raw_size: int, compressed_size: int, elapsed: float) -> None:
+        codec = CODECS[self.codec]
+        saved = (raw_size - compressed_size) / self.bandwidth
+        if elapsed > saved and self.level > codec.min_level:
+            self.level -= 1
+        elif elapsed < saved * RAISE_LEVEL_RATIO and self.level < codec.max_level:
+            self.level += 1
+
+
+class CompressingComm:
+    """Wraps a Comm so that messages sent through it are compressed per the policy."""
+
+    def __init__(self, comm: Any, policy: CompressionPolicy):
+        self._comm = comm
+        self._policy = policy
+
+    def send(self, data: Optional[dict] = None, metadata=None, buffers=None) -> None:
+        data, buffers = self._policy.compress(data, buffers)
+        self._comm.send(data, metadata=metadata, buffers=buffers)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._comm, name)
+
+
+@lru_cache
+def compression_policy() -> CompressionPolicy:
+    return CompressionPolicy()
+
+
+def configure_compression(
+    codec: Optional[str] = None,
+    threshold: Optional[int] = None,
+    bandwidth: Optional[float] = None,
+) -> dict:
+    """Updates the compression settings; `codec` is only changed if provided."""
+    policy = compression_policy()
+    if codec is not None:
+        # an empty string turns compression off
+        policy.select(codec or None)
+    policy.configure(threshold=threshold, bandwidth=bandwidth)
+    return policy.settings()
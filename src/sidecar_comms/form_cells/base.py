@@ -26,16 +26,19 @@ model = pydantic.parse_obj_as(FormCell, {"input_type": "datetime", "value": "202
 model
 >>> Datetime(value=datetime.datetime(2021, 1, 1, 0, 0, tzinfo=datetime.timezone.utc))
 """
+import contextlib
 import enum
+import time
 import uuid
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Literal, Union
+from typing import Any, Dict, Iterator, List, Literal, Optional, Union
 
 from pydantic import Extra, Field, PrivateAttr, parse_obj_as, validator
 from typing_extensions import Annotated
 
 from sidecar_comms.form_cells.observable import Change, ObservableModel
 from sidecar_comms.handlers.variable_explorer import set_kernel_variable
+from sidecar_comms.metrics import comm_metrics
 from sidecar_comms.outbound import SidecarComm, comm_manager
 
 FORM_CELL_CACHE: Dict[str, "FormCellBase"] = {}
@@ -60,6 +63,9 @@ class FormCellBase(ObservableModel):
     """
 
     _comm: SidecarComm = PrivateAttr()
+    # nesting depth of `hold_sync()` blocks, and the last change made while holding
+    _sync_held: int = PrivateAttr(default=0)
+    _sync_pending: Optional[Change] = PrivateAttr(default=None)
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     label: str = ""
     model_variable_name: str = ""
@@ -76,9 +82,9 @@ class FormCellBase(ObservableModel):
         self._comm = comm_manager().open_comm("form_cells")
         FORM_CELL_CACHE[self.id] = self
 
-        self.observe(self._sync_sidecar)
+        self.observe(self._observed_sync_sidecar)
         self.observe(self._on_value_update, names=["value"])
-        self.settings.observe(self._sync_sidecar)
+        self.settings.observe(self._observed_sync_sidecar)
 
         # make sure the value variable is available on init
         self.value_variable_name = (
@@ -96,6 +102,35 @@ class FormCellBase(ObservableModel):
         # based on the latest state of the model
         self._comm.send(handler="update_form_cell", body=self.dict())
 
+    def _observed_sync_sidecar(self, change: Change) -> None:
+        """Calls `_sync_sidecar`, recording form cell sync metrics if they're enabled."""
+        if self._sync_held:
+            self._sync_pending = change
+            return
+
+        metrics = comm_metrics()
+        if not metrics.enabled:
+            self._sync_sidecar(change)
+            return
+
+        metrics.increment("form_cell.sync")
+        start = time.perf_counter()
+        self._sync_sidecar(change)
+        metrics.observe_duration("form_cell.sync", start)
+
+    @contextlib.contextmanager
+    def hold_sync(self) -> Iterator["FormCellBase"]:
+        """Defers syncing the sidecar until the block exits, then syncs once
+        (with the full, latest state) if anything changed."""
+        self._sync_held += 1
+        try:
+            yield self
+        finally:
+            self._sync_held -= 1
+            if not self._sync_held and self._sync_pending is not None:
+                change, self._sync_pending = self._sync_pending, None
+                self._observed_sync_sidecar(change)
+
     def _on_value_update(self, change: Change) -> None:
         """Update the kernel variable when the .value changes
         based on the associated .value_variable_name.
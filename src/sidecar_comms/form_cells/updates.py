@@ -0,0 +1,138 @@
+"""
+Coalescing of inbound form cell updates.
+
+Dragging a slider sends a stream of `update_form_cell` messages, and applying each one
+(validation, updating the value variable, syncing back to the sidecar) can take longer than
+the time between messages. Instead of applying them one by one, updates are queued per form
+cell and merged, last writer wins per field (`settings` are merged one level deep, the same
+way `FormCellBase.update` applies them). The merged update is applied once on the next
+event loop tick, so intermediate values that were already superseded are dropped.
+
+To keep the latency between the latest input and the kernel state bounded, pending updates
+are also applied right away if they've been waiting for more than `max_delay`, and callers
+(e.g. other inbound messages, which should see the updates sent before them) can `flush()`
+at any time. Without a running event loop, updates are applied immediately.
+"""
+import asyncio
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from sidecar_comms.form_cells.base import FORM_CELL_CACHE
+from sidecar_comms.models import DeferredReply, comm_message
+
+DEFAULT_MAX_DELAY = 0.05  # seconds
+
+
+class PendingUpdate(NamedTuple):
+    data: dict
+    # comm to reply through once the update is applied (from the latest request)
+    comm: Any
+    request_ids: List[Any]
+
+
+def merge_update(pending: dict, data: dict) -> dict:
+    """Merges a newer update into a pending one, last writer wins per field."""
+    merged = {**pending, **data}
+    if isinstance(pending.get("settings"), dict) and isinstance(data.get("settings"), dict):
+        merged["settings"] = {**pending["settings"], **data["settings"]}
+    return merged
+
+
+class FormCellUpdateQueue:
+    def __init__(self, max_delay: float = DEFAULT_MAX_DELAY):
+        self.max_delay = max_delay
+        self._pending: Dict[str, PendingUpdate] = {}
+        # when the oldest pending update was queued
+        self._oldest: Optional[float] = None
+        self._scheduled: Optional[asyncio.Handle] = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def submit(
+        self,
+        form_cell_id: str,
+        data: dict,
+        comm: Any,
+        request_id: Any = None,
+    ) -> DeferredReply:
+        """Queues an update for a form cell, merging it into any pending update.
+
+        The update is applied (and the updated form cell sent back through `comm`) on the
+        next event loop tick. The returned DeferredReply can be resolved to apply it right
+        away and get the updated form cell instead.
+        """
+        if form_cell_id not in FORM_CELL_CACHE:
+            # fail on the request that caused it, rather than when it's applied
+            raise KeyError(form_cell_id)
+
+        if (pending := self._pending.pop(form_cell_id, None)) is not None:
+            data = merge_update(pending.data, data)
+            request_ids = pending.request_ids
+        else:
+            request_ids = []
+        if request_id is not None:
+            request_ids.append(request_id)
+        # re-inserted so updates are applied in the order of their latest message
+        self._pending[form_cell_id] = PendingUpdate(data=data, comm=comm, request_ids=request_ids)
+
+        now = time.perf_counter()
+        if self._oldest is None:
+            self._oldest = now
+        self._schedule(now)
+        return DeferredReply(resolve=lambda: self.apply(form_cell_id))
+
+    def _schedule(self, now: float) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # nothing to defer to (e.g. plain IPython); apply right away
+            loop = None
+        if loop is None or now - self._oldest >= self.max_delay:
+            self.flush()
+            return
+        if self._scheduled is None:
+            self._scheduled = loop.call_soon(self.flush)
+
+    def apply(self, form_cell_id: str) -> Optional[dict]:
+        """Applies the pending update for a form cell (if any) without replying,
+        returning the updated form cell."""
+        pending = self._pending.pop(form_cell_id, None)
+        if not self._pending:
+            self._reset()
+        form_cell = FORM_CELL_CACHE[form_cell_id]
+        if pending is not None:
+            # one sync back to the sidecar for the whole update
+            with form_cell.hold_sync():
+                form_cell.update(pending.data)
+        return form_cell.dict()
+
+    def flush(self) -> None:
+        """Applies all pending updates, replying to each with the updated form cell."""
+        while self._pending:
+            form_cell_id, pending = next(iter(self._pending.items()))
+            try:
+                body = self.apply(form_cell_id)
+            except Exception as e:
+                # report it to the sidecar and keep applying the other updates
+                body = {"status": "error", "error": f"error updating form cell: {e!r}"}
+            # the reply is tagged with the latest request_id, even if the latest update
+            # didn't have one; any earlier ones were folded into it
+            request_id = pending.request_ids[-1] if pending.request_ids else None
+            msg = comm_message(body=body, handler="update_form_cell", request_id=request_id)
+            if len(pending.request_ids) > 1:
+                msg["superseded_request_ids"] = pending.request_ids[:-1]
+            pending.comm.send(msg)
+        self._reset()
+
+    def _reset(self) -> None:
+        if self._scheduled is not None:
+            self._scheduled.cancel()
+            self._scheduled = None
+        self._oldest = None
+
+
+@lru_cache
+def form_cell_updates() -> FormCellUpdateQueue:
+    return FormCellUpdateQueue()
@@ -0,0 +1,131 @@
+"""
+Truncating repr that stops producing output once it reaches a maximum length.
+
+`repr(value)[:max_length]` renders the entire object just to keep the first few hundred
+characters, which gets very expensive for large (or deeply nested) containers. Similar in
+spirit to `reprlib`, this walks lists, tuples, sets, frozensets and dicts (and strings/bytes)
+itself and stops as soon as `max_length` characters have been written, so the cost scales
+with the preview size instead of the object size.
+
+bounded_repr(list(range(10_000_000)), max_length=20)
+>>> '[0, 1, 2, 3, 4, 5, 6...'
+"""
+from typing import Any, List, NamedTuple, Optional
+
+DEFAULT_MAX_LENGTH = 500
+DEFAULT_MAX_DEPTH = 6
+ELLIPSIS = "..."
+
+
+class ContainerRepr(NamedTuple):
+    opening: str
+    closing: str
+    # written in place of a container that contains itself
+    recursive: str
+    # written for empty containers, if different from opening + closing
+    empty: Optional[str] = None
+
+
+CONTAINER_REPRS = {
+    list.__repr__: ContainerRepr("[", "]", recursive="[...]"),
+    tuple.__repr__: ContainerRepr("(", ")", recursive="(...)"),
+    dict.__repr__: ContainerRepr("{", "}", recursive="{...}"),
+    set.__repr__: ContainerRepr("{", "}", recursive="set(...)", empty="set()"),
+    frozenset.__repr__: ContainerRepr(
+        "frozenset({", "})", recursive="frozenset(...)", empty="frozenset()"
+    ),
+}
+
+
+class ReprLimitReached(Exception):
+    pass
+
+
+class BoundedRepr:
+    def __init__(self, max_length: int = DEFAULT_MAX_LENGTH, max_depth: int = DEFAULT_MAX_DEPTH):
+        self.max_length = max_length
+        self.max_depth = max_depth
+        self._parts: List[str] = []
+        self._length = 0
+        self._path = set()
+
+    def repr(self, value: Any) -> str:
+        """Returns the repr of a value, truncated (with a trailing "...") to `max_length`."""
+        self._parts = []
+        self._length = 0
+        self._path = set()
+        try:
+            self._repr(value, depth=0)
+        except ReprLimitReached:
+            return "".join(self._parts) + ELLIPSIS
+        return "".join(self._parts)
+
+    def _remaining(self) -> int:
+        return self.max_length - self._length
+
+    def _write(self, text: str) -> None:
+        remaining = self._remaining()
+        if len(text) > remaining:
+            self._parts.append(text[:remaining])
+            self._length = self.max_length
+            raise ReprLimitReached
+        self._parts.append(text)
+        self._length += len(text)
+
+    def _repr(self, value: Any, depth: int) -> None:
+        value_type = type(value)
+        if value_type is str or value_type is bytes:
+            # only repr what could possibly fit (+1 for the opening quote/prefix)
+            self._write(repr(value[: self._remaining() + 1]))
+            return
+
+        # only walk containers that use the builtin repr; subclasses
+        # with their own __repr__ (OrderedDict, Counter, ...) are repr'd normally
+        if value_type.__repr__ in CONTAINER_REPRS:
+            if depth >= self.max_depth:
+                self._write(ELLIPSIS)
+                return
+            if id(value) in self._path:
+                # recursive reference, matching the builtin repr
+                self._write(CONTAINER_REPRS[value_type.__repr__].recursive)
+                return
+            self._path.add(id(value))
+            try:
+                self._write_container(CONTAINER_REPRS[value_type.__repr__], value, depth)
+            finally:
+                self._path.discard(id(value))
+            return
+
+        try:
+            text = repr(value)
+        except ValueError:
+            # e.g. ints exceeding the interpreter's str digit limit
+            text = f"<{value_type.__name__}>"
+        self._write(text)
+
+    def _write_container(self, container_repr: ContainerRepr, value: Any, depth: int) -> None:
+        if not value and container_repr.empty is not None:
+            self._write(container_repr.empty)
+            return
+        self._write(container_repr.opening)
+        if isinstance(value, dict):
+            items = value.items()
+        else:
+            items = value
+        for count, item in enumerate(items):
+            if count:
+                self._write(", ")
+            if isinstance(value, dict):
+                self._repr(item[0], depth + 1)
+                self._write(": ")
+                self._repr(item[1], depth + 1)
+            else:
+                self._repr(item, depth + 1)
+        if isinstance(value, tuple) and len(value) == 1:
+            self._write(",")
+        self._write(container_repr.closing)
+
+
+def bounded_repr(value: Any, max_length: int = DEFAULT_MAX_LENGTH) -> str:
+    """Returns the repr of a value without rendering more than `max_length` characters."""
+    return BoundedRepr(max_length=max_length).repr(value)
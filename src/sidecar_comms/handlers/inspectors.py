@@ -0,0 +1,102 @@
+"""
+Registry mapping variable types to inspector objects.
+
+Inspectors can be registered either with the class itself or with its module-qualified name
+(e.g. "pandas.core.frame.DataFrame"), so we don't need to import heavy libraries just to
+recognize their types. Lookups walk the MRO of a variable's type, so subclasses are handled
+by their closest registered base class, and the result is cached per type. A bare class name
+(e.g. "DataFrame") matches classes of that name from any module, as a fallback for when
+nothing more specific is registered.
+
+registry = InspectorRegistry(default=VariableInspector())
+registry.register(dict, DictInspector())
+registry.register("pandas.core.frame.DataFrame", DataFrameInspector())
+registry.lookup(collections.OrderedDict())
+>>> <DictInspector>
+"""
+import weakref
+from typing import Any, Dict, Generic, TypeVar, Union
+
+InspectorT = TypeVar("InspectorT")
+
+# module-qualified names of dataframe library types, for registering them without
+# importing these libraries (modin mirrors the pandas API)
+PANDAS_DATAFRAME_TYPES = ("pandas.core.frame.DataFrame", "modin.pandas.dataframe.DataFrame")
+PANDAS_TYPES = PANDAS_DATAFRAME_TYPES + (
+    "pandas.core.series.Series",
+    "modin.pandas.series.Series",
+)
+# older polars versions keep their classes under `polars.internals`
+POLARS_DATAFRAME_TYPES = (
+    "polars.dataframe.frame.DataFrame",
+    "polars.internals.dataframe.frame.DataFrame",
+)
+POLARS_TYPES = POLARS_DATAFRAME_TYPES + (
+    "polars.series.series.Series",
+    "polars.internals.series.series.Series",
+)
+DATAFRAME_TYPES = PANDAS_DATAFRAME_TYPES + POLARS_DATAFRAME_TYPES
+
+
+def qualified_type_name(cls: type) -> str:
+    """Returns the module-qualified name of a class, e.g. `pandas.core.frame.DataFrame`."""
+    return f"{getattr(cls, '__module__', '')}.{getattr(cls, '__qualname__', cls.__name__)}"
+
+
+class InspectorRegistry(Generic[InspectorT]):
+    def __init__(self, default: InspectorT):
+        self.default = default
+        self._by_type: Dict[type, InspectorT] = {}
+        self._by_name: Dict[str, InspectorT] = {}
+        self._by_bare_name: Dict[str, InspectorT] = {}
+        # type -> resolved inspector; weak so classes defined (and redefined) in
+        # notebook cells can still be garbage collected
+        self._cache: "weakref.WeakKeyDictionary[type, InspectorT]" = weakref.WeakKeyDictionary()
+
+    def register(self, key: Union[type, str], inspector: InspectorT) -> None:
+        """Registers an inspector for a class, a module-qualified class name, or a bare
+        class name (matching any module)."""
+        if isinstance(key, str) and "." not in key:
+            self._by_bare_name[key] = inspector
+        elif isinstance(key, str):
+            self._by_name[key] = inspector
+        else:
+            self._by_type[key] = inspector
+        # any cached resolution may now be stale
+        self._cache.clear()
+
+    def unregister(self, key: Union[type, str]) -> None:
+        if isinstance(key, str):
+            self._by_name.pop(key, None)
+            self._by_bare_name.pop(key, None)
+        else:
+            self._by_type.pop(key, None)
+        self._cache.clear()
+
+    def resolve(self, cls: type) -> InspectorT:
+        """Finds the inspector for the closest registered class in the MRO, falling back to
+        bare class names."""
+        mro = getattr(cls, "__mro__", (cls,))
+        for base in mro:
+            if base in self._by_type:
+                return self._by_type[base]
+            if self._by_name and (name := qualified_type_name(base)) in self._by_name:
+                return self._by_name[name]
+        for base in mro:
+            if (name := getattr(base, "__name__", None)) in self._by_bare_name:
+                return self._by_bare_name[name]
+        return self.default
+
+    def lookup(self, value: Any) -> InspectorT:
+        """Returns the inspector for a value, using the per-type cache when possible."""
+        cls = type(value)
+        try:
+            return self._cache[cls]
+        except KeyError:
+            pass
+        except TypeError:
+            # type can't be weakly referenced
+            return self.resolve(cls)
+        inspector = self.resolve(cls)
+        self._cache[cls] = inspector
+        return inspector
@@ -0,0 +1,235 @@
+"""
+Optional tracking of user namespace mutations.
+
+Finding out which variables changed normally means scanning the entire user namespace.
+With tracking enabled, a `NamespaceTracker` is added to the shell's `ast_transformers`, so
+it sees each cell's AST before it runs and records the names the cell can assign or delete.
+Consumers (like the variable explorer delta snapshots) can then look at only those names.
+The user namespace itself is never replaced or wrapped, so user code sees exactly the same
+globals with or without tracking.
+
+Each consumer subscribes to get its own set of dirty names, which it drains when it's done
+looking at them.
+
+Names declared `global` inside functions (including ones defined before tracking was
+enabled) may be reassigned by any later call, so they're marked dirty after every cell.
+Cells that can change the namespace in ways the AST doesn't show (star imports, magics,
+`exec`/`eval`, `globals()`) mark subscribers as overflowed, falling back to a full scan.
+
+Caveats:
+ - in-place mutations (`some_list.append(1)`) don't touch the namespace, so they aren't recorded
+ - changes made outside of executed cells (e.g. from other threads) aren't recorded either,
+   unless they go through `mark_namespace_changes`
+"""
+import ast
+import dis
+import types
+import weakref
+from functools import lru_cache
+from typing import Iterable, List, Optional, Set, Tuple
+
+from IPython.core.interactiveshell import InteractiveShell
+
+from sidecar_comms.shell import get_ipython_shell
+
+# calls that can assign to the user namespace without it showing up in the cell's AST
+# (IPython magics and shell escapes are transformed into `get_ipython()` calls)
+OPAQUE_CALLS = frozenset({"exec", "eval", "globals", "vars", "locals", "get_ipython"})
+
+# nodes that bind their `name` attribute (match statement captures are Python 3.10+)
+_NAMED_BINDINGS = tuple(
+    getattr(ast, node_type)
+    for node_type in (
+        "FunctionDef",
+        "AsyncFunctionDef",
+        "ClassDef",
+        "ExceptHandler",
+        "MatchAs",
+        "MatchStar",
+    )
+    if hasattr(ast, node_type)
+)
+# `case {**rest}` binds `rest`
+_MATCH_MAPPING = getattr(ast, "MatchMapping", ())
+
+
+class DirtyKeys(set):
+    """Names that were assigned or deleted since the subscriber last drained them.
+
+    If `overflowed` is set, changes may have been missed (e.g. tracking was paused),
+    and the subscriber should fall back to a full scan.
+    """
+
+    overflowed: bool = False
+
+    def drain(self) -> set:
+        names = set(self)
+        self.clear()
+        self.overflowed = False
+        return names
+
+
+def assigned_names(tree: ast.AST) -> Tuple[Set[str], Set[str], bool]:
+    """Returns the names a cell can bind or unbind, the names declared `global` in its
+    functions, and whether those are complete.
+
+    This errs on the side of including too many names (e.g. function locals), since
+    extra names only cost an extra fingerprint, while a missing name is a missed change.
+    """
+    names = set()
+    global_names = set()
+    complete = True
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            if not isinstance(node.ctx, ast.Load):
+                names.add(node.id)
+            elif node.id in OPAQUE_CALLS:
+                complete = False
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                if alias.name == "*":
+                    complete = False
+                else:
+                    names.add(alias.asname or alias.name.partition(".")[0])
+        elif isinstance(node, ast.Global):
+            global_names.update(node.names)
+        elif isinstance(node, _NAMED_BINDINGS):
+            if node.name:
+                names.add(node.name)
+        elif isinstance(node, _MATCH_MAPPING) and node.rest:
+            names.add(node.rest)
+    return names, global_names, complete
+
+
+def code_global_names(code: types.CodeType) -> Set[str]:
+    """Returns the names a code object (or any code nested in it) assigns or deletes
+    with `global`."""
+    names = set()
+    for instruction in dis.get_instructions(code):
+        if instruction.opname in ("STORE_GLOBAL", "DELETE_GLOBAL"):
+            names.add(instruction.argval)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= code_global_names(const)
+    return names
+
+
+class NamespaceTracker(ast.NodeTransformer):
+    """Records the names each executed cell can change, without changing the cell."""
+
+    def __init__(self):
+        self.recording = True
+        # names declared `global` in user functions, which any call may reassign
+        self.global_names: Set[str] = set()
+        self._subscribers: List[weakref.ref] = []
+
+    def subscribe(self) -> DirtyKeys:
+        """Returns a new set that will collect the names of changed variables."""
+        self._subscribers = [ref for ref in self._subscribers if ref() is not None]
+        keys = DirtyKeys()
+        self._subscribers.append(weakref.ref(keys))
+        return keys
+
+    def mark(self, names: Iterable[str]) -> None:
+        if not self.recording:
+            return
+        names = set(names)
+        for ref in self._subscribers:
+            keys = ref()
+            if keys is not None:
+                keys.update(names)
+
+    def overflow(self) -> None:
+        """Tells subscribers that changes may have been missed and a full scan is needed."""
+        for ref in self._subscribers:
+            if (keys := ref()) is not None:
+                keys.overflowed = True
+
+    def pause(self) -> None:
+        """Stops recording changes; subscribers will need a full scan to catch up."""
+        self.recording = False
+        self.overflow()
+
+    def resume(self) -> None:
+        self.recording = True
+
+    def scan_functions(self, user_ns: dict) -> None:
+        """Picks up `global` names from functions (and class methods) that were defined
+        before tracking was enabled."""
+        for value in list(user_ns.values()):
+            if isinstance(value, type) and value.__module__ == "__main__":
+                functions = list(vars(value).values())
+            else:
+                functions = [value]
+            for function in functions:
+                if isinstance(function, types.FunctionType):
+                    self.global_names |= code_global_names(function.__code__)
+
+    def visit(self, node: ast.AST) -> ast.AST:
+        """Called by IPython with each cell's AST before it's executed."""
+        if not self.recording:
+            return node
+        names, global_names, complete = assigned_names(node)
+        self.global_names |= global_names
+        self.mark(names | self.global_names)
+        if not complete:
+            self.overflow()
+        return node
+
+
+@lru_cache
+def namespace_tracker() -> NamespaceTracker:
+    return NamespaceTracker()
+
+
+def active_namespace_tracker(
+    shell: Optional[InteractiveShell] = None,
+) -> Optional[NamespaceTracker]:
+    """Returns the shell's namespace tracker if tracking is enabled."""
+    shell = shell or get_ipython_shell()
+    for transformer in getattr(shell, "ast_transformers", None) or []:
+        if isinstance(transformer, NamespaceTracker):
+            return transformer
+
+
+def mark_namespace_changes(*names: str) -> None:
+    """Records names changed outside of executed cells (e.g. by inbound handlers)."""
+    if (tracker := active_namespace_tracker()) is not None:
+        tracker.mark(name for name in names if name)
+
+
+def enable_namespace_tracking(shell: Optional[InteractiveShell] = None) -> bool:
+    """Adds the namespace tracker to the shell's AST transformers.
+
+    Returns False (leaving the shell untouched) if the shell doesn't run AST transformers.
+    """
+    shell = shell or get_ipython_shell()
+    if active_namespace_tracker(shell) is not None:
+        return True
+    transformers = getattr(shell, "ast_transformers", None)
+    if not isinstance(transformers, list):
+        return False
+
+    tracker = namespace_tracker()
+    tracker.scan_functions(shell.user_ns)
+    tracker.resume()
+    transformers.append(tracker)
+    return True
+
+
+def disable_namespace_tracking(shell: Optional[InteractiveShell] = None) -> None:
+    """Stops recording namespace changes."""
+    shell = shell or get_ipython_shell()
+    if (tracker := active_namespace_tracker(shell)) is not None:
+        tracker.pause()
+        shell.ast_transformers.remove(tracker)
+
+
+def configure_namespace_tracking(enabled: bool) -> dict:
+    """Turns namespace tracking on/off, returning whether it's active."""
+    if enabled:
+        active = enable_namespace_tracking()
+    else:
+        disable_namespace_tracking()
+        active = False
+    return {"enabled": active}
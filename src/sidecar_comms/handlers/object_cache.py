@@ -0,0 +1,78 @@
+"""
+Per-object cache for expensive-to-compute variable metadata.
+
+Entries are keyed by object identity along with a cheap structural fingerprint provided by
+the caller (e.g. a DataFrame's shape and column names), so a cached value is only reused while
+the object looks unchanged. Entries are evicted in least-recently-used order once the cache is
+full, and, for types that support weak references, as soon as the object is garbage collected
+(which also keeps a recycled `id()` from matching a stale entry).
+
+cache = ObjectCache(maxsize=128)
+if (dtypes := cache.get(df, fingerprint)) is None:
+    dtypes = expensive_dtypes(df)
+    cache.set(df, fingerprint, dtypes)
+"""
+import weakref
+from collections import OrderedDict
+from typing import Any, Hashable, NamedTuple, Optional
+
+DEFAULT_MAXSIZE = 256
+
+
+class CacheEntry(NamedTuple):
+    fingerprint: Hashable
+    value: Any
+    ref: Optional[weakref.ref]
+
+
+class ObjectCache:
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[int, CacheEntry]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, obj: Any, fingerprint: Hashable) -> Optional[Any]:
+        """Returns the cached value for an object if its fingerprint hasn't changed."""
+        key = id(obj)
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        if entry.ref is not None and entry.ref() is not obj:
+            return
+        if entry.fingerprint != fingerprint:
+            del self._entries[key]
+            return
+        self._entries.move_to_end(key)
+        return entry.value
+
+    def set(self, obj: Any, fingerprint: Hashable, value: Any) -> None:
+        key = id(obj)
+        try:
+            ref = weakref.ref(obj, self._evict_callback(key))
+        except TypeError:
+            # not weak-referenceable; we rely on the fingerprint alone
+            ref = None
+        self._entries[key] = CacheEntry(fingerprint=fingerprint, value=value, ref=ref)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _evict_callback(self, key: int):
+        # avoid holding a strong reference to the cache from the object's weakref
+        cache_ref = weakref.ref(self)
+
+        def evict(ref: weakref.ref) -> None:
+            cache = cache_ref()
+            if cache is None:
+                return
+            entry = cache._entries.get(key)
+            # only evict if the entry still belongs to the collected object
+            if entry is not None and entry.ref is ref:
+                del cache._entries[key]
+
+        return evict
+
+    def clear(self) -> None:
+        self._entries.clear()
@@ -0,0 +1,365 @@
+"""
+Paged previews of arrays, DataFrames and sequences.
+
+Previews only ever touch the requested window of rows (`offset` to `offset + limit`), using
+each library's own cheap slicing: `iloc` for pandas/modin, `slice` for polars, views for
+NumPy arrays, and `itertools.islice` for other collections. Scrolling through a 10M-row
+DataFrame only costs the rows that are visible.
+
+`variable_preview` returns the window as JSON rows:
+
+variable_preview(pd.DataFrame({"a": [1, 2, 3]}), offset=1, limit=1)
+>>> {'kind': 'dataframe', 'offset': 1, 'limit': 1, 'total': 3, 'columns': ['a'],
+     'dtypes': ['int64'], 'index': [1], 'data': [[2]]}
+
+`binary_preview` sends arrays and DataFrames as binary comm buffers instead, since
+converting numeric data into Python lists (and then JSON text) creates a Python object per
+value. Each array (or DataFrame column) is sent as one contiguous buffer, along with a small
+JSON header describing each buffer's dtype and shape. Slices are taken with the libraries'
+own (view-returning) slicing, and the buffers are memoryviews over the sliced data, so a
+preview costs at most one memcpy for data that isn't already contiguous.
+
+Columns that can't be represented as a raw buffer (strings, objects, nullable extension
+types) are included in the header as JSON values instead.
+
+header, buffers = binary_preview(np.arange(5, dtype="float64"))
+header
+>>> {'kind': 'ndarray', 'shape': [5], 'offset': 0, 'rows': 5,
+     'columns': [{'name': None, 'dtype': '<f8', 'shape': [5], 'buffer': 0}]}
+"""
+import collections.abc
+import itertools
+from typing import Any, Callable, List, Optional, Tuple
+
+from sidecar_comms.handlers.inspectors import PANDAS_TYPES, POLARS_TYPES, InspectorRegistry
+from sidecar_comms.models import DEFAULT_PREVIEW_ROWS
+from sidecar_comms.serialization import JSON_SCALAR_TYPES, to_json_safe
+from sidecar_comms.shell import get_ipython_shell
+
+# upper bound on rows per preview page, regardless of the requested limit
+MAX_PREVIEW_ROWS = 10_000
+# numpy dtype kinds that can be sent as raw buffers: bool, (unsigned) int, float, complex,
+# and datetime/timedelta (sent as their underlying int64s)
+BINARY_DTYPE_KINDS = "biufcmM"
+
+
+class PreviewError(Exception):
+    pass
+
+
+def json_scalar(value: Any) -> Any:
+    """Converts a value that isn't a JSON scalar (a date, Timestamp, Decimal, numpy scalar...)
+    into one, using its ISO format or string representation."""
+    try:
+        if value != value:
+            # NaT, NaN Decimals
+            return None
+    except Exception:
+        pass
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if type(value).__module__ == "numpy" and hasattr(value, "item"):
+        item = value.item()
+        if isinstance(item, JSON_SCALAR_TYPES):
+            return item
+    return str(value)
+
+
+def json_values(values: Any) -> Any:
+    # not truncated, since the number of rows is already limited;
+    # NaN is common in DataFrames, but isn't valid JSON
+    return to_json_safe(
+        values,
+        max_items=None,
+        max_bytes=None,
+        allow_nan=False,
+        default=json_scalar,
+    )
+
+
+def array_column(array: Any, name: Any, buffers: List[memoryview]) -> dict:
+    """Describes an array in the preview header, adding its data to `buffers` if possible."""
+    import numpy as np
+
+    column = {
+        "name": None if name is None else str(name),
+        "dtype": array.dtype.str,
+        "shape": list(array.shape),
+    }
+    if array.dtype.kind not in BINARY_DTYPE_KINDS:
+        column["values"] = json_values(array.tolist())
+        return column
+
+    # only copies if the slice isn't already contiguous
+    data = np.ascontiguousarray(array)
+    if data.dtype.kind in "mM":
+        # memoryviews don't support datetimes; send the int64 representation
+        data = data.view("int64")
+    column["buffer"] = len(buffers)
+    buffers.append(memoryview(data).cast("B"))
+    return column
+
+
+def select_array_columns(rows: Any, columns: Optional[list]) -> Any:
+    if columns is None:
+        return rows
+    if rows.ndim < 2:
+        raise PreviewError("columns can only be selected from arrays with 2 or more dimensions")
+    return rows[:, columns]
+
+
+def numpy_preview(
+    value: Any, offset: int, limit: int, columns: Optional[list]
+) -> Tuple[dict, List[memoryview]]:
+    buffers = []
+    # basic slicing returns a view
+    rows = value[offset : offset + limit] if value.ndim else value
+    rows = select_array_columns(rows, columns)
+    header = {
+        "kind": "ndarray",
+        "shape": list(value.shape),
+        "offset": offset,
+        "rows": len(rows) if value.ndim else 1,
+        "columns": [array_column(rows, None, buffers)],
+    }
+    return header, buffers
+
+
+def pandas_preview(
+    value: Any, offset: int, limit: int, columns: Optional[list]
+) -> Tuple[dict, List[memoryview]]:
+    if getattr(value, "ndim", 2) == 1:
+        # Series
+        value = value.to_frame()
+    # slice before selecting columns, so only the window is copied
+    rows = value.iloc[offset : offset + limit]
+    if columns is not None:
+        rows = rows[columns]
+    if type(rows).__module__.startswith("modin"):
+        # only the previewed rows are materialized
+        rows = rows._to_pandas()
+
+    buffers = []
+    header = {
+        "kind": "dataframe",
+        "shape": [len(value), len(rows.columns)],
+        "offset": offset,
+        "rows": len(rows),
+        "index": array_column(rows.index.to_numpy(), None, buffers),
+        "columns": [
+            # to_numpy() doesn't copy single-dtype numpy-backed columns
+            array_column(series.to_numpy(), name, buffers)
+            for name, series in rows.items()
+        ],
+    }
+    return header, buffers
+
+
+def polars_preview(
+    value: Any, offset: int, limit: int, columns: Optional[list]
+) -> Tuple[dict, List[memoryview]]:
+    if not hasattr(value, "columns"):
+        # Series
+        value = value.to_frame()
+    if columns is not None:
+        value = value.select(columns)
+    # zero-copy slice
+    rows = value.slice(offset, limit)
+
+    buffers = []
+    header = {
+        "kind": "dataframe",
+        "shape": list(value.shape),
+        "offset": offset,
+        "rows": rows.height,
+        "index": None,
+        "columns": [
+            # zero-copy for numeric columns without nulls
+            array_column(series.to_numpy(), series.name, buffers)
+            for series in rows.get_columns()
+        ],
+    }
+    return header, buffers
+
+
+PreviewFunction = Callable[[Any, int, int, Optional[list]], Tuple[dict, List[memoryview]]]
+BINARY_PREVIEWS: InspectorRegistry[Optional[PreviewFunction]] = InspectorRegistry(default=None)
+BINARY_PREVIEWS.register("numpy.ndarray", numpy_preview)
+for pandas_type in PANDAS_TYPES:
+    BINARY_PREVIEWS.register(pandas_type, pandas_preview)
+for polars_type in POLARS_TYPES:
+    BINARY_PREVIEWS.register(polars_type, polars_preview)
+
+
+def binary_preview(
+    value: Any,
+    offset: int = 0,
+    limit: int = DEFAULT_PREVIEW_ROWS,
+    columns: Optional[list] = None,
+) -> Tuple[dict, List[memoryview]]:
+    """Returns a JSON header and binary buffers previewing rows of an array or DataFrame,
+    starting at `offset`, and at most MAX_PREVIEW_ROWS rows. Raises PreviewError for
+    unsupported types.
+    """
+    preview = BINARY_PREVIEWS.lookup(value)
+    if preview is None:
+        raise PreviewError(f"binary previews are not supported for {type(value).__name__}")
+    limit = min(max(limit, 0), MAX_PREVIEW_ROWS)
+    return preview(value, max(offset, 0), limit, columns)
+
+
+def get_variable_binary_preview(
+    name: str,
+    offset: int = 0,
+    limit: int = DEFAULT_PREVIEW_ROWS,
+    columns: Optional[list] = None,
+) -> Tuple[dict, List[memoryview]]:
+    """Returns a binary preview of a variable in the user namespace.
+    Errors (missing variables, unsupported types, bad columns) are returned in the header.
+    """
+    user_ns = get_ipython_shell().user_ns
+    if name not in user_ns:
+        return {"name": name, "error": f"variable {name!r} not found"}, []
+    try:
+        header, buffers = binary_preview(user_ns[name], offset=offset, limit=limit, columns=columns)
+    except Exception as e:
+        return {"name": name, "error": str(e)}, []
+    return {"name": name, **header}, buffers
+
+
+def numpy_rows(value: Any, offset: int, limit: int, columns: Optional[list]) -> dict:
+    if not value.ndim:
+        raise PreviewError("can't page through a 0-dimensional array")
+    # basic slicing returns a view, so only the window is converted
+    rows = select_array_columns(value[offset : offset + limit], columns)
+    return {
+        "kind": "ndarray",
+        "total": len(value),
+        "shape": list(value.shape),
+        "dtype": str(value.dtype),
+        "data": json_values(rows.tolist()),
+    }
+
+
+def pandas_rows(value: Any, offset: int, limit: int, columns: Optional[list]) -> dict:
+    if getattr(value, "ndim", 2) == 1:
+        # Series
+        value = value.to_frame()
+    # slice before selecting columns, so only the window is copied
+    rows = value.iloc[offset : offset + limit]
+    if columns is not None:
+        rows = rows[columns]
+    if type(rows).__module__.startswith("modin"):
+        # only the previewed rows are materialized
+        rows = rows._to_pandas()
+    return {
+        "kind": "dataframe",
+        "total": len(value),
+        "columns": [str(column) for column in rows.columns],
+        "dtypes": [str(dtype) for dtype in rows.dtypes],
+        "index": json_values(rows.index.tolist()),
+        "data": json_values(list(rows.itertuples(index=False, name=None))),
+    }
+
+
+def polars_rows(value: Any, offset: int, limit: int, columns: Optional[list]) -> dict:
+    if not hasattr(value, "columns"):
+        # Series
+        value = value.to_frame()
+    if columns is not None:
+        value = value.select(columns)
+    # zero-copy slice
+    rows = value.slice(offset, limit)
+    return {
+        "kind": "dataframe",
+        "total": value.height,
+        "columns": rows.columns,
+        "dtypes": [str(dtype) for dtype in rows.dtypes],
+        "index": None,
+        "data": json_values(rows.rows()),
+    }
+
+
+def sequence_rows(value: Any, offset: int, limit: int, columns: Optional[list]) -> dict:
+    # slicing lists/tuples only copies the window
+    rows = value[offset : offset + limit]
+    return {"kind": "sequence", "total": len(value), "data": json_values(list(rows))}
+
+
+def mapping_rows(value: Any, offset: int, limit: int, columns: Optional[list]) -> dict:
+    rows = itertools.islice(value.items(), offset, offset + limit)
+    return {
+        "kind": "mapping",
+        "total": len(value),
+        "columns": ["key", "value"],
+        "data": [[json_values(key), json_values(item)] for key, item in rows],
+    }
+
+
+def text_rows(value: Any, offset: int, limit: int, columns: Optional[list]) -> dict:
+    # pages through characters (or bytes) rather than rows
+    text = value[offset : offset + limit]
+    if isinstance(text, bytes):
+        text = text.decode("utf-8", errors="replace")
+    return {"kind": "text", "total": len(value), "data": text}
+
+
+def iterable_rows(value: Any, offset: int, limit: int, columns: Optional[list]) -> dict:
+    if isinstance(value, collections.abc.Iterator) or not isinstance(
+        value, collections.abc.Iterable
+    ):
+        # iterators (generators, file handles, ...) would be consumed by previewing them
+        raise PreviewError(f"previews are not supported for {type(value).__name__}")
+    total = len(value) if isinstance(value, collections.abc.Sized) else None
+    rows = itertools.islice(value, offset, offset + limit)
+    return {"kind": "sequence", "total": total, "data": json_values(list(rows))}
+
+
+RowsFunction = Callable[[Any, int, int, Optional[list]], dict]
+# falls back to islice for any other (non-iterator) iterable
+PREVIEWS: InspectorRegistry[RowsFunction] = InspectorRegistry(default=iterable_rows)
+PREVIEWS.register(list, sequence_rows)
+PREVIEWS.register(tuple, sequence_rows)
+PREVIEWS.register(range, sequence_rows)
+PREVIEWS.register(dict, mapping_rows)
+PREVIEWS.register(str, text_rows)
+PREVIEWS.register(bytes, text_rows)
+PREVIEWS.register("numpy.ndarray", numpy_rows)
+for pandas_type in PANDAS_TYPES:
+    PREVIEWS.register(pandas_type, pandas_rows)
+for polars_type in POLARS_TYPES:
+    PREVIEWS.register(polars_type, polars_rows)
+
+
+def variable_preview(
+    value: Any,
+    offset: int = 0,
+    limit: int = DEFAULT_PREVIEW_ROWS,
+    columns: Optional[list] = None,
+) -> dict:
+    """Returns a page of rows from an array, DataFrame, or collection as JSON, starting
+    at `offset`. Raises PreviewError for values that can't be paged through.
+    """
+    offset = max(offset, 0)
+    limit = min(max(limit, 0), MAX_PREVIEW_ROWS)
+    rows = PREVIEWS.lookup(value)(value, offset, limit, columns)
+    return {"offset": offset, "limit": limit, **rows}
+
+
+def get_variable_preview(
+    name: str,
+    offset: int = 0,
+    limit: int = DEFAULT_PREVIEW_ROWS,
+    columns: Optional[list] = None,
+) -> dict:
+    """Returns a page of rows from a variable in the user namespace.
+    Errors (missing variables, unsupported types, bad columns) are returned in the body.
+    """
+    user_ns = get_ipython_shell().user_ns
+    if name not in user_ns:
+        return {"name": name, "error": f"variable {name!r} not found"}
+    try:
+        preview = variable_preview(user_ns[name], offset=offset, limit=limit, columns=columns)
+    except Exception as e:
+        return {"name": name, "error": str(e)}
+    return {"name": name, **preview}
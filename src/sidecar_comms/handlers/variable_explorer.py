@@ -1,13 +1,43 @@
-import json
+import bisect
+import collections.abc
+import fnmatch
+import heapq
+import itertools
+import math
+import operator
+import re
 import sys
-from typing import Any, Optional, Union
+import time
+import uuid
+import weakref
+from typing import Any, AsyncIterator, Hashable, Iterator, List, Optional, Tuple, Union
 
 from pydantic import BaseModel, Field
 
+from sidecar_comms.handlers.bounded_repr import bounded_repr
+from sidecar_comms.handlers.inspectors import (
+    DATAFRAME_TYPES,
+    InspectorRegistry,
+    qualified_type_name,
+)
+from sidecar_comms.handlers.memory import MemoryEstimator, estimate_size_bytes
+from sidecar_comms.handlers.namespace_tracking import mark_namespace_changes
+from sidecar_comms.handlers.object_cache import DEFAULT_MAXSIZE, ObjectCache
+from sidecar_comms.models import DEFAULT_CHUNK_BYTES, VariableQuery
+from sidecar_comms.serialization import (
+    JSON_SCALAR_TYPES,
+    BoundedJSONSerializer,
+    is_json_safe,
+    to_json_safe,
+)
 from sidecar_comms.shell import get_ipython_shell
+from sidecar_comms.tasks import cooperative
 
 MAX_STRING_LENGTH = 500
 CONTAINER_TYPES = [list, set, frozenset, tuple]
+SAMPLE_ITEM_COUNT = 5
+# how long a type that exceeded its time budget is skipped by budgeted inspections
+SLOW_TYPE_TTL = 60.0  # seconds
 
 
 class VariableModel(BaseModel):
@@ -20,6 +50,7 @@ class VariableModel(BaseModel):
     size_bytes: Optional[int]
     extra: dict = Field(default_factory=dict)
     error: Optional[str]
+    timed_out: bool = False
 
 
 def variable_docstring(value: Any) -> Optional[str]:
@@ -58,30 +89,17 @@ def variable_size(value: Any) -> Optional[Union[int, tuple]]:
     For iterables, this returns the length / number of items.
     For matrix-like objects, this returns a tuple of the number of rows/columns, similar to .shape.
     """
-    if (shape := variable_shape(value)) is not None:
-        return shape
-
-    if hasattr(value, "__len__"):
-        return len(value)
-
-    if (size := getattr(value, "size", None)) is None:
-        return
-    if isinstance(size, int):
-        return size
-    if isinstance(size, tuple):
-        return size[0]
+    return variable_inspector(value).size(value)
 
 
 def variable_size_bytes(value: Any) -> Optional[int]:
-    """Returns the size of a variable in bytes."""
-    if variable_type(value) == "DataFrame":
-        # on large dataframes, this could take a very long time
-        return
+    """Returns the (estimated, deep) size of a variable in bytes."""
+    return variable_inspector(value).size_bytes(value)
 
-    try:
-        return sys.getsizeof(value)
-    except Exception:
-        pass
+
+def variable_sample_items(value: Any, count: int = SAMPLE_ITEM_COUNT) -> list:
+    """Returns the first `count` items of a container without copying the container."""
+    return list(itertools.islice(value, count))
 
 
 def variable_sample_value(value: Any, max_length: Optional[int] = None) -> Any:
@@ -89,19 +107,26 @@ def variable_sample_value(value: Any, max_length: Optional[int] = None) -> Any:
     sample_value = value
     max_length = max_length or MAX_STRING_LENGTH
 
+    if isinstance(value, collections.abc.Iterator):
+        # generators and other one-shot iterators would be consumed by sampling
+        return
+
     if isinstance(value, tuple(CONTAINER_TYPES)):
         sample_items = [
-            variable_sample_value(item, max_length=max_length) for item in list(value)[:5]
+            variable_sample_value(item, max_length=max_length)
+            for item in variable_sample_items(value)
         ]
-        container_type = type(value)
-        # convert back to original type if we're only showing some items
+        # convert back to original type if we're only showing some items,
+        # using the builtin type since subclasses (like namedtuples) may not
+        # be constructable from a list of items
+        container_type = next(t for t in CONTAINER_TYPES if isinstance(value, t))
         sample_value = container_type(sample_items)
 
     if not is_json_serializable(sample_value):
         return
 
-    if variable_size_bytes(sample_value) > max_length:
-        sample_value = repr(sample_value)[:max_length] + "..."
+    if sys.getsizeof(sample_value) > max_length:
+        sample_value = bounded_repr(sample_value, max_length=max_length)
 
     return sample_value
 
@@ -134,7 +159,8 @@ def variable_extra_list_property(value: Any, property_name: str, max_length: int
 
     elif not isinstance(prop, list):
         try:
-            prop = list(prop)
+            # avoid materializing the full property (e.g. a DataFrame index with millions of rows)
+            return list(itertools.islice(prop, max_length))
         except TypeError:
             # some non-iterable
             return []
@@ -146,26 +172,200 @@ def variable_extra_properties(value: Any) -> Optional[dict]:
     """Handles extracting/generating additional properties for a variable
     based on supported types.
     """
-    extra = {}
+    return variable_inspector(value).extra(value)
+
+
+class VariableInspector:
+    """Gathers type-specific properties of a variable.
+
+    This default implementation is used for any type without a registered inspector.
+    Subclasses can override any of these methods to provide cheaper (or richer) results
+    for specific types, and are registered with `register_inspector()`.
+    """
+
+    def size(self, value: Any) -> Optional[Union[int, tuple]]:
+        if (shape := variable_shape(value)) is not None:
+            return shape
+
+        if hasattr(value, "__len__"):
+            return len(value)
+
+        if (size := getattr(value, "size", None)) is None:
+            return
+        if isinstance(size, int):
+            return size
+        if isinstance(size, tuple):
+            return size[0]
+
+    def size_bytes(
+        self,
+        value: Any,
+        estimator: Optional[MemoryEstimator] = None,
+    ) -> Optional[int]:
+        """Returns the estimated deep size of the variable. Pass the same `estimator`
+        for all variables in a namespace so shared objects are only counted once.
+        """
+        return estimate_size_bytes(value, estimator=estimator)
+
+    def extra(self, value: Any) -> dict:
+        return {}
+
+
+def dataframe_fingerprint(value: Any) -> Hashable:
+    """Returns a cheap structural fingerprint of a DataFrame-like object (shape, column
+    names, column dtypes and the identity of its index) to tell whether cached metadata
+    is still valid.
+    """
+    columns = getattr(value, "columns", None)
+    try:
+        columns_hash = hash(tuple(columns)) if columns is not None else None
+    except TypeError:
+        columns_hash = None
+    dtypes = getattr(value, "dtypes", None)
+    if isinstance(dtypes, dict):
+        dtypes = dtypes.values()
+    try:
+        dtypes_hash = hash(tuple(dtypes)) if dtypes is not None else None
+    except TypeError:
+        dtypes_hash = None
+    # assigning a new index (or sorting/renaming it in place) replaces the index object
+    index_id = id(getattr(value, "index", None))
+    return (variable_shape(value), columns_hash, dtypes_hash, index_id)
+
+
+class DataFrameInspector(VariableInspector):
+    """Inspector for pandas/polars/modin DataFrames.
+
+    Gathering columns/dtypes/index can be slow for large frames, so the results are cached
+    per DataFrame and reused for as long as its shape, columns, dtypes and index are unchanged.
+    """
+
+    def __init__(self, cache_size: int = DEFAULT_MAXSIZE):
+        self.cache = ObjectCache(maxsize=cache_size)
+
+    def extra(self, value: Any) -> dict:
+        fingerprint = dataframe_fingerprint(value)
+        if (extra := self.cache.get(value, fingerprint)) is not None:
+            return extra
 
-    if variable_type(value) == "DataFrame":
         columns = variable_extra_list_property(value, "columns")
-        extra["columns"] = columns
-        # temporarily removing dtypes and index for performance reasons
-        # extra["dtypes"] = variable_extra_dtypes(value, columns)
-        # extra["index"] = variable_extra_list_property(value, "index")
+        index = variable_extra_list_property(value, "index")
+        extra = {
+            "columns": columns,
+            "dtypes": variable_extra_dtypes(value, columns),
+            # index values may be timestamps, etc.
+            "index": [item if isinstance(item, JSON_SCALAR_TYPES) else str(item) for item in index],
+        }
+        self.cache.set(value, fingerprint, extra)
+        return extra
+
+
+class OtherDataFrameInspector(VariableInspector):
+    """Inspector for DataFrames from other libraries (cuDF, Dask, PySpark, Vaex...), matched
+    by class name. Only their columns are reported, not their dtypes, index or size in bytes,
+    since computing those for a (possibly lazy or distributed) frame could take a very long time.
+    """
+
+    def size_bytes(
+        self,
+        value: Any,
+        estimator: Optional[MemoryEstimator] = None,
+    ) -> Optional[int]:
+        return None
 
-    if variable_type(value) == "dict":
-        extra["keys"] = list(value.keys())[:100]
+    def extra(self, value: Any) -> dict:
+        return {"columns": variable_extra_list_property(value, "columns")}
 
-    return extra
 
+class DictInspector(VariableInspector):
+    def extra(self, value: Any) -> dict:
+        return {"keys": list(itertools.islice(value.keys(), 100))}
 
-def variable_to_model(name: str, value: Any) -> VariableModel:
+
+INSPECTORS: InspectorRegistry[VariableInspector] = InspectorRegistry(default=VariableInspector())
+INSPECTORS.register(dict, DictInspector())
+DATAFRAME_INSPECTOR = DataFrameInspector()
+for dataframe_type in DATAFRAME_TYPES:
+    INSPECTORS.register(dataframe_type, DATAFRAME_INSPECTOR)
+# any other library's DataFrame
+INSPECTORS.register("DataFrame", OtherDataFrameInspector())
+
+
+def register_inspector(key: Union[type, str], inspector: VariableInspector) -> None:
+    """Registers an inspector for a class, or a module-qualified class name like
+    `"pandas.core.frame.DataFrame"` to avoid importing the class' library.
+    """
+    INSPECTORS.register(key, inspector)
+
+
+def variable_inspector(value: Any) -> VariableInspector:
+    """Returns the registered inspector for a variable's type."""
+    return INSPECTORS.lookup(value)
+
+
+class SlowTypes:
+    """Types that exceeded their time budget during a budgeted inspection.
+
+    Entries expire after `ttl` seconds, so one slow instance doesn't get its type skipped
+    for the rest of the session. Builtin types are never recorded, since how long they take
+    depends on the instance (a huge list) rather than the type.
+    """
+
+    def __init__(self, ttl: float = SLOW_TYPE_TTL):
+        self.ttl = ttl
+        # type -> when it stops being considered slow; weak so notebook-defined
+        # classes can still be garbage collected
+        self._expiry: "weakref.WeakKeyDictionary[type, float]" = weakref.WeakKeyDictionary()
+
+    def add(self, cls: type) -> None:
+        if getattr(cls, "__module__", None) == "builtins":
+            return
+        try:
+            self._expiry[cls] = time.monotonic() + self.ttl
+        except TypeError:
+            # type can't be weakly referenced
+            pass
+
+    def __contains__(self, cls: type) -> bool:
+        try:
+            expiry = self._expiry.get(cls)
+        except TypeError:
+            return False
+        if expiry is None:
+            return False
+        if time.monotonic() >= expiry:
+            del self._expiry[cls]
+            return False
+        return True
+
+    def clear(self) -> None:
+        self._expiry.clear()
+
+
+SLOW_TYPES = SlowTypes()
+
+
+def variable_to_model(
+    name: str,
+    value: Any,
+    time_budget: Optional[float] = None,
+    estimator: Optional[MemoryEstimator] = None,
+    size_bytes: Optional[int] = None,
+) -> VariableModel:
     """Gathers properties of a variable to send to the sidecar through
     a variable explorer comm message.
     Should always have `name` and `type` properties; `error` will show
     conversion/inspection errors for size/size_bytes/sample_value.
+
+    If a `time_budget` (in seconds) is provided, we stop probing the variable once the
+    budget is used up and set `timed_out`, keeping whatever properties were gathered.
+    The variable's type is then remembered as slow for a while (see SlowTypes), and later
+    budgeted calls will skip the expensive probes for that type entirely.
+    (A single probe can't be interrupted, so one slow probe may still exceed the budget.)
+
+    `estimator` is used for `size_bytes`, and should be shared across a namespace scan
+    so objects referenced by multiple variables are only counted once. If `size_bytes` was
+    already estimated (e.g. to sort by it), it's used as is.
     """
     basic_props = {
         "name": name,
@@ -174,17 +374,33 @@ def variable_to_model(name: str, value: Any) -> VariableModel:
         "module": variable_module(value),
     }
 
+    if time_budget is not None and type(value) in SLOW_TYPES:
+        return VariableModel(timed_out=True, **basic_props)
+
+    inspector = variable_inspector(value)
+    # cheapest probes first, so a timeout still leaves the most useful properties
+    probes = {
+        "size": inspector.size,
+        "size_bytes": lambda value: (
+            size_bytes if size_bytes is not None else inspector.size_bytes(value, estimator)
+        ),
+        "extra": inspector.extra,
+        "sample_value": variable_sample_value,
+    }
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+
     # in the event we run into any parsing/validation errors,
     # we'll still send the variable model with basic properties
     # and an error message
+    props = {}
     try:
-        return VariableModel(
-            sample_value=variable_sample_value(value),
-            size=variable_size(value),
-            size_bytes=variable_size_bytes(value),
-            extra=variable_extra_properties(value),
-            **basic_props,
-        )
+        for prop_name, probe in probes.items():
+            props[prop_name] = probe(value)
+            if deadline is not None and time.perf_counter() > deadline:
+                SLOW_TYPES.add(type(value))
+                props["timed_out"] = True
+                break
+        return VariableModel(**props, **basic_props)
     except Exception as e:
         basic_props["error"] = f"{e!r}"
 
@@ -192,60 +408,386 @@ def variable_to_model(name: str, value: Any) -> VariableModel:
 
 
 def is_json_serializable(value: Any) -> bool:
-    """Returns True if a value is JSON serializable."""
-    try:
-        json.dumps(value)
-        return True
-    except (TypeError, ValueError):
-        # either one of these may appear:
-        # - TypeError: X is not JSON serializable
-        # - ValueError: Can't clean for JSON: X
-        # and we won't try to get a string repr here since that could
-        # potentially take a while depending on any custom __repr__ methods
-        return False
+    """Returns True if a value is JSON serializable.
+
+    This checks types without encoding the value, so it stops at the first
+    unserializable item. We won't try to get a string repr here since that could
+    potentially take a while depending on any custom __repr__ methods.
+    """
+    return is_json_safe(value)
 
 
 def json_clean(value: Any, max_length: Optional[int] = None) -> Optional[str]:
-    """Ensures a value is JSON serializable, converting to a string if necessary.
+    """Ensures a value is JSON serializable, replacing unserializable values with None.
 
-    Recursively cleans values of dictionaries, and items in lists, sets, and tuples
-    if necessary.
+    Recursively cleans values of dictionaries, and items in lists and tuples
+    in a single pass; see `sidecar_comms.serialization.to_json_safe`. If `max_length`
+    is provided, the value is truncated to about that many bytes of JSON.
     """
-    max_length = max_length or MAX_STRING_LENGTH
+    if max_length is None:
+        return to_json_safe(value)
+    return to_json_safe(value, max_bytes=max_length)
 
-    if isinstance(value, dict):
-        value = {k: json_clean(v) for k, v in value.items()}
-    elif isinstance(value, tuple(CONTAINER_TYPES)):
-        container_type = type(value)
-        value = container_type([json_clean(v) for v in value])
 
-    if is_json_serializable(value):
-        return value
+DEFAULT_SKIP_PREFIXES = [
+    "_",
+    "In",
+    "Out",
+    "get_ipython",
+    "exit",
+    "quit",
+    "open",
+]
 
 
-def get_kernel_variables(skip_prefixes: list = None):
-    """Returns a list of variables in the kernel."""
+def iter_kernel_variables(skip_prefixes: list = None) -> Iterator[Tuple[str, Any]]:
+    """Yields (name, value) pairs from the user namespace, skipping
+    any names that start with one of the `skip_prefixes`.
+    """
     variables = dict(get_ipython_shell().user_ns)
+    skip_prefixes = tuple(skip_prefixes or DEFAULT_SKIP_PREFIXES)
+    for name, value in variables.items():
+        if name.startswith(skip_prefixes):
+            continue
+        yield name, value
+
+
+def query_matches_name(query: VariableQuery, name: str) -> bool:
+    if query.name is not None and not fnmatch.fnmatchcase(name, query.name):
+        return False
+    if query.name_regex is not None and re.search(query.name_regex, name) is None:
+        return False
+    return True
+
+
+def query_matches_value(query: VariableQuery, value: Any) -> bool:
+    """Checks the type and module filters; these only look at the value's type."""
+    if query.types is not None:
+        value_type = type(value)
+        type_names = {value_type.__name__, qualified_type_name(value_type)}
+        if type_names.isdisjoint(query.types):
+            return False
+    if query.modules is not None:
+        module = variable_module(value)
+        if not isinstance(module, str) or not any(
+            module == prefix or module.startswith(f"{prefix}.") for prefix in query.modules
+        ):
+            return False
+    return True
+
+
+def parse_query(query: Optional[Union[dict, VariableQuery]]) -> Optional[VariableQuery]:
+    if isinstance(query, dict):
+        return VariableQuery.parse_obj(query)
+    return query
+
+
+def variable_sort_size(value: Any) -> float:
+    """Returns the number of items (or cells, for shaped values) in a variable,
+    or -1 if it can't be determined."""
+    try:
+        size = variable_size(value)
+    except Exception:
+        return -1
+    if isinstance(size, tuple):
+        return math.prod(size)
+    return size if isinstance(size, int) else -1
+
 
-    skip_prefixes = skip_prefixes or [
-        "_",
-        "In",
-        "Out",
-        "get_ipython",
-        "exit",
-        "quit",
-        "open",
-    ]
+def variable_sort_size_bytes(value: Any, estimator: Optional[MemoryEstimator] = None) -> float:
+    try:
+        size_bytes = variable_inspector(value).size_bytes(value, estimator=estimator)
+    except Exception:
+        return -1
+    return size_bytes if size_bytes is not None else -1
+
+
+def iter_query_variables(
+    query: Optional[VariableQuery] = None,
+    skip_prefixes: list = None,
+    estimator: Optional[MemoryEstimator] = None,
+    sizes: Optional[dict] = None,
+) -> Iterator[Tuple[str, Any]]:
+    """Yields the (name, value) pairs matching a query, sorted and limited.
+
+    Name, type and module filters are checked before anything is inspected, and only the
+    sort key is computed for matching variables; the top `limit` of those are picked with
+    a heap instead of sorting everything.
+
+    When sorting by `size_bytes`, sizes are estimated with `estimator`, which should be the
+    one used for the returned variables' models, and recorded by name in `sizes` so the
+    models can report the same sizes they were sorted by without estimating them again.
+    """
+    variables = iter_kernel_variables(skip_prefixes)
+    if query is None:
+        yield from variables
+        return
+
+    variables = (
+        (name, value)
+        for name, value in variables
+        if query_matches_name(query, name) and query_matches_value(query, value)
+    )
+    if query.sort is None:
+        yield from itertools.islice(variables, query.limit)
+        return
+
+    if query.sort == "name":
+        descending = bool(query.descending)
+        keyed = ((name, name, value) for name, value in variables)
+    else:
+        descending = query.descending is None or query.descending
+        if query.sort == "size":
+            keyed = ((variable_sort_size(value), name, value) for name, value in variables)
+        else:
+            keyed = (
+                (variable_sort_size_bytes(value, estimator), name, value)
+                for name, value in variables
+            )
+
+    sort_key = operator.itemgetter(0)
+    if query.limit is None:
+        ranked = sorted(keyed, key=sort_key, reverse=descending)
+    elif descending:
+        ranked = heapq.nlargest(query.limit, keyed, key=sort_key)
+    else:
+        ranked = heapq.nsmallest(query.limit, keyed, key=sort_key)
+    for key, name, value in ranked:
+        if query.sort == "size_bytes" and sizes is not None and key >= 0:
+            sizes[name] = key
+        yield name, value
+
+
+def variable_model_dict(
+    name: str,
+    value: Any,
+    time_budget: Optional[float] = None,
+    estimator: Optional[MemoryEstimator] = None,
+    size_bytes: Optional[int] = None,
+) -> dict:
+    """Returns the JSON-cleaned VariableModel dictionary for a variable."""
+    variable_model = variable_to_model(
+        name=name,
+        value=value,
+        time_budget=time_budget,
+        estimator=estimator,
+        size_bytes=size_bytes,
+    )
+    return to_json_safe(variable_model.dict())
+
+
+def get_kernel_variables(
+    skip_prefixes: list = None, query: Optional[Union[dict, VariableQuery]] = None
+):
+    """Returns a list of variables in the kernel.
+    If a `query` (see VariableQuery) is provided, only the matching variables are inspected.
+    """
     variable_data = {}
-    for name, value in variables.items():
-        if name.startswith(tuple(skip_prefixes)):
+    estimator = MemoryEstimator()
+    sizes = {}
+    for name, value in iter_query_variables(parse_query(query), skip_prefixes, estimator, sizes):
+        variable_data[name] = variable_model_dict(
+            name, value, estimator=estimator, size_bytes=sizes.get(name)
+        )
+    return variable_data
+
+
+def get_kernel_variable_index(skip_prefixes: list = None) -> dict:
+    """Returns a lightweight index of variables in the kernel with only the
+    name, type, and module of each, without any (potentially expensive) inspection.
+    """
+    return {
+        name: {
+            "name": name,
+            "type": variable_type(value),
+            "module": variable_module(value),
+        }
+        for name, value in iter_kernel_variables(skip_prefixes)
+    }
+
+
+def get_kernel_variable_details(names: List[str]) -> dict:
+    """Returns full variable models for the requested variable names.
+    Names that no longer exist in the user namespace map to None.
+    """
+    user_ns = get_ipython_shell().user_ns
+    variable_data = {}
+    estimator = MemoryEstimator()
+    for name in names:
+        if name not in user_ns:
+            variable_data[name] = None
             continue
-        variable_model = variable_to_model(name=name, value=value)
-        cleaned_variable_model_dict = {k: json_clean(v) for k, v in variable_model.dict().items()}
-        variable_data[name] = cleaned_variable_model_dict
+        variable_data[name] = variable_model_dict(name, user_ns[name], estimator=estimator)
     return variable_data
 
 
+def get_kernel_variables_page(
+    cursor: Optional[str] = None,
+    time_budget: Optional[float] = None,
+    variable_time_budget: Optional[float] = None,
+    skip_prefixes: list = None,
+) -> dict:
+    """Returns variables in the kernel, in name order, starting after `cursor`, until
+    `time_budget` (in seconds) is used up. Each variable is also limited to
+    `variable_time_budget`.
+
+    The returned `cursor` is the name of the last variable returned, to pass to a follow-up
+    request for the next page, or None if all variables were returned. Since pages resume by
+    name rather than by position, variables added or deleted between pages don't cause
+    others to be skipped or repeated. At least one variable is returned per page so we
+    always make progress.
+    """
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+
+    variable_data = {}
+    estimator = MemoryEstimator()
+    next_cursor = None
+    variables = sorted(iter_kernel_variables(skip_prefixes), key=operator.itemgetter(0))
+    if cursor is not None:
+        start = bisect.bisect_right([name for name, _ in variables], cursor)
+        variables = variables[start:]
+    for name, value in variables:
+        if variable_data and deadline is not None and time.perf_counter() > deadline:
+            next_cursor = next(reversed(variable_data))
+            break
+        variable_data[name] = variable_model_dict(
+            name,
+            value,
+            time_budget=variable_time_budget,
+            estimator=estimator,
+        )
+    return {"variables": variable_data, "cursor": next_cursor}
+
+
+class VariableChunker:
+    """Groups variable models into chunks of roughly `chunk_bytes` of JSON.
+
+    Every chunk has the same `stream_id` and an increasing `sequence` number. A variable
+    larger than `chunk_bytes` is sent in its own chunk.
+    """
+
+    def __init__(
+        self,
+        chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+        variable_time_budget: Optional[float] = None,
+    ):
+        self.chunk_bytes = chunk_bytes
+        self.variable_time_budget = variable_time_budget
+        self.stream_id = uuid.uuid4().hex
+        self.sequence = 0
+        self.total = 0
+        self.variable_data = {}
+        self.nbytes = 0
+        self.estimator = MemoryEstimator()
+        # sizes already estimated (with the same estimator) to sort variables
+        self.sizes = {}
+
+    def _chunk(self) -> dict:
+        chunk = {
+            "stream_id": self.stream_id,
+            "sequence": self.sequence,
+            "variables": self.variable_data,
+            "complete": False,
+        }
+        self.sequence += 1
+        self.variable_data = {}
+        self.nbytes = 0
+        return chunk
+
+    def add(self, name: str, value: Any) -> Optional[dict]:
+        """Adds a variable, returning the previous chunk if this variable doesn't fit in it."""
+        model = variable_to_model(
+            name,
+            value,
+            time_budget=self.variable_time_budget,
+            estimator=self.estimator,
+            size_bytes=self.sizes.get(name),
+        )
+        # a serializer per variable so its size estimate (and byte limit) isn't shared
+        serializer = BoundedJSONSerializer()
+        model_data = serializer.serialize(model.dict())
+        chunk = None
+        if self.variable_data and self.nbytes + serializer.nbytes > self.chunk_bytes:
+            chunk = self._chunk()
+        self.variable_data[name] = model_data
+        self.nbytes += serializer.nbytes
+        self.total += 1
+        return chunk
+
+    def finish(self) -> List[dict]:
+        """Returns the remaining chunk (if any) and the final, `complete` chunk."""
+        chunks = [self._chunk()] if self.variable_data else []
+        chunks.append(
+            {
+                "stream_id": self.stream_id,
+                "sequence": self.sequence,
+                "variables": {},
+                "complete": True,
+                "total": self.total,
+            }
+        )
+        return chunks
+
+
+def iter_kernel_variable_chunks(
+    chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+    variable_time_budget: Optional[float] = None,
+    skip_prefixes: list = None,
+    query: Optional[Union[dict, VariableQuery]] = None,
+) -> Iterator[dict]:
+    """Yields variable models in chunks of roughly `chunk_bytes` of JSON, so large snapshots
+    can be sent (and rendered) progressively without building the whole snapshot at once.
+
+    Every chunk has the same `stream_id` and an increasing `sequence` number. After the last
+    variable, a final chunk with no variables, `complete=True` and the `total` number of
+    variables is yielded. A variable larger than `chunk_bytes` is sent in its own chunk.
+    Variables can be filtered and sorted with a `query` (see VariableQuery).
+    """
+    chunker = VariableChunker(chunk_bytes=chunk_bytes, variable_time_budget=variable_time_budget)
+    variables = iter_query_variables(
+        parse_query(query), skip_prefixes, chunker.estimator, chunker.sizes
+    )
+    for name, value in variables:
+        if (chunk := chunker.add(name, value)) is not None:
+            yield chunk
+    yield from chunker.finish()
+
+
+async def get_kernel_variables_async(
+    skip_prefixes: list = None, query: Optional[Union[dict, VariableQuery]] = None
+) -> dict:
+    """Same as get_kernel_variables, handing control back to the event loop between
+    variables so other messages can be handled while a large namespace is inspected."""
+    variable_data = {}
+    estimator = MemoryEstimator()
+    sizes = {}
+    variables = iter_query_variables(parse_query(query), skip_prefixes, estimator, sizes)
+    async for name, value in cooperative(variables):
+        variable_data[name] = variable_model_dict(
+            name, value, estimator=estimator, size_bytes=sizes.get(name)
+        )
+    return variable_data
+
+
+async def aiter_kernel_variable_chunks(
+    chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+    variable_time_budget: Optional[float] = None,
+    skip_prefixes: list = None,
+    query: Optional[Union[dict, VariableQuery]] = None,
+) -> AsyncIterator[dict]:
+    """Same as iter_kernel_variable_chunks, handing control back to the event loop
+    between variables."""
+    chunker = VariableChunker(chunk_bytes=chunk_bytes, variable_time_budget=variable_time_budget)
+    variables = iter_query_variables(
+        parse_query(query), skip_prefixes, chunker.estimator, chunker.sizes
+    )
+    async for name, value in cooperative(variables):
+        if (chunk := chunker.add(name, value)) is not None:
+            yield chunk
+    for chunk in chunker.finish():
+        yield chunk
+
+
 def rename_kernel_variable(old_name: str, new_name: str) -> str:
     """Renames a variable in the kernel."""
     ipython = get_ipython_shell()
@@ -253,6 +795,7 @@ def rename_kernel_variable(old_name: str, new_name: str) -> str:
         if new_name:
             ipython.user_ns[new_name] = ipython.user_ns[old_name]
         del ipython.user_ns[old_name]
+        mark_namespace_changes(old_name, new_name)
         return "success"
     except Exception as e:
         return str(e)
@@ -262,6 +805,7 @@ def set_kernel_variable(name: str, value: Any) -> str:
     """Sets a variable in the kernel."""
     try:
         get_ipython_shell().user_ns[name] = value
+        mark_namespace_changes(name)
         return "success"
     except Exception as e:
         return str(e)
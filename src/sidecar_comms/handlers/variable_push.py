@@ -0,0 +1,108 @@
+"""
+Opt-in automatic variable explorer updates.
+
+Rather than having the sidecar poll `get_kernel_variables`, this hooks into IPython's
+`post_run_cell` event and pushes a variable delta (see `variable_snapshot.py`) over the
+"variable_explorer" comm after cells run.
+
+Back-to-back executions (e.g. "run all") are coalesced: the first `post_run_cell` schedules
+a push `window` seconds out on the kernel's event loop, and any cells that finish before then
+are folded into that same push.
+"""
+import asyncio
+from functools import lru_cache
+from typing import Optional
+
+from sidecar_comms.handlers.variable_snapshot import get_kernel_variable_changes
+from sidecar_comms.outbound import comm_manager
+from sidecar_comms.shell import get_ipython_shell
+
+DEFAULT_PUSH_WINDOW = 0.5  # seconds
+PUSH_COMM_TARGET = "variable_explorer"
+
+
+class VariablePusher:
+    """Pushes variable explorer deltas to the sidecar after cells are executed."""
+
+    def __init__(self, window: float = DEFAULT_PUSH_WINDOW):
+        self.window = window
+        self.enabled = False
+        # last generation sent to the sidecar; None means the next push is a full snapshot
+        self.generation: Optional[int] = None
+        self._pending: Optional[asyncio.TimerHandle] = None
+
+    def enable(self, window: Optional[float] = None) -> None:
+        """Start pushing variable deltas after every cell execution."""
+        if window is not None:
+            self.window = window
+        if self.enabled:
+            return
+        self.generation = None
+        get_ipython_shell().events.register("post_run_cell", self._on_post_run_cell)
+        self.enabled = True
+
+    def disable(self) -> None:
+        """Stop pushing variable deltas and drop any scheduled push."""
+        self._cancel_pending()
+        if not self.enabled:
+            return
+        try:
+            get_ipython_shell().events.unregister("post_run_cell", self._on_post_run_cell)
+        except ValueError:
+            # already unregistered
+            pass
+        self.enabled = False
+
+    def _cancel_pending(self) -> None:
+        if self._pending is not None:
+            self._pending.cancel()
+            self._pending = None
+
+    def _on_post_run_cell(self, result=None) -> None:
+        self.schedule()
+
+    def schedule(self) -> None:
+        """Schedule a push within the configured window, unless one is already scheduled."""
+        if self._pending is not None:
+            # a push is already coming; this execution will be included in it
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # no event loop to defer to (e.g. plain IPython); push right away
+            loop = None
+
+        if loop is None or self.window <= 0:
+            self.push()
+            return
+        self._pending = loop.call_later(self.window, self.push)
+
+    def push(self) -> Optional[dict]:
+        """Computes the variable delta since the last push and sends it to the sidecar,
+        returning the delta (or None if nothing changed).
+        """
+        self._pending = None
+        changes = get_kernel_variable_changes(since_generation=self.generation)
+        if changes["generation"] == self.generation and not changes["full"]:
+            # nothing changed since the last push
+            return
+        self.generation = changes["generation"]
+        comm = comm_manager().open_comm(PUSH_COMM_TARGET)
+        comm.send(handler="variable_changes", body=changes)
+        return changes
+
+
+@lru_cache
+def variable_pusher() -> VariablePusher:
+    return VariablePusher()
+
+
+def configure_variable_push(enabled: bool, window: Optional[float] = None) -> dict:
+    """Turns automatic variable explorer pushes on/off, returning the current settings."""
+    pusher = variable_pusher()
+    if enabled:
+        pusher.enable(window=window)
+    else:
+        pusher.disable()
+    return {"enabled": pusher.enabled, "window": pusher.window}
@@ -0,0 +1,264 @@
+"""
+Incremental (delta) variable explorer snapshots.
+
+Instead of re-inspecting and re-serializing the whole user namespace on every
+request, we keep the last snapshot keyed by variable name along with a cheap
+fingerprint of each value. Only variables whose fingerprint changed are run
+through `variable_to_model` again.
+
+Every scan that finds at least one change bumps the snapshot generation. The sidecar
+can send back the last generation it saw to get only the changes since then:
+
+snapshot = VariableSnapshot()
+snapshot.changes_since(None)
+>>> {"generation": 1, "since_generation": None, "full": True, "added": {...}, ...}
+snapshot.changes_since(1)
+>>> {"generation": 2, "since_generation": 1, "full": False, "added": {}, "changed": {...}, ...}
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from sidecar_comms.handlers.inspectors import PANDAS_TYPES, POLARS_TYPES, InspectorRegistry
+from sidecar_comms.handlers.memory import MemoryEstimator
+from sidecar_comms.handlers.namespace_tracking import (
+    DirtyKeys,
+    NamespaceTracker,
+    active_namespace_tracker,
+)
+from sidecar_comms.handlers.variable_explorer import (
+    DEFAULT_SKIP_PREFIXES,
+    SLOW_TYPES,
+    iter_kernel_variables,
+    variable_model_dict,
+    variable_size,
+)
+from sidecar_comms.shell import get_ipython_shell
+
+# how many removed variable names we remember before older generations
+# can no longer be diffed against (and a full snapshot is sent instead)
+MAX_REMOVED_HISTORY = 10000
+
+
+# types whose len()/shape is O(1), so they're fingerprinted even if inspecting them was slow
+# (builtins are never recorded as slow types)
+CONSTANT_TIME_SIZE: InspectorRegistry[bool] = InspectorRegistry(default=False)
+for constant_size_type in ("numpy.ndarray",) + PANDAS_TYPES + POLARS_TYPES:
+    CONSTANT_TIME_SIZE.register(constant_size_type, True)
+
+
+def variable_version(value: Any) -> Optional[int]:
+    """Returns an in-place modification counter if the type provides one
+    (e.g. `torch.Tensor._version`).
+    """
+    version = getattr(value, "_version", None)
+    if isinstance(version, int) and not isinstance(version, bool):
+        return version
+
+
+def variable_fingerprint(value: Any) -> Tuple[Hashable, ...]:
+    """Returns a cheap fingerprint of a variable used to detect changes between snapshots.
+
+    This only looks at the object identity, type, length/shape and a version counter
+    (where available), so in-place changes that don't affect any of those (like
+    `some_dict["a"] = 2` for an existing key) won't be detected.
+    """
+    if type(value) in SLOW_TYPES and not CONSTANT_TIME_SIZE.lookup(value):
+        # don't risk calling a slow __len__/.shape on every scan
+        return (id(value), type(value), None, None)
+    try:
+        size = variable_size(value)
+    except Exception:
+        size = None
+    try:
+        version = variable_version(value)
+    except Exception:
+        version = None
+    return (id(value), type(value), size, version)
+
+
+@dataclass
+class SnapshotEntry:
+    fingerprint: Tuple[Hashable, ...]
+    data: dict
+    added_generation: int
+    changed_generation: int
+
+
+class VariableSnapshot:
+    """Keeps track of the last variable explorer snapshot to generate deltas."""
+
+    def __init__(self, max_removed_history: int = MAX_REMOVED_HISTORY):
+        self.generation = 0
+        self.entries: Dict[str, SnapshotEntry] = {}
+        self.removed: Dict[str, int] = {}
+        self.max_removed_history = max_removed_history
+        # oldest generation we can still produce an accurate delta for
+        self._horizon = 0
+        self._dirty: Optional[DirtyKeys] = None
+        self._tracker: Optional[NamespaceTracker] = None
+
+    def _dirty_names(self, rescan: bool = False) -> Optional[set]:
+        """Returns the names changed since the last update if the user namespace is
+        being tracked (see `namespace_tracking.py`), or None if a full scan is needed.
+        """
+        tracker = active_namespace_tracker()
+        if tracker is None:
+            self._dirty = None
+            self._tracker = None
+            return
+        if self._dirty is None or self._tracker is not tracker:
+            # start collecting changes from here, after an initial full scan
+            self._dirty = tracker.subscribe()
+            self._tracker = tracker
+            return
+        if rescan or self._dirty.overflowed:
+            self._dirty.drain()
+            return
+        return self._dirty.drain()
+
+    def update(self, skip_prefixes: list = None, rescan: bool = False) -> int:
+        """Scans the user namespace, re-inspecting only variables whose fingerprint
+        changed since the last scan. Returns the (possibly new) generation number.
+
+        If namespace tracking is enabled, only names that were assigned or deleted since the
+        last update are checked, unless `rescan` is True. (In-place mutations are only picked
+        up by a full scan in that case.)
+        """
+        dirty_names = self._dirty_names(rescan=rescan)
+        if dirty_names is None:
+            variables = iter_kernel_variables(skip_prefixes)
+        else:
+            user_ns = get_ipython_shell().user_ns
+            skip = tuple(skip_prefixes or DEFAULT_SKIP_PREFIXES)
+            variables = (
+                (name, user_ns[name])
+                for name in dirty_names
+                if name in user_ns and not name.startswith(skip)
+            )
+
+        seen = set()
+        changed = {}
+        added = {}
+        # only shared between re-inspected variables, so memory shared with
+        # unchanged variables may be counted again
+        estimator = MemoryEstimator()
+        for name, value in variables:
+            seen.add(name)
+            fingerprint = variable_fingerprint(value)
+            entry = self.entries.get(name)
+            if entry is None:
+                data = variable_model_dict(name, value, estimator=estimator)
+                added[name] = (fingerprint, data)
+            elif entry.fingerprint != fingerprint:
+                data = variable_model_dict(name, value, estimator=estimator)
+                changed[name] = (fingerprint, data)
+
+        if dirty_names is None:
+            removed = [name for name in self.entries if name not in seen]
+        else:
+            removed = [name for name in dirty_names if name in self.entries and name not in seen]
+        if not (added or changed or removed):
+            return self.generation
+
+        self.generation += 1
+        for name, (fingerprint, data) in added.items():
+            self.entries[name] = SnapshotEntry(
+                fingerprint=fingerprint,
+                data=data,
+                added_generation=self.generation,
+                changed_generation=self.generation,
+            )
+            self.removed.pop(name, None)
+        for name, (fingerprint, data) in changed.items():
+            entry = self.entries[name]
+            entry.fingerprint = fingerprint
+            entry.data = data
+            entry.changed_generation = self.generation
+        for name in removed:
+            del self.entries[name]
+            self.removed[name] = self.generation
+        self._trim_removed()
+        return self.generation
+
+    def _trim_removed(self) -> None:
+        """Drops the oldest removal records once we're over the history limit."""
+        overflow = len(self.removed) - self.max_removed_history
+        if overflow <= 0:
+            return
+        # dicts are insertion-ordered, and removals are recorded in generation order
+        for name in list(self.removed)[:overflow]:
+            self._horizon = max(self._horizon, self.removed.pop(name))
+
+    def changes_since(
+        self,
+        since_generation: Optional[int] = None,
+        skip_prefixes: list = None,
+        rescan: bool = False,
+    ) -> dict:
+        """Updates the snapshot and returns added/changed/removed variables since the
+        provided generation. If no generation is provided (or it's one we can't diff
+        against anymore), every variable is returned as `added` with `full` set to True.
+        """
+        self.update(skip_prefixes=skip_prefixes, rescan=rescan)
+
+        full = (
+            since_generation is None
+            or since_generation < self._horizon
+            or since_generation > self.generation
+        )
+        if full:
+            return {
+                "generation": self.generation,
+                "since_generation": since_generation,
+                "full": True,
+                "added": {name: entry.data for name, entry in self.entries.items()},
+                "changed": {},
+                "removed": [],
+            }
+
+        added = {}
+        changed = {}
+        for name, entry in self.entries.items():
+            if entry.added_generation > since_generation:
+                added[name] = entry.data
+            elif entry.changed_generation > since_generation:
+                changed[name] = entry.data
+        removed = [
+            name for name, generation in self.removed.items() if generation > since_generation
+        ]
+        return {
+            "generation": self.generation,
+            "since_generation": since_generation,
+            "full": False,
+            "added": added,
+            "changed": changed,
+            "removed": removed,
+        }
+
+    def reset(self) -> None:
+        """Clears all snapshot state; the next delta will be a full snapshot."""
+        self.generation = 0
+        self.entries.clear()
+        self.removed.clear()
+        self._horizon = 0
+        self._dirty = None
+        self._tracked_namespace = None
+
+
+@lru_cache
+def variable_snapshot() -> VariableSnapshot:
+    return VariableSnapshot()
+
+
+def get_kernel_variable_changes(
+    since_generation: Optional[int] = None,
+    skip_prefixes: list = None,
+    rescan: bool = False,
+) -> dict:
+    """Returns the variables that were added/changed/removed since `since_generation`."""
+    return variable_snapshot().changes_since(
+        since_generation=since_generation,
+        skip_prefixes=skip_prefixes,
+        rescan=rescan,
+    )
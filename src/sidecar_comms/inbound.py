@@ -2,94 +2,634 @@
 Comm target registration and message handling for inbound messages.
 (Sidecar -> kernel)
 """
+import asyncio
+import inspect
+import time
 import traceback
+from typing import Any, Awaitable, Callable, Dict, Generator, NamedTuple, Optional, Set, Type, Union
 
 from ipykernel.comm import Comm
 from IPython import get_ipython
+from pydantic import BaseModel, Field, create_model
+from typing_extensions import Annotated
 
+from sidecar_comms.compression import CompressingComm, compression_policy, configure_compression
 from sidecar_comms.form_cells.base import FORM_CELL_CACHE, parse_as_form_cell
+from sidecar_comms.form_cells.updates import form_cell_updates
+from sidecar_comms.handlers.namespace_tracking import (
+    configure_namespace_tracking,
+    mark_namespace_changes,
+)
+from sidecar_comms.handlers.previews import get_variable_binary_preview, get_variable_preview
 from sidecar_comms.handlers.variable_explorer import (
-    get_kernel_variables,
+    aiter_kernel_variable_chunks,
+    get_kernel_variable_details,
+    get_kernel_variable_index,
+    get_kernel_variables_async,
+    get_kernel_variables_page,
     rename_kernel_variable,
     set_kernel_variable,
 )
-from sidecar_comms.models import CommMessage
+from sidecar_comms.handlers.variable_push import configure_variable_push
+from sidecar_comms.handlers.variable_snapshot import get_kernel_variable_changes
+from sidecar_comms.metrics import comm_metrics, configure_comm_metrics, get_comm_metrics
+from sidecar_comms.models import (
+    AckMode,
+    AssignValueVariable,
+    Batch,
+    ConfigureCommMetrics,
+    ConfigureCompression,
+    ConfigureNamespaceTracking,
+    ConfigureOutboundBatching,
+    ConfigureVariablePush,
+    CreateFormCell,
+    DeferredReply,
+    GetCommMetrics,
+    GetKernelVariableChanges,
+    GetKernelVariableDetails,
+    GetKernelVariableIndex,
+    GetKernelVariables,
+    GetKernelVariablesPage,
+    GetVariableBinaryPreview,
+    GetVariablePreview,
+    InboundRequest,
+    RenameKernelVariable,
+    RequestID,
+    UpdateFormCell,
+    comm_message,
+)
+from sidecar_comms.outbound import configure_outbound_batching
+from sidecar_comms.tasks import run_eagerly, run_sync, running_loop
 
 
 def inbound_comm(comm, open_msg):
-    """Handles messages from the sidecar."""
+    """Handles messages from the sidecar.
+
+    The sidecar can include these options in the comm open data:
+     - `ack`: how inbound messages are acknowledged (see AckMode); defaults to a full echo
+     - `compression`: codecs it can decode (see `sidecar_comms.compression`)
+
+    Inbound messages with a `request_id` get exactly one reply (the handler's result, or
+    an error) tagged with that `request_id`, along with any streamed messages.
+    """
+    options = open_msg["content"]["data"] or {}
+    try:
+        ack_mode = AckMode(options.get("ack", AckMode.full))
+    except ValueError:
+        ack_mode = AckMode.full
+
+    # replies are compressed as negotiated with the sidecar when the comm was opened
+    compression = compression_policy().negotiate(options.get("compression"))
+    comm = CompressingComm(comm, compression_policy())
 
     @comm.on_msg
     def _recv(msg):
         data = msg["content"]["data"]
-        # echo for debugging
-        echo_msg = CommMessage(body={"status": "received", "data": data})
-        comm.send(echo_msg.dict())
+        request_id = data.get("request_id") if isinstance(data, dict) else None
+        if ack_mode == AckMode.full:
+            # echo for debugging
+            echo_msg = comm_message(
+                body={"status": "received", "data": data},
+                request_id=request_id,
+            )
+            comm.send(echo_msg)
+        elif ack_mode == AckMode.id:
+            ack_msg = comm_message(
+                body={
+                    "status": "received",
+                    "msg": data.get("msg") if isinstance(data, dict) else None,
+                },
+                request_id=request_id,
+            )
+            comm.send(ack_msg)
 
         try:
             handle_msg(data, comm)
         except Exception as e:
             # echo back any errors in the event we can't print/log to an output
-            error_msg = CommMessage(
+            body = {
+                "status": "error",
+                "error": f"error handling message: {e} -> {traceback.format_exc()}",
+            }
+            if ack_mode == AckMode.full:
+                body["msg"] = msg
+            error_msg = comm_message(body=body, request_id=request_id)
+            comm.send(error_msg)
+
+    comm.send(
+        {
+            "status": "connected",
+            "source": "sidecar_comms",
+            "ack": ack_mode.value,
+            "compression": compression,
+        }
+    )
+
+
+def handle_msg(data: dict, comm: Comm) -> None:
+    """Checks the message type and calls the appropriate handler."""
+    metrics = comm_metrics()
+    if not metrics.enabled:
+        _handle_msg(data, comm)
+        return
+
+    name = f"inbound.{data.get('msg')}"
+    metrics.increment(name)
+    start = time.perf_counter()
+    try:
+        task = _handle_msg(data, comm, received=start)
+    except Exception:
+        metrics.increment(f"{name}.errors")
+        metrics.observe_duration(name, start)
+        raise
+    if task is None:
+        # async handlers record their duration (and errors) once their task is done
+        metrics.observe_duration(name, start)
+
+
+def _handle_msg(data: dict, comm: Comm, received: Optional[float] = None) -> Optional[asyncio.Task]:
+    if data.get("msg") != "update_form_cell":
+        # other messages should see the effects of form cell updates sent before them
+        form_cell_updates().flush()
+    return INBOUND_HANDLERS.dispatch(data, comm, received=received)
+
+
+class CorrelatedComm:
+    """Wraps a Comm so that messages sent through it are tagged with a request_id."""
+
+    def __init__(self, comm: Comm, request_id: RequestID):
+        self._comm = comm
+        self.request_id = request_id
+        self.sent = 0
+
+    def send(self, data: Optional[dict] = None, metadata=None, buffers=None) -> None:
+        if isinstance(data, dict):
+            data = {**data, "request_id": self.request_id}
+        self.sent += 1
+        self._comm.send(data, metadata=metadata, buffers=buffers)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._comm, name)
+
+
+class InboundHandler(NamedTuple):
+    model: Type[InboundRequest]
+    handler: Callable[[InboundRequest, Comm], Union[Optional[dict], Awaitable[Optional[dict]]]]
+    # handler name for the reply message; defaults to the inbound message name
+    reply: str
+    # whether a newer message of this type cancels one that's still running
+    supersede: bool = False
+
+
+class RunningHandler(NamedTuple):
+    task: asyncio.Task
+    entry: InboundHandler
+    request: InboundRequest
+    comm: Comm
+
+
+class InboundHandlerRegistry:
+    """Maps inbound message names to their request models and handlers.
+
+    Handlers receive the parsed request model and the comm. If a handler returns a dict,
+    it's sent back as the body of a CommMessage with the registered `reply` handler name;
+    handlers that need to send something else (multiple messages, binary buffers) can send
+    through the comm themselves and return None.
+
+    Expensive handlers can be coroutine functions: they're run as tasks on the kernel's
+    event loop, and should hand control back to it regularly (see `sidecar_comms.tasks`)
+    so that cheap, synchronous handlers for messages received in the meantime run right
+    away instead of waiting behind them. If registered with `supersede=True`, a newer
+    message of the same type cancels a task that's still running; when the cancelled
+    message had a `request_id`, it gets a `{"status": "cancelled"}` reply.
+    """
+
+    def __init__(self):
+        self._handlers: Dict[str, InboundHandler] = {}
+        # discriminated union of all registered request models, built on first use
+        self._request_model: Optional[Type[BaseModel]] = None
+        # running handler tasks, and the latest one per message type for `supersede`
+        self._tasks: Set[asyncio.Task] = set()
+        self._latest_tasks: Dict[str, RunningHandler] = {}
+
+    def __contains__(self, msg: str) -> bool:
+        return msg in self._handlers
+
+    def get(self, msg: str) -> Optional[InboundHandler]:
+        return self._handlers.get(msg)
+
+    def register(
+        self,
+        model: Type[InboundRequest],
+        reply: Optional[str] = None,
+        supersede: bool = False,
+    ) -> Callable:
+        """Decorator registering a handler for the request model's `msg` name,
+        replacing any existing handler for that message."""
+        msg = model.__fields__["msg"].default
+        if not isinstance(msg, str):
+            raise ValueError(f"{model.__name__} must have a `msg` literal with a default value")
+
+        def decorator(handler: Callable) -> Callable:
+            self._handlers[msg] = InboundHandler(
+                model=model,
+                handler=handler,
+                reply=reply or msg,
+                supersede=supersede,
+            )
+            self._request_model = None
+            return handler
+
+        return decorator
+
+    def unregister(self, msg: str) -> None:
+        self._handlers.pop(msg, None)
+        self._request_model = None
+
+    def request_model(self) -> Type[BaseModel]:
+        if self._request_model is None:
+            models = tuple(entry.model for entry in self._handlers.values())
+            if len(models) == 1:
+                request_type = models[0]
+            else:
+                request_type = Annotated[Union[models], Field(discriminator="msg")]
+            self._request_model = create_model("InboundMessage", __root__=(request_type, ...))
+        return self._request_model
+
+    def parse(self, data: dict) -> InboundRequest:
+        """Validates an inbound message against the request model for its `msg`."""
+        return self.request_model().parse_obj(data).__root__
+
+    def dispatch(
+        self, data: dict, comm: Comm, received: Optional[float] = None
+    ) -> Optional[asyncio.Task]:
+        """Parses an inbound message and calls its handler. Unknown messages are ignored,
+        unless they have a `request_id`, in which case they get an error reply.
+
+        If the message has a `request_id`, everything sent in response is tagged with it,
+        and a `{"status": "ok"}` reply is sent for handlers that don't send anything.
+
+        Returns the task running the handler if it's async and was started on the event loop.
+        `received` is when the message arrived (from `time.perf_counter()`), if the task
+        should record its duration in the inbound metrics.
+        """
+        entry = self._handlers.get(data.get("msg"))
+        if entry is None:
+            if (request_id := data.get("request_id")) is not None:
+                msg = comm_message(
+                    body={"status": "error", "error": f"unknown message: {data.get('msg')!r}"},
+                    request_id=request_id,
+                )
+                comm.send(msg)
+            return None
+        request = self.parse(data)
+        if request.request_id is not None:
+            comm = CorrelatedComm(comm, request.request_id)
+        if entry.supersede and (running := self._latest_tasks.get(request.msg)) is not None:
+            self._cancel(running)
+        body = entry.handler(request, comm)
+        if inspect.isawaitable(body):
+            if running_loop() is None:
+                body = run_sync(body)
+            else:
+                return self._start_task(entry, request, body, comm, received)
+        self._reply(entry, body, comm)
+        return None
+
+    def _reply(self, entry: InboundHandler, body: Any, comm: Comm) -> None:
+        if isinstance(body, DeferredReply):
+            # the handler replies through the comm later
+            return
+        if body is None and isinstance(comm, CorrelatedComm) and not comm.sent:
+            body = {"status": "ok"}
+        if body is not None:
+            msg = comm_message(body=body, handler=entry.reply)
+            comm.send(msg)
+
+    def _start_task(
+        self,
+        entry: InboundHandler,
+        request: InboundRequest,
+        awaitable: Awaitable,
+        comm: Comm,
+        received: Optional[float] = None,
+    ) -> asyncio.Task:
+        task = asyncio.ensure_future(self._run_task(entry, request, awaitable, comm, received))
+        # the event loop only keeps weak references to tasks
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        task.add_done_callback(lambda _: self._on_task_done(request.msg, task, awaitable))
+        if entry.supersede:
+            self._latest_tasks[request.msg] = RunningHandler(task, entry, request, comm)
+        return task
+
+    def _cancel(self, running: RunningHandler) -> None:
+        """Cancels a running handler task, replying to its request right away so the reply
+        goes out before the one for the request that superseded it."""
+        if not running.task.cancel():
+            # already done
+            return
+        metrics = comm_metrics()
+        if metrics.enabled:
+            metrics.increment(f"inbound.{running.request.msg}.cancelled")
+        if isinstance(running.comm, CorrelatedComm):
+            msg = comm_message(body={"status": "cancelled"}, handler=running.entry.reply)
+            running.comm.send(msg)
+
+    def _on_task_done(self, msg: str, task: asyncio.Task, awaitable: Awaitable) -> None:
+        if (running := self._latest_tasks.get(msg)) is not None and running.task is task:
+            del self._latest_tasks[msg]
+        if task.cancelled() and inspect.iscoroutine(awaitable):
+            # a task cancelled before it started never awaited the handler's coroutine;
+            # closing it avoids a "never awaited" warning (and is a no-op otherwise)
+            awaitable.close()
+
+    async def _run_task(
+        self,
+        entry: InboundHandler,
+        request: InboundRequest,
+        awaitable: Awaitable,
+        comm: Comm,
+        received: Optional[float] = None,
+    ) -> None:
+        metrics = comm_metrics()
+        name = f"inbound.{request.msg}"
+        try:
+            body = await awaitable
+        except Exception as e:
+            if received is not None and metrics.enabled:
+                metrics.increment(f"{name}.errors")
+                metrics.observe_duration(name, received)
+            # there's no `on_msg` callback left to catch this, so report it the same way
+            msg = comm_message(
                 body={
                     "status": "error",
                     "error": f"error handling message: {e} -> {traceback.format_exc()}",
-                    "msg": msg,
-                }
+                },
             )
-            comm.send(error_msg.dict())
+            comm.send(msg)
+            return
+        if received is not None and metrics.enabled:
+            metrics.observe_duration(name, received)
+        self._reply(entry, body, comm)
 
-    comm.send({"status": "connected", "source": "sidecar_comms"})
 
+INBOUND_HANDLERS = InboundHandlerRegistry()
 
-def handle_msg(data: dict, comm: Comm) -> None:
-    """Checks the message type and calls the appropriate handler."""
-    inbound_msg = data.pop("msg", None)
-
-    # TODO: pydantic discriminators for message types->handlers
-    if inbound_msg == "get_kernel_variables":
-        variables = get_kernel_variables()
-        msg = CommMessage(
-            body=variables,
-            handler="get_kernel_variables",
+
+def inbound_handler(
+    model: Type[InboundRequest],
+    reply: Optional[str] = None,
+    supersede: bool = False,
+) -> Callable:
+    """Registers a handler for an inbound message, e.g. from a downstream package:
+
+    class Ping(InboundRequest):
+        msg: Literal["ping"] = "ping"
+
+    @inbound_handler(Ping, reply="pong")
+    def ping(request: Ping, comm: Comm) -> dict:
+        return {"status": "ok"}
+    """
+    return INBOUND_HANDLERS.register(model, reply=reply, supersede=supersede)
+
+
+def run_batch_operation(index: int, data: dict, comm: Comm) -> Union[dict, Awaitable[dict]]:
+    """Runs one operation of a batch, returning its result or error instead of sending it.
+    For async handlers, returns an awaitable of the result instead."""
+    msg = data.get("msg") if isinstance(data, dict) else None
+    result = {"index": index, "msg": msg}
+    try:
+        if msg == "batch":
+            raise ValueError("batches can't be nested")
+        if (entry := INBOUND_HANDLERS.get(msg)) is None:
+            raise ValueError(f"unknown message: {msg!r}")
+        request = INBOUND_HANDLERS.parse(data)
+        body = entry.handler(request, comm)
+        if inspect.isawaitable(body):
+            return _await_batch_operation(result, entry, body)
+        if isinstance(body, DeferredReply):
+            # apply it now so later operations in the batch see its effects
+            body = body.resolve()
+    except Exception as e:
+        result.update(status="error", error=f"{e!r}")
+    else:
+        result.update(status="ok", handler=entry.reply, body=body)
+    return result
+
+
+async def _await_batch_operation(result: dict, entry: InboundHandler, body: Awaitable) -> dict:
+    try:
+        body = await body
+    except Exception as e:
+        result.update(status="error", error=f"{e!r}")
+    else:
+        result.update(status="ok", handler=entry.reply, body=body)
+    return result
+
+
+@inbound_handler(Batch)
+def handle_batch(request: Batch, comm: Comm) -> Union[dict, Awaitable[dict]]:
+    """Runs a list of operations, in order, replying with one combined result.
+
+    Each operation sees the effects of the ones before it (e.g. `create_form_cell` followed
+    by `assign_value_variable` for the same form cell). A failed operation doesn't undo the
+    earlier ones and, unless `stop_on_error` is set, doesn't stop the later ones; skipped
+    operations are reported with a "skipped" status. Messages a handler sends on its own
+    (streamed chunks, binary previews) are still sent separately.
+
+    Operations are run synchronously up to the first async one (e.g. `get_kernel_variables`);
+    the rest of the batch then runs once it's done.
+    """
+    return run_eagerly(iter_batch_operations(request, comm))
+
+
+def iter_batch_operations(request: Batch, comm: Comm) -> Generator[Awaitable, dict, dict]:
+    results = []
+    failed = False
+    for index, data in enumerate(request.operations):
+        if failed and request.stop_on_error:
+            msg = data.get("msg") if isinstance(data, dict) else None
+            results.append({"index": index, "msg": msg, "status": "skipped"})
+            continue
+        result = run_batch_operation(index, data, comm)
+        if inspect.isawaitable(result):
+            result = yield result
+        failed = failed or result["status"] == "error"
+        results.append(result)
+    return {
+        "results": results,
+        "ok": sum(result["status"] == "ok" for result in results),
+        "errors": sum(result["status"] == "error" for result in results),
+    }
+
+
+@inbound_handler(GetKernelVariablesPage)
+def handle_get_kernel_variables_page(request: GetKernelVariablesPage, comm: Comm) -> dict:
+    return get_kernel_variables_page(
+        cursor=request.cursor,
+        time_budget=request.time_budget,
+        variable_time_budget=request.variable_time_budget,
+        skip_prefixes=request.skip_prefixes,
+    )
+
+
+@inbound_handler(GetKernelVariables, supersede=True)
+async def handle_get_kernel_variables(request: GetKernelVariables, comm: Comm) -> Optional[dict]:
+    # snapshots can take a while, so other messages are handled in between variables,
+    # and a newer request cancels this one since its results would be stale anyway
+    if not request.stream:
+        return await get_kernel_variables_async(
+            skip_prefixes=request.skip_prefixes,
+            query=request.query,
         )
-        comm.send(msg.dict())
-
-    if inbound_msg == "rename_kernel_variable":
-        if "old_name" in data and "new_name" in data:
-            status = rename_kernel_variable(data["old_name"], data["new_name"])
-            msg = CommMessage(
-                body={"status": status},
-                handler="rename_kernel_variable",
+
+    # send the snapshot in size-bounded chunks as variables are inspected
+    chunks = aiter_kernel_variable_chunks(
+        chunk_bytes=request.chunk_bytes,
+        variable_time_budget=request.variable_time_budget,
+        skip_prefixes=request.skip_prefixes,
+        query=request.query,
+    )
+    last_chunk = None
+    try:
+        async for chunk in chunks:
+            msg = comm_message(
+                body=chunk,
+                handler="get_kernel_variables_chunk",
             )
-            comm.send(msg.dict())
-
-    if inbound_msg == "update_form_cell":
-        form_cell_id = data.pop("form_cell_id")
-        form_cell = FORM_CELL_CACHE[form_cell_id]
-        form_cell.update(data)
-        msg = CommMessage(
-            body=form_cell.dict(),
-            handler="update_form_cell",
-        )
-        comm.send(msg.dict())
-
-    if inbound_msg == "create_form_cell":
-        # form cell object created from the frontend
-        cell_id = data.pop("cell_id")
-        form_cell = parse_as_form_cell(data)
-        get_ipython().user_ns[data["model_variable_name"]] = form_cell
-        # send a comm message back to the sidecar to allow it to track
-        # the cell id to form cell id mapping by echoing the provided cell_id
-        # and also including the newly-generated form cell model that includes
-        # the form cell id (uuid) and any other default properties
-        msg = CommMessage(
-            body={"cell_id": cell_id, **form_cell.dict()},
-            handler="register_form_cell",
-        )
-        comm.send(msg.dict())
+            comm.send(msg)
+            last_chunk = chunk
+    except asyncio.CancelledError:
+        if last_chunk is not None and not last_chunk["complete"]:
+            # superseded mid-stream; end the stream so the sidecar can drop what it received
+            msg = comm_message(
+                body={
+                    "stream_id": last_chunk["stream_id"],
+                    "sequence": last_chunk["sequence"] + 1,
+                    "variables": {},
+                    "complete": True,
+                    "cancelled": True,
+                },
+                handler="get_kernel_variables_chunk",
+            )
+            comm.send(msg)
+        raise
+
+
+@inbound_handler(GetKernelVariableIndex)
+def handle_get_kernel_variable_index(request: GetKernelVariableIndex, comm: Comm) -> dict:
+    return get_kernel_variable_index(skip_prefixes=request.skip_prefixes)
+
+
+@inbound_handler(GetKernelVariableDetails)
+def handle_get_kernel_variable_details(request: GetKernelVariableDetails, comm: Comm) -> dict:
+    return get_kernel_variable_details(request.names)
+
+
+@inbound_handler(GetKernelVariableChanges)
+def handle_get_kernel_variable_changes(request: GetKernelVariableChanges, comm: Comm) -> dict:
+    return get_kernel_variable_changes(
+        since_generation=request.since_generation,
+        skip_prefixes=request.skip_prefixes,
+        rescan=request.rescan,
+    )
+
+
+@inbound_handler(GetVariablePreview)
+def handle_get_variable_preview(request: GetVariablePreview, comm: Comm) -> dict:
+    return get_variable_preview(
+        name=request.name,
+        offset=request.offset,
+        limit=request.limit,
+        columns=request.columns,
+    )
+
+
+@inbound_handler(GetVariableBinaryPreview)
+def handle_get_variable_binary_preview(request: GetVariableBinaryPreview, comm: Comm) -> None:
+    header, buffers = get_variable_binary_preview(
+        name=request.name,
+        offset=request.offset,
+        limit=request.limit,
+        columns=request.columns,
+    )
+    msg = comm_message(
+        body=header,
+        handler="get_variable_binary_preview",
+    )
+    comm.send(msg, buffers=buffers)
+
+
+@inbound_handler(ConfigureVariablePush)
+def handle_configure_variable_push(request: ConfigureVariablePush, comm: Comm) -> dict:
+    return configure_variable_push(enabled=request.enabled, window=request.window)
+
+
+@inbound_handler(ConfigureOutboundBatching)
+def handle_configure_outbound_batching(request: ConfigureOutboundBatching, comm: Comm) -> dict:
+    return configure_outbound_batching(
+        enabled=request.enabled,
+        size=request.size,
+        window=request.window,
+    )
+
+
+@inbound_handler(ConfigureNamespaceTracking)
+def handle_configure_namespace_tracking(request: ConfigureNamespaceTracking, comm: Comm) -> dict:
+    return configure_namespace_tracking(enabled=request.enabled)
+
+
+@inbound_handler(GetCommMetrics)
+def handle_get_comm_metrics(request: GetCommMetrics, comm: Comm) -> dict:
+    return get_comm_metrics(reset=request.reset)
+
+
+@inbound_handler(ConfigureCommMetrics)
+def handle_configure_comm_metrics(request: ConfigureCommMetrics, comm: Comm) -> dict:
+    return configure_comm_metrics(enabled=request.enabled, reset=request.reset)
+
+
+@inbound_handler(ConfigureCompression)
+def handle_configure_compression(request: ConfigureCompression, comm: Comm) -> dict:
+    return configure_compression(
+        codec=request.codec,
+        threshold=request.threshold,
+        bandwidth=request.bandwidth,
+    )
+
+
+@inbound_handler(RenameKernelVariable)
+def handle_rename_kernel_variable(request: RenameKernelVariable, comm: Comm) -> dict:
+    status = rename_kernel_variable(request.old_name, request.new_name)
+    return {"status": status}
+
+
+@inbound_handler(UpdateFormCell)
+def handle_update_form_cell(request: UpdateFormCell, comm: Comm) -> DeferredReply:
+    # updates are coalesced per form cell and applied on the next event loop tick
+    return form_cell_updates().submit(
+        request.form_cell_id,
+        request.dict(exclude={"msg", "request_id", "form_cell_id"}),
+        comm=comm,
+        request_id=request.request_id,
+    )
+
+
+@inbound_handler(CreateFormCell, reply="register_form_cell")
+def handle_create_form_cell(request: CreateFormCell, comm: Comm) -> dict:
+    # form cell object created from the frontend
+    form_cell = parse_as_form_cell(request.dict(exclude={"msg", "request_id", "cell_id"}))
+    get_ipython().user_ns[request.model_variable_name] = form_cell
+    mark_namespace_changes(request.model_variable_name)
+    # send a comm message back to the sidecar to allow it to track
+    # the cell id to form cell id mapping by echoing the provided cell_id
+    # and also including the newly-generated form cell model that includes
+    # the form cell id (uuid) and any other default properties
+    return {"cell_id": request.cell_id, **form_cell.dict()}
+
 
-    if inbound_msg == "assign_value_variable":
-        form_cell_id = data["form_cell_id"]
-        form_cell = FORM_CELL_CACHE[form_cell_id]
-        set_kernel_variable(data["value_variable_name"], form_cell.value)
+@inbound_handler(AssignValueVariable)
+def handle_assign_value_variable(request: AssignValueVariable, comm: Comm) -> None:
+    form_cell = FORM_CELL_CACHE[request.form_cell_id]
+    set_kernel_variable(request.value_variable_name, form_cell.value)
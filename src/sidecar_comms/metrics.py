@@ -0,0 +1,133 @@
+"""
+Lightweight instrumentation for the comm hot paths.
+
+Counters and fixed-bucket histograms are kept for inbound message handling (`handle_msg`),
+outbound `SidecarComm.send` payloads, and form cell syncs. Memory use is fixed: histograms
+only store a count per bucket (plus count/total/min/max), and the number of distinct metric
+names is capped, with anything past the cap folded into an "other" metric.
+
+Metrics are disabled by default; instrumented call sites check `enabled` before doing any
+work, so the disabled overhead is a single attribute lookup. Measuring outbound payload sizes
+means serializing the payload an extra time, which is why this is opt-in.
+
+metrics = comm_metrics()
+metrics.enabled = True
+...
+metrics.snapshot()
+>>> {"counters": {"inbound.get_kernel_variables": 3, ...}, "histograms": {...}}
+"""
+import json
+import time
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence
+
+# seconds
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+# bytes
+SIZE_BUCKETS = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+MAX_METRIC_NAMES = 200
+OTHER_METRIC = "other"
+
+
+class Histogram:
+    """Fixed-bucket histogram; `buckets` are the inclusive upper bounds of each bucket,
+    with a final overflow bucket for anything larger."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts: List[int] = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def to_dict(self) -> dict:
+        return {
+            "buckets": list(self.buckets),
+            "counts": list(self.counts),
+            "count": self.count,
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+        }
+
+
+class CommMetrics:
+    def __init__(self, enabled: bool = False, max_names: int = MAX_METRIC_NAMES):
+        self.enabled = enabled
+        self.max_names = max_names
+        self.counters: Dict[str, int] = {}
+        self.histograms: Dict[str, Histogram] = {}
+
+    def _name(self, name: str, existing: dict) -> str:
+        # cap the number of distinct names so unexpected message types can't grow this forever
+        if name in existing or len(existing) < self.max_names:
+            return name
+        return OTHER_METRIC
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        name = self._name(name, self.counters)
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name: str, value: float, buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        name = self._name(name, self.histograms)
+        if (histogram := self.histograms.get(name)) is None:
+            histogram = self.histograms[name] = Histogram(buckets)
+        histogram.observe(value)
+
+    def observe_duration(self, name: str, start: float) -> None:
+        """Records the time since `start` (from `time.perf_counter()`)."""
+        self.observe(name, time.perf_counter() - start, LATENCY_BUCKETS)
+
+    def observe_size(self, name: str, payload: Any) -> None:
+        """Records the JSON-serialized size of a payload."""
+        try:
+            size = len(json.dumps(payload, default=str).encode())
+        except (TypeError, ValueError):
+            # e.g. circular references; the send itself will fail loudly
+            return
+        self.observe(name, size, SIZE_BUCKETS)
+
+    def snapshot(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "counters": dict(self.counters),
+            "histograms": {name: hist.to_dict() for name, hist in self.histograms.items()},
+        }
+
+    def reset(self) -> None:
+        self.counters.clear()
+        self.histograms.clear()
+
+
+@lru_cache
+def comm_metrics() -> CommMetrics:
+    return CommMetrics()
+
+
+def get_comm_metrics(reset: bool = False) -> dict:
+    """Returns the current metrics, optionally resetting them afterwards."""
+    metrics = comm_metrics()
+    snapshot = metrics.snapshot()
+    if reset:
+        metrics.reset()
+    return snapshot
+
+
+def configure_comm_metrics(enabled: bool = True, reset: bool = False) -> dict:
+    """Turns metrics collection on/off."""
+    metrics = comm_metrics()
+    metrics.enabled = enabled
+    if reset:
+        metrics.reset()
+    return {"enabled": metrics.enabled}
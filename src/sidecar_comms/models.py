@@ -1,7 +1,12 @@
 import enum
-from typing import Literal, Optional
+import os
+from typing import Callable, List, Literal, NamedTuple, Optional, Union
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Extra, Field, PositiveInt, StrictInt, StrictStr
+
+# target (estimated) JSON size of each streamed get_kernel_variables chunk
+DEFAULT_CHUNK_BYTES = 256_000
+DEFAULT_PREVIEW_ROWS = 1000
 
 
 class SidecarRequestType(enum.Enum):
@@ -11,9 +16,222 @@ class SidecarRequestType(enum.Enum):
     kernel_state = "kernel_state"
 
 
+RequestID = Union[StrictStr, StrictInt]
+
+
+class AckMode(str, enum.Enum):
+    """How inbound messages are acknowledged, chosen by the sidecar when opening the comm."""
+
+    # no acknowledgement; only the reply (or error) is sent
+    none = "none"
+    # a small {"status": "received", "request_id": ...} message
+    id = "id"
+    # echo the full inbound message back (for debugging)
+    full = "full"
+
+
 class CommMessage(BaseModel):
     source: Literal["sidecar_comms"] = "sidecar_comms"
     body: dict = Field(default_factory=dict)
     comm_id: Optional[str] = None
     target_name: Optional[str] = None
     handler: Optional[str] = None
+    # the `request_id` of the inbound message this is replying to
+    request_id: Optional[RequestID] = None
+
+
+# validate outbound messages against CommMessage before they're sent (slower, for debugging)
+VALIDATE_MESSAGES = os.environ.get("SIDECAR_COMMS_DEBUG", "").lower() in {"1", "true", "yes"}
+
+
+def comm_message(
+    body: Optional[dict] = None,
+    handler: Optional[str] = None,
+    comm_id: Optional[str] = None,
+    target_name: Optional[str] = None,
+    request_id: Optional[RequestID] = None,
+) -> dict:
+    """Returns the same dict as `CommMessage(...).dict()`, without building a model.
+
+    Messages are sent on hot paths (e.g. form cell syncs), so the body is passed through
+    as-is rather than validated and deep-copied; set VALIDATE_MESSAGES (or the
+    SIDECAR_COMMS_DEBUG environment variable) to check messages against CommMessage.
+    """
+    msg = {
+        "source": "sidecar_comms",
+        "body": {} if body is None else body,
+        "comm_id": comm_id,
+        "target_name": target_name,
+        "handler": handler,
+        "request_id": request_id,
+    }
+    if VALIDATE_MESSAGES:
+        CommMessage(**msg)
+    return msg
+
+
+class DeferredReply(NamedTuple):
+    """Returned by inbound handlers that reply later (e.g. queued form cell updates).
+
+    `resolve()` does the deferred work right away and returns the reply body instead,
+    which is used when the result is needed inline (e.g. in a batch).
+    """
+
+    resolve: Callable[[], Optional[dict]]
+
+
+# --- Inbound (sidecar -> kernel) requests ---
+# Each request model has a `msg` literal that's used as the discriminator
+# when parsing inbound messages; see `sidecar_comms.inbound.inbound_handler`.
+class InboundRequest(BaseModel):
+    msg: str
+    # echoed back on every reply to this request
+    request_id: Optional[RequestID] = None
+
+
+class VariableQuery(BaseModel):
+    """Filters, sorting, and a limit to apply to kernel variables before inspecting them.
+
+    - `name`: glob pattern the variable name must match (e.g. "df_*")
+    - `name_regex`: regular expression the variable name must contain a match for
+    - `types`: type names (e.g. "DataFrame") or qualified type names
+      (e.g. "pandas.core.frame.DataFrame")
+    - `modules`: module names (or parent packages, e.g. "pandas") of the variable
+    - `sort`: sort key; names are sorted ascending and sizes descending by default
+    - `limit`: only return the first `limit` variables after sorting
+
+    See `sidecar_comms.handlers.variable_explorer.query_matches_name/value` for how the
+    filters are applied.
+    """
+
+    name: Optional[str] = None
+    name_regex: Optional[str] = None
+    types: Optional[List[str]] = None
+    modules: Optional[List[str]] = None
+    sort: Optional[Literal["name", "size", "size_bytes"]] = None
+    descending: Optional[bool] = None
+    limit: Optional[int] = Field(default=None, ge=0)
+
+
+class GetKernelVariables(InboundRequest):
+    msg: Literal["get_kernel_variables"] = "get_kernel_variables"
+    skip_prefixes: Optional[List[str]] = None
+    query: Optional[VariableQuery] = None
+    # send the snapshot in size-bounded chunks as variables are inspected
+    stream: bool = False
+    chunk_bytes: int = Field(default=DEFAULT_CHUNK_BYTES, gt=0)
+    variable_time_budget: Optional[float] = None
+
+
+class GetKernelVariablesPage(InboundRequest):
+    msg: Literal["get_kernel_variables_page"] = "get_kernel_variables_page"
+    # name of the last variable of the previous page
+    cursor: Optional[str] = None
+    time_budget: Optional[float] = None
+    variable_time_budget: Optional[float] = None
+    skip_prefixes: Optional[List[str]] = None
+
+
+class GetKernelVariableIndex(InboundRequest):
+    msg: Literal["get_kernel_variable_index"] = "get_kernel_variable_index"
+    skip_prefixes: Optional[List[str]] = None
+
+
+class GetKernelVariableDetails(InboundRequest):
+    msg: Literal["get_kernel_variable_details"] = "get_kernel_variable_details"
+    names: List[str] = Field(default_factory=list)
+
+
+class GetKernelVariableChanges(InboundRequest):
+    msg: Literal["get_kernel_variable_changes"] = "get_kernel_variable_changes"
+    since_generation: Optional[int] = None
+    skip_prefixes: Optional[List[str]] = None
+    rescan: bool = False
+
+
+class GetVariablePreview(InboundRequest):
+    msg: Literal["get_variable_preview"] = "get_variable_preview"
+    name: str
+    offset: int = 0
+    limit: int = DEFAULT_PREVIEW_ROWS
+    columns: Optional[list] = None
+
+
+class GetVariableBinaryPreview(InboundRequest):
+    msg: Literal["get_variable_binary_preview"] = "get_variable_binary_preview"
+    name: str
+    offset: int = 0
+    limit: int = DEFAULT_PREVIEW_ROWS
+    columns: Optional[list] = None
+
+
+class ConfigureVariablePush(InboundRequest):
+    msg: Literal["configure_variable_push"] = "configure_variable_push"
+    enabled: bool = True
+    window: Optional[float] = None
+
+
+class ConfigureOutboundBatching(InboundRequest):
+    msg: Literal["configure_outbound_batching"] = "configure_outbound_batching"
+    enabled: bool = True
+    size: Optional[PositiveInt] = None
+    window: Optional[float] = None
+
+
+class ConfigureNamespaceTracking(InboundRequest):
+    msg: Literal["configure_namespace_tracking"] = "configure_namespace_tracking"
+    enabled: bool = True
+
+
+class GetCommMetrics(InboundRequest):
+    msg: Literal["get_comm_metrics"] = "get_comm_metrics"
+    reset: bool = False
+
+
+class ConfigureCommMetrics(InboundRequest):
+    msg: Literal["configure_comm_metrics"] = "configure_comm_metrics"
+    enabled: bool = True
+    reset: bool = False
+
+
+class ConfigureCompression(InboundRequest):
+    msg: Literal["configure_compression"] = "configure_compression"
+    codec: Optional[str] = None
+    threshold: Optional[int] = None
+    bandwidth: Optional[float] = None
+
+
+class RenameKernelVariable(InboundRequest):
+    msg: Literal["rename_kernel_variable"] = "rename_kernel_variable"
+    old_name: str
+    new_name: str
+
+
+class UpdateFormCell(InboundRequest, extra=Extra.allow):
+    """The form cell properties to update are passed through as extra fields."""
+
+    msg: Literal["update_form_cell"] = "update_form_cell"
+    form_cell_id: str
+
+
+class CreateFormCell(InboundRequest, extra=Extra.allow):
+    """The form cell properties are passed through as extra fields."""
+
+    msg: Literal["create_form_cell"] = "create_form_cell"
+    cell_id: str
+    model_variable_name: str
+
+
+class AssignValueVariable(InboundRequest):
+    msg: Literal["assign_value_variable"] = "assign_value_variable"
+    form_cell_id: str
+    value_variable_name: str
+
+
+class Batch(InboundRequest):
+    """Runs several inbound messages in one round trip; see `inbound.handle_batch`."""
+
+    msg: Literal["batch"] = "batch"
+    # each operation is an inbound message, e.g. {"msg": "assign_value_variable", ...}
+    operations: List[dict] = Field(default_factory=list)
+    stop_on_error: bool = False
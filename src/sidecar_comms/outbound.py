@@ -1,33 +1,153 @@
 """
 Comm opening and message formatting for outbound messages.
 (Kernel -> sidecar)
+
+Outbound batching (opt-in, see `configure_outbound_batching`):
+Code that updates form cells or comm values in a loop sends one message per change. With
+batching enabled, messages sent through a SidecarComm are queued and sent together as one
+"message_batch" message, whose body lists the queued messages in the order they were sent:
+
+{"handler": "message_batch", "body": {"messages": [{"handler": "update_form_cell", ...}, ...]}}
+
+The queue is flushed when the current cell finishes (`post_run_cell`), when it holds
+`batch_size` messages, or `batch_window` seconds after the first queued message, whichever
+comes first; `SidecarComm.flush()` sends it right away. Messages with binary buffers are
+never queued: the queue is flushed first and they're sent on their own, so ordering is
+preserved. Without a running event loop (e.g. plain IPython), messages are sent right away.
 """
+import asyncio
+import time
 from functools import lru_cache
-from typing import Optional
+from typing import List, Optional
 
 from ipykernel.comm import Comm
 from traitlets import Any, HasTraits
 
-from sidecar_comms.models import CommMessage
+from sidecar_comms.compression import compression_policy
+from sidecar_comms.metrics import comm_metrics
+from sidecar_comms.models import RequestID, comm_message
+from sidecar_comms.shell import get_ipython_shell
+
+DEFAULT_BATCH_SIZE = 100  # messages
+DEFAULT_BATCH_WINDOW = 0.05  # seconds
+BATCH_HANDLER = "message_batch"
 
 
 class SidecarComm(Comm, HasTraits):
     value = Any().tag(sync=True)
 
+    def __init__(self, *args, **kwargs):
+        self.batching = False
+        self.batch_size = DEFAULT_BATCH_SIZE
+        self.batch_window = DEFAULT_BATCH_WINDOW
+        self._batch: List[dict] = []
+        self._batch_timer: Optional[asyncio.TimerHandle] = None
+        super().__init__(*args, **kwargs)
+
     def send(
         self,
         comm_id: Optional[str] = None,
         target_name: Optional[str] = None,
-        **data,
+        buffers: Optional[List[memoryview]] = None,
+        body: Optional[dict] = None,
+        handler: Optional[str] = None,
+        request_id: Optional[RequestID] = None,
+        source: Optional[str] = None,
     ) -> None:
-        comm_id = comm_id or self.comm_id
-        target_name = target_name or self.target_name
-        msg = CommMessage(
-            comm_id=comm_id,
-            target_name=target_name,
-            **data,
+        """Sends a CommMessage with the given `body` and `handler`, along with any binary
+        `buffers` (e.g. from `handlers.previews.binary_preview`).
+
+        `source` is ignored (it's always "sidecar_comms"); it's accepted so a message can
+        still be sent with `comm.send(**CommMessage(...).dict())`.
+        """
+        payload = comm_message(
+            body=body,
+            handler=handler,
+            comm_id=comm_id or self.comm_id,
+            target_name=target_name or self.target_name,
+            request_id=request_id,
+        )
+        if self.batching and not buffers and self._queue(payload):
+            return
+        # anything already queued goes out first
+        self.flush()
+        self._send_payload(payload, buffers)
+
+    def _send_payload(self, payload: dict, buffers: Optional[List[memoryview]] = None) -> None:
+        metrics = comm_metrics()
+        if not metrics.enabled:
+            payload, buffers = compression_policy().compress(payload, buffers)
+            super().send(data=payload, buffers=buffers)
+            return
+
+        name = f"outbound.{payload['handler']}"
+        metrics.increment(name)
+        metrics.observe_size(f"{name}.bytes", payload)
+        start = time.perf_counter()
+        payload, buffers = compression_policy().compress(payload, buffers)
+        super().send(data=payload, buffers=buffers)
+        metrics.observe_duration(name, start)
+
+    def _queue(self, payload: dict) -> bool:
+        """Adds a message to the outbound batch, returning False if it should be sent
+        right away instead."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # nothing would flush the batch on a timer; send right away
+            return False
+        self._batch.append(payload)
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+        elif self._batch_timer is None:
+            self._batch_timer = loop.call_later(self.batch_window, self.flush)
+        return True
+
+    def flush(self) -> None:
+        """Sends any queued messages as one batch."""
+        if self._batch_timer is not None:
+            self._batch_timer.cancel()
+            self._batch_timer = None
+        if not self._batch:
+            return
+        messages, self._batch = self._batch, []
+        payload = comm_message(
+            body={"messages": messages},
+            handler=BATCH_HANDLER,
+            comm_id=self.comm_id,
+            target_name=self.target_name,
         )
-        super().send(data=msg.dict())
+        self._send_payload(payload)
+
+    def _on_post_run_cell(self, result=None) -> None:
+        self.flush()
+
+    def enable_batching(self, size: Optional[int] = None, window: Optional[float] = None) -> None:
+        """Start batching outbound messages (see module docstring)."""
+        if size is not None:
+            self.batch_size = size
+        if window is not None:
+            self.batch_window = window
+        if self.batching:
+            return
+        get_ipython_shell().events.register("post_run_cell", self._on_post_run_cell)
+        self.batching = True
+
+    def disable_batching(self) -> None:
+        """Stop batching outbound messages, sending any that are queued."""
+        self.flush()
+        if not self.batching:
+            return
+        try:
+            get_ipython_shell().events.unregister("post_run_cell", self._on_post_run_cell)
+        except ValueError:
+            # already unregistered
+            pass
+        self.batching = False
+
+    def close(self, *args, **kwargs) -> None:
+        self.disable_batching()
+        super().close(*args, **kwargs)
 
     def update_value(self, msg):
         data = msg["content"]["data"]
@@ -36,6 +156,10 @@ class SidecarComm(Comm, HasTraits):
 
 class CommManager:
     comms = {}
+    # outbound batching settings for all comms, including ones opened later
+    batching = False
+    batch_size = DEFAULT_BATCH_SIZE
+    batch_window = DEFAULT_BATCH_WINDOW
 
     def open_comm(
         self,
@@ -53,11 +177,9 @@ class CommManager:
         comm = SidecarComm(target_name=target_name, data=data)
         self.comms[target_name] = comm
 
-        msg = CommMessage(
-            body={"target": target_name},
-            handler="register_comm_target",
-        )
-        comm.send(**msg.dict())
+        comm.send(body={"target": target_name}, handler="register_comm_target")
+        if self.batching:
+            comm.enable_batching(size=self.batch_size, window=self.batch_window)
 
         # if a message with {"value": X} is sent to this comm,
         # update the comm's value attribute
@@ -65,7 +187,40 @@ class CommManager:
 
         return comm
 
+    def configure_batching(
+        self,
+        enabled: bool,
+        size: Optional[int] = None,
+        window: Optional[float] = None,
+    ) -> None:
+        if size is not None:
+            self.batch_size = size
+        if window is not None:
+            self.batch_window = window
+        self.batching = enabled
+        for comm in self.comms.values():
+            if enabled:
+                comm.enable_batching(size=self.batch_size, window=self.batch_window)
+            else:
+                comm.disable_batching()
+
+    def flush(self) -> None:
+        """Sends any queued messages on all comms."""
+        for comm in self.comms.values():
+            comm.flush()
+
 
 @lru_cache
 def comm_manager() -> CommManager:
     return CommManager()
+
+
+def configure_outbound_batching(
+    enabled: bool,
+    size: Optional[int] = None,
+    window: Optional[float] = None,
+) -> dict:
+    """Turns outbound message batching on/off for all comms, returning the current settings."""
+    manager = comm_manager()
+    manager.configure_batching(enabled, size=size, window=window)
+    return {"enabled": manager.batching, "size": manager.batch_size, "window": manager.batch_window}
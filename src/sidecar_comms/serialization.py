@@ -0,0 +1,242 @@
+"""
+Single-pass, bounded conversion of Python values into JSON-safe payloads.
+
+`json.dumps` is only able to tell us whether a value is serializable by fully encoding it,
+and cleaning nested values by repeatedly calling it ends up encoding the same containers
+over and over. Instead, we walk a value once, producing the final (JSON-safe) payload as we
+go, while enforcing limits on nesting depth, items per container, and total encoded size.
+Anything that can't be represented in JSON is replaced with a placeholder (None by default),
+unless a `default` function converts it to a JSON scalar first (like `json.dumps`' `default`).
+
+to_json_safe({"a": [1, 2, print], ("not", "a", "key"): 4})
+>>> {'a': [1, 2, None]}
+"""
+import itertools
+import math
+from typing import Any, Callable, Optional
+
+DEFAULT_MAX_DEPTH = 20
+DEFAULT_MAX_ITEMS = 1000
+DEFAULT_MAX_BYTES = 1_000_000
+
+# dict key types that json.dumps will coerce to strings
+JSON_KEY_TYPES = (str, int, float, bool, type(None))
+JSON_SCALAR_TYPES = (str, int, float, bool, type(None))
+
+
+class BoundedJSONSerializer:
+    """Walks a value once, returning a JSON-safe copy that respects the configured limits.
+
+    `nbytes` is a running estimate of the encoded JSON size (ignoring string escapes and
+    whitespace), and can be used by callers to size messages without encoding them.
+    """
+
+    def __init__(
+        self,
+        max_depth: Optional[int] = DEFAULT_MAX_DEPTH,
+        max_items: Optional[int] = DEFAULT_MAX_ITEMS,
+        max_bytes: Optional[int] = DEFAULT_MAX_BYTES,
+        placeholder: Any = None,
+        allow_nan: bool = True,
+        default: Optional[Callable[[Any], Any]] = None,
+    ):
+        self.max_depth = max_depth
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.placeholder = placeholder
+        # NaN/Infinity aren't valid JSON; if not allowed, they're replaced with the placeholder
+        self.allow_nan = allow_nan
+        # converts other values to a JSON scalar (e.g. a date to its ISO format string)
+        self.default = default
+        self.nbytes = 0
+        self.truncated = False
+        # ids of the containers currently being walked, to catch circular references
+        self._path = set()
+
+    def _budget_left(self) -> Optional[int]:
+        if self.max_bytes is None:
+            return
+        return self.max_bytes - self.nbytes
+
+    def serialize(self, value: Any) -> Any:
+        return self._walk(value, depth=0)
+
+    def _walk(self, value: Any, depth: int) -> Any:
+        # the most common types are checked first
+        if isinstance(value, str):
+            return self._walk_str(value)
+        if value is None or isinstance(value, bool):
+            self.nbytes += 5
+            return value
+        if isinstance(value, int):
+            # rough decimal digit count without building the string
+            self.nbytes += value.bit_length() * 3 // 10 + 1
+            return value
+        if isinstance(value, float):
+            if not self.allow_nan and not math.isfinite(value):
+                self.nbytes += 5
+                return self.placeholder
+            self.nbytes += 24
+            return value
+        if isinstance(value, (dict, list, tuple)):
+            if self.max_depth is not None and depth >= self.max_depth:
+                self.truncated = True
+                return self.placeholder
+            if id(value) in self._path:
+                # circular reference
+                return self.placeholder
+            self._path.add(id(value))
+            try:
+                if isinstance(value, dict):
+                    return self._walk_dict(value, depth)
+                return self._walk_list(value, depth)
+            finally:
+                self._path.discard(id(value))
+        if self.default is not None:
+            try:
+                value = self.default(value)
+            except Exception:
+                return self.placeholder
+            if isinstance(value, JSON_SCALAR_TYPES):
+                return self._walk(value, depth)
+        return self.placeholder
+
+    def _walk_str(self, value: str) -> str:
+        budget = self._budget_left()
+        if budget is not None and len(value) + 2 > budget:
+            self.truncated = True
+            value = value[: max(budget - 5, 0)] + "..."
+        self.nbytes += len(value) + 2
+        return value
+
+    def _over_budget(self, count: int) -> bool:
+        if self.max_items is not None and count >= self.max_items:
+            return True
+        budget = self._budget_left()
+        return budget is not None and budget <= 0
+
+    def _walk_list(self, value: Any, depth: int) -> list:
+        self.nbytes += 2
+        items = []
+        for item in value:
+            if self._over_budget(len(items)):
+                self.truncated = True
+                break
+            items.append(self._walk(item, depth + 1))
+            self.nbytes += 1
+        return items
+
+    def _walk_dict(self, value: dict, depth: int) -> dict:
+        self.nbytes += 2
+        items = {}
+        for key, item in value.items():
+            if not isinstance(key, JSON_KEY_TYPES):
+                # json.dumps would raise here; drop the entry instead
+                continue
+            if self._over_budget(len(items)):
+                self.truncated = True
+                break
+            self.nbytes += len(key) + 4 if isinstance(key, str) else 8
+            items[key] = self._walk(item, depth + 1)
+        return items
+
+
+def to_json_safe(
+    value: Any,
+    max_depth: Optional[int] = DEFAULT_MAX_DEPTH,
+    max_items: Optional[int] = DEFAULT_MAX_ITEMS,
+    max_bytes: Optional[int] = DEFAULT_MAX_BYTES,
+    placeholder: Any = None,
+    allow_nan: bool = True,
+    default: Optional[Callable[[Any], Any]] = None,
+) -> Any:
+    """Returns a JSON-safe copy of a value in a single pass, replacing unserializable
+    values with `placeholder` (unless `default` converts them to a JSON scalar) and
+    truncating anything past the provided limits.
+    """
+    serializer = BoundedJSONSerializer(
+        max_depth=max_depth,
+        max_items=max_items,
+        max_bytes=max_bytes,
+        placeholder=placeholder,
+        allow_nan=allow_nan,
+        default=default,
+    )
+    return serializer.serialize(value)
+
+
+class _JSONSafetyCheck:
+    """Walks a value like BoundedJSONSerializer, without building a copy."""
+
+    def __init__(self, max_depth: int, max_items: Optional[int], max_bytes: Optional[int]):
+        self.max_depth = max_depth
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+
+    def _exhausted(self) -> bool:
+        return self.max_bytes is not None and self.nbytes >= self.max_bytes
+
+    def check(self, value: Any, depth: int) -> bool:
+        if isinstance(value, str):
+            self.nbytes += len(value) + 2
+            return True
+        if isinstance(value, JSON_SCALAR_TYPES):
+            self.nbytes += 8
+            return True
+        if depth >= self.max_depth:
+            return False
+        self.nbytes += 2
+        if isinstance(value, dict):
+            return self._check_dict(value, depth + 1)
+        if isinstance(value, (list, tuple)):
+            return self._check_list(value, depth + 1)
+        return False
+
+    def _check_list(self, value: Any, depth: int) -> bool:
+        # anything past the limits is assumed to be serializable
+        items = value if self.max_items is None else itertools.islice(value, self.max_items)
+        check = self.check
+        for item in items:
+            if not check(item, depth):
+                return False
+            self.nbytes += 1
+            if self._exhausted():
+                break
+        return True
+
+    def _check_dict(self, value: dict, depth: int) -> bool:
+        items = value.items()
+        if self.max_items is not None:
+            items = itertools.islice(items, self.max_items)
+        check = self.check
+        for key, item in items:
+            if isinstance(key, str):
+                self.nbytes += len(key) + 4
+            elif isinstance(key, JSON_KEY_TYPES):
+                self.nbytes += 8
+            else:
+                return False
+            if not check(item, depth):
+                return False
+            if self._exhausted():
+                break
+        return True
+
+
+def is_json_safe(
+    value: Any,
+    max_depth: int = DEFAULT_MAX_DEPTH,
+    max_items: Optional[int] = DEFAULT_MAX_ITEMS,
+    max_bytes: Optional[int] = DEFAULT_MAX_BYTES,
+) -> bool:
+    """Returns True if `json.dumps` would be able to encode a value, without encoding it.
+
+    Stops at the first unserializable value; containers nested deeper than `max_depth`
+    (including circular references) are treated as unserializable. Like
+    BoundedJSONSerializer, only the first `max_items` items of each container are looked at,
+    and the walk stops once about `max_bytes` of JSON would have been encoded; anything past
+    those limits is assumed to be serializable, so large values should be truncated before
+    they're sent (e.g. with `to_json_safe` or `bounded_repr`).
+    """
+    return _JSONSafetyCheck(max_depth, max_items, max_bytes).check(value, depth=0)
@@ -0,0 +1,72 @@
+"""
+Helpers for running inbound message handlers on the kernel's asyncio event loop.
+
+Comm messages are handled inside the kernel's `on_msg` callback, so a slow handler holds up
+every message after it. Expensive handlers (like `get_kernel_variables`) are coroutines that
+hand control back to the event loop as they go, letting cheap messages (form cell updates,
+previews, configuration) be handled in between instead of waiting for them to finish.
+
+Outside of a running event loop (e.g. plain IPython, or tests), coroutines are run to
+completion right away, so handlers behave the same as synchronous ones.
+"""
+import asyncio
+import inspect
+import time
+from typing import Any, AsyncIterator, Awaitable, Coroutine, Generator, Iterable, Optional, Union
+
+# seconds of work before handing control back to the event loop
+YIELD_INTERVAL = 0.005
+
+
+def running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def run_sync(awaitable: Awaitable) -> Any:
+    """Runs an awaitable to completion when there's no running event loop."""
+    if inspect.iscoroutine(awaitable):
+        return asyncio.run(awaitable)
+
+    async def wrapper():
+        return await awaitable
+
+    return asyncio.run(wrapper())
+
+
+async def cooperative(iterable: Iterable, interval: Optional[float] = None) -> AsyncIterator:
+    """Iterates over `iterable`, handing control back to the event loop between items
+    whenever `interval` (default YIELD_INTERVAL) seconds have passed since it last did."""
+    if interval is None:
+        interval = YIELD_INTERVAL
+    deadline = time.perf_counter() + interval
+    for item in iterable:
+        yield item
+        if time.perf_counter() >= deadline:
+            await asyncio.sleep(0)
+            deadline = time.perf_counter() + interval
+
+
+def run_eagerly(steps: Generator[Awaitable, Any, Any]) -> Union[Any, Coroutine]:
+    """Runs a generator of steps synchronously until it yields something to await.
+
+    Returns the generator's return value if it finishes without awaiting anything, otherwise
+    a coroutine that awaits each yielded awaitable, sends its result back into the generator,
+    and returns the generator's return value. This keeps work that doesn't need to wait (like
+    a batch of cheap operations) synchronous, so it isn't reordered with later messages.
+    """
+    try:
+        awaitable = next(steps)
+    except StopIteration as stop:
+        return stop.value
+    return _run_steps(steps, awaitable)
+
+
+async def _run_steps(steps: Generator[Awaitable, Any, Any], awaitable: Awaitable) -> Any:
+    while True:
+        try:
+            awaitable = steps.send(await awaitable)
+        except StopIteration as stop:
+            return stop.value
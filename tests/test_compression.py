@@ -0,0 +1,133 @@
+import json
+import zlib
+
+import pytest
+
+from sidecar_comms import compression
+from sidecar_comms.compression import CODECS, CompressingComm, CompressionPolicy, compression_policy
+from sidecar_comms.inbound import handle_msg, inbound_comm
+from sidecar_comms.outbound import SidecarComm
+from sidecar_comms.shell import get_ipython_shell
+
+
+@pytest.fixture
+def policy():
+    policy = compression_policy()
+    yield policy
+    policy.select(None)
+    policy.configure(
+        threshold=CompressionPolicy().threshold, bandwidth=CompressionPolicy().bandwidth
+    )
+
+
+def decompress(data: dict, buffers: list) -> dict:
+    compression = data["compression"]
+    assert compression["codec"] == "zlib"
+    raw = zlib.decompress(buffers[compression["buffer"]])
+    assert len(raw) == compression["nbytes"]
+    return json.loads(raw)
+
+
+class TestCompressionPolicy:
+    def test_disabled_by_default(self):
+        data = {"handler": "x", "body": {"a": "x" * 100_000}}
+        assert CompressionPolicy().compress(data) == (data, None)
+
+    def test_threshold(self):
+        policy = CompressionPolicy(codec="zlib", threshold=1000)
+        small = {"handler": "x", "body": {"a": "x" * 10}}
+        assert policy.compress(small) == (small, None)
+
+        body = {"a": "x" * 10_000}
+        data, buffers = policy.compress({"handler": "x", "body": body}, buffers=[b"existing"])
+        assert data["handler"] == "x"
+        assert data["body"] is None
+        assert data["compression"]["buffer"] == 1
+        assert buffers[0] == b"existing"
+        assert decompress(data, buffers) == body
+
+    def test_small_bodies_not_encoded(self, mocker):
+        """Test that bodies well under the threshold are only estimated, not encoded."""
+        json_packer = mocker.patch(
+            "sidecar_comms.compression.json_packer", side_effect=compression.json_packer
+        )
+        policy = CompressionPolicy(codec="zlib", threshold=1000)
+        small = {"handler": "x", "body": {"a": ["x" * 10] * 10}}
+        assert policy.compress(small) == (small, None)
+        json_packer.assert_not_called()
+
+        # bodies that may be over the threshold are still encoded to check their size
+        body = {"a": ["é" * 100] * 10}
+        data, buffers = policy.compress({"handler": "x", "body": body})
+        json_packer.assert_called_once()
+        assert decompress(data, buffers) == body
+
+    @pytest.mark.parametrize("codec", list(CODECS))
+    def test_codecs(self, codec):
+        policy = CompressionPolicy(codec=codec, threshold=0)
+        data, buffers = policy.compress({"body": {"a": "x" * 10_000}})
+        assert data["compression"]["codec"] == codec
+        assert len(buffers[0]) < 10_000
+
+    def test_incompressible(self):
+        """Test that bodies that don't get smaller are sent as-is."""
+        policy = CompressionPolicy(codec="zlib", threshold=0)
+        data = {"body": {"a": 1}}
+        assert policy.compress(data) == (data, None)
+
+    def test_negotiate(self):
+        policy = CompressionPolicy()
+        settings = policy.negotiate({"codecs": ["brotli", "zlib"], "threshold": 10})
+        assert settings["codec"] == "zlib"
+        assert settings["threshold"] == 10
+        assert policy.negotiate({"codecs": ["brotli"]})["codec"] is None
+        assert policy.negotiate(None)["codec"] is None
+
+    def test_adaptive_level(self):
+        body = {"a": "x" * 100_000}
+        # slow connection: compressing is much cheaper than sending, so use more effort
+        policy = CompressionPolicy(codec="zlib", threshold=0, bandwidth=1)
+        policy.compress({"body": body})
+        assert policy.level == CODECS["zlib"].default_level + 1
+        # very fast connection: compressing costs more than it saves
+        policy = CompressionPolicy(codec="zlib", threshold=0, bandwidth=1e15)
+        policy.compress({"body": body})
+        assert policy.level == CODECS["zlib"].default_level - 1
+
+
+class TestCompressedComms:
+    def test_handshake(self, policy: CompressionPolicy, mocker):
+        comm = mocker.Mock()
+        open_msg = {"content": {"data": {"compression": {"codecs": ["zlib"], "threshold": 0}}}}
+        inbound_comm(comm, open_msg)
+        handshake = comm.send.call_args[0][0]
+        assert handshake["status"] == "connected"
+        assert handshake["compression"]["codec"] == "zlib"
+        assert policy.codec == "zlib"
+
+    def test_inbound_reply(self, policy: CompressionPolicy, mocker):
+        policy.negotiate({"codecs": ["zlib"], "threshold": 0})
+        get_ipython_shell().user_ns["compressed_var"] = "x" * 1000
+        comm = mocker.Mock()
+        handle_msg({"msg": "get_kernel_variables"}, CompressingComm(comm, policy))
+        data = comm.send.call_args[0][0]
+        buffers = comm.send.call_args[1]["buffers"]
+        assert data["handler"] == "get_kernel_variables"
+        assert "compressed_var" in decompress(data, buffers)
+
+    def test_sidecar_comm(self, policy: CompressionPolicy, mocker):
+        policy.negotiate({"codecs": ["zlib"], "threshold": 0})
+        send = mocker.patch("ipykernel.comm.Comm.send")
+        comm = SidecarComm(target_name="compression_test")
+        body = {"a": "x" * 10_000}
+        comm.send(handler="test", body=body)
+        assert decompress(send.call_args[1]["data"], send.call_args[1]["buffers"]) == body
+
+
+def test_configure_compression_msg(policy: CompressionPolicy, mocker):
+    comm = mocker.Mock()
+    handle_msg({"msg": "configure_compression", "codec": "lzma", "bandwidth": 100}, comm)
+    assert comm.send.call_args[0][0]["body"]["codec"] == "lzma"
+    assert policy.bandwidth == 100
+    handle_msg({"msg": "configure_compression", "codec": ""}, comm)
+    assert policy.enabled is False
@@ -0,0 +1,64 @@
+from collections import OrderedDict
+
+import pytest
+
+from sidecar_comms.handlers.bounded_repr import bounded_repr
+from sidecar_comms.handlers.variable_explorer import variable_sample_value
+
+
+class CountingRepr:
+    calls = 0
+
+    def __repr__(self):
+        CountingRepr.calls += 1
+        return "CountingRepr()"
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        [1, "two", 3.0, None],
+        (1,),
+        (),
+        {"a": [1, (2, 3)], "b": {"c": frozenset()}},
+        set(),
+        {1, 2, 3},
+        frozenset({"a"}),
+        OrderedDict(a=1),
+        b"bytes",
+        "string with 'quotes'",
+    ],
+)
+def test_matches_repr(value):
+    """Test that short values are repr'd exactly like the builtin repr."""
+    assert bounded_repr(value) == repr(value)
+
+
+def test_recursive():
+    value = [1]
+    value.append(value)
+    assert bounded_repr(value) == repr(value)
+
+
+def test_truncates_with_prefix_of_repr():
+    value = {i: list(range(i)) for i in range(1000)}
+    result = bounded_repr(value, max_length=100)
+    assert result == repr(value)[:100] + "..."
+
+
+def test_long_string():
+    value = "ABC" * 5000
+    assert bounded_repr(value, max_length=50) == repr(value)[:50] + "..."
+
+
+def test_stops_early():
+    """Test that items past the max length are never repr'd."""
+    CountingRepr.calls = 0
+    bounded_repr([CountingRepr() for _ in range(10_000)], max_length=100)
+    assert CountingRepr.calls < 10
+
+
+def test_sample_value_uses_bounded_repr():
+    value = {i: str(i) for i in range(1000)}
+    sample = variable_sample_value(value, max_length=100)
+    assert sample == repr(value)[:100] + "..."
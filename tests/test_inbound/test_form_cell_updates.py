@@ -0,0 +1,134 @@
+import asyncio
+
+import pytest
+
+from sidecar_comms.form_cells.base import Slider
+from sidecar_comms.form_cells.updates import form_cell_updates, merge_update
+from sidecar_comms.inbound import handle_msg
+from sidecar_comms.shell import get_ipython_shell
+
+
+@pytest.fixture
+def slider(mocker):
+    form_cell = Slider(model_variable_name="coalesce", settings={})
+    mocker.patch.object(Slider, "_sync_sidecar")
+    return form_cell
+
+
+def update_msg(form_cell: Slider, **data) -> dict:
+    return {"msg": "update_form_cell", "form_cell_id": form_cell.id, **data}
+
+
+def test_merge_update():
+    pending = {"value": 1, "label": "a", "settings": {"min": 0, "max": 5}}
+    merged = merge_update(pending, {"value": 2, "settings": {"max": 10}})
+    assert merged == {"value": 2, "label": "a", "settings": {"min": 0, "max": 10}}
+
+
+def test_applied_immediately_without_loop(slider: Slider, mocker):
+    comm = mocker.Mock()
+    handle_msg(update_msg(slider, value=4), comm)
+    assert slider.value == 4
+    assert comm.send.call_args[0][0]["body"]["value"] == 4
+
+
+def test_coalesced_per_tick(slider: Slider, mocker):
+    """Test that a burst of updates is applied once, with the latest value per field."""
+    comm = mocker.Mock()
+    shell = get_ipython_shell()
+
+    async def burst():
+        for value in range(1, 6):
+            handle_msg(update_msg(slider, value=value, request_id=value), comm)
+        handle_msg(update_msg(slider, settings={"max": 20}), comm)
+        # nothing is applied until the event loop gets a chance to run
+        assert slider.value == 0
+        assert len(form_cell_updates()) == 1
+        await asyncio.sleep(0)
+
+    asyncio.run(burst())
+    assert slider.value == 5
+    assert slider.settings.max == 20
+    assert shell.user_ns[slider.value_variable_name] == 5
+    # one reply and one sync back for the whole burst
+    (call,) = comm.send.call_args_list
+    assert call[0][0]["body"]["value"] == 5
+    assert call[0][0]["request_id"] == 5
+    assert call[0][0]["superseded_request_ids"] == [1, 2, 3, 4]
+    assert Slider._sync_sidecar.call_count == 1
+
+
+def test_reply_tagged_with_earlier_request_id(slider: Slider, mocker):
+    """Test that a request folded into a later update without a request_id still gets
+    its reply."""
+    comm = mocker.Mock()
+
+    async def burst():
+        handle_msg(update_msg(slider, value=1, request_id="first"), comm)
+        handle_msg(update_msg(slider, value=2), comm)
+        await asyncio.sleep(0)
+
+    asyncio.run(burst())
+    (call,) = comm.send.call_args_list
+    reply = call[0][0]
+    assert reply["body"]["value"] == 2
+    assert reply["request_id"] == "first"
+    assert "superseded_request_ids" not in reply
+
+
+def test_other_messages_flush_first(slider: Slider, mocker):
+    comm = mocker.Mock()
+
+    async def update_then_assign():
+        handle_msg(update_msg(slider, value=7), comm)
+        handle_msg(
+            {
+                "msg": "assign_value_variable",
+                "form_cell_id": slider.id,
+                "value_variable_name": "coalesce_assigned",
+            },
+            comm,
+        )
+
+    asyncio.run(update_then_assign())
+    assert get_ipython_shell().user_ns["coalesce_assigned"] == 7
+
+
+def test_max_delay(slider: Slider, mocker):
+    comm = mocker.Mock()
+    queue = form_cell_updates()
+    mocker.patch.object(queue, "max_delay", 0)
+
+    async def update():
+        handle_msg(update_msg(slider, value=3), comm)
+        # already waited longer than max_delay, so it's applied right away
+        assert slider.value == 3
+
+    asyncio.run(update())
+
+
+def test_batch_applies_inline(slider: Slider, mocker):
+    comm = mocker.Mock()
+
+    async def batch():
+        operations = [update_msg(slider, value=2), update_msg(slider, value=3)]
+        handle_msg({"msg": "batch", "operations": operations}, comm)
+        assert slider.value == 3
+
+    asyncio.run(batch())
+    results = comm.send.call_args[0][0]["body"]["results"]
+    assert [result["body"]["value"] for result in results] == [2, 3]
+
+
+def test_unknown_form_cell(mocker):
+    with pytest.raises(KeyError):
+        handle_msg({"msg": "update_form_cell", "form_cell_id": "missing"}, mocker.Mock())
+
+
+def test_hold_sync(slider: Slider):
+    with slider.hold_sync():
+        slider.value = 1
+        slider.label = "held"
+        slider.settings.max = 3
+        assert Slider._sync_sidecar.call_count == 0
+    assert Slider._sync_sidecar.call_count == 1
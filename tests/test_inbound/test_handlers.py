@@ -0,0 +1,437 @@
+import asyncio
+import warnings
+from typing import Literal
+
+import pytest
+from pydantic import ValidationError
+
+from sidecar_comms.inbound import INBOUND_HANDLERS, handle_msg, inbound_comm, inbound_handler
+from sidecar_comms.metrics import comm_metrics
+from sidecar_comms.models import GetVariablePreview, InboundRequest
+from sidecar_comms.shell import get_ipython_shell
+
+
+class Ping(InboundRequest):
+    msg: Literal["test_ping"] = "test_ping"
+    count: int = 1
+
+
+@pytest.fixture
+def ping_handler():
+    @inbound_handler(Ping, reply="test_pong")
+    def ping(request: Ping, comm) -> dict:
+        return {"count": request.count}
+
+    yield ping
+    INBOUND_HANDLERS.unregister("test_ping")
+
+
+class TestInboundHandlerRegistry:
+    def test_parse(self):
+        request = INBOUND_HANDLERS.parse({"msg": "get_variable_preview", "name": "df"})
+        assert isinstance(request, GetVariablePreview)
+        assert request.limit > 0
+
+    def test_validation(self):
+        """Test that payloads are validated before the handler is called."""
+        with pytest.raises(ValidationError):
+            INBOUND_HANDLERS.parse({"msg": "get_variable_preview"})
+        with pytest.raises(ValidationError):
+            INBOUND_HANDLERS.parse({"msg": "get_variable_preview", "name": "df", "limit": "x"})
+
+    def test_unknown_msg_ignored(self, mocker):
+        comm = mocker.Mock()
+        handle_msg({"msg": "not_a_real_message"}, comm)
+        handle_msg({}, comm)
+        comm.send.assert_not_called()
+
+    def test_downstream_handler(self, ping_handler, mocker):
+        comm = mocker.Mock()
+        assert "test_ping" in INBOUND_HANDLERS
+        handle_msg({"msg": "test_ping", "count": "3"}, comm)
+        msg = comm.send.call_args[0][0]
+        assert msg["handler"] == "test_pong"
+        assert msg["body"] == {"count": 3}
+
+    def test_unregister(self, ping_handler, mocker):
+        INBOUND_HANDLERS.unregister("test_ping")
+        comm = mocker.Mock()
+        handle_msg({"msg": "test_ping"}, comm)
+        comm.send.assert_not_called()
+        with pytest.raises(ValidationError):
+            INBOUND_HANDLERS.parse({"msg": "test_ping"})
+
+    def test_model_requires_msg_literal(self):
+        class NoDefault(InboundRequest):
+            pass
+
+        with pytest.raises(ValueError):
+            inbound_handler(NoDefault)
+
+    def test_no_reply(self, mocker):
+        @inbound_handler(Ping)
+        def ping(request: Ping, comm) -> None:
+            return None
+
+        try:
+            comm = mocker.Mock()
+            handle_msg({"msg": "test_ping"}, comm)
+            comm.send.assert_not_called()
+        finally:
+            INBOUND_HANDLERS.unregister("test_ping")
+
+
+def open_inbound_comm(mocker, **options):
+    """Opens an inbound comm on a mock, returning the mock and its message callback."""
+    comm = mocker.Mock()
+    callbacks = []
+    comm.on_msg = callbacks.append
+    inbound_comm(comm, {"content": {"data": options}})
+    return comm, callbacks[0]
+
+
+def sent_messages(comm) -> list:
+    return [call[0][0] for call in comm.send.call_args_list]
+
+
+class TestRequestCorrelation:
+    def test_handshake(self, mocker):
+        comm, _ = open_inbound_comm(mocker, ack="id")
+        assert comm.send.call_args[0][0]["ack"] == "id"
+        comm, _ = open_inbound_comm(mocker, ack="bogus")
+        assert comm.send.call_args[0][0]["ack"] == "full"
+
+    def test_full_ack(self, ping_handler, mocker):
+        """Test that the default ack mode echoes the inbound message, as before."""
+        comm, recv = open_inbound_comm(mocker)
+        comm.send.reset_mock()
+        recv({"content": {"data": {"msg": "test_ping", "request_id": "abc"}}})
+        echo, reply = sent_messages(comm)
+        assert echo["body"]["data"] == {"msg": "test_ping", "request_id": "abc"}
+        assert echo["request_id"] == "abc"
+        assert reply["handler"] == "test_pong"
+        assert reply["request_id"] == "abc"
+
+    def test_id_ack(self, ping_handler, mocker):
+        comm, recv = open_inbound_comm(mocker, ack="id")
+        comm.send.reset_mock()
+        recv({"content": {"data": {"msg": "test_ping", "request_id": 7}}})
+        ack, reply = sent_messages(comm)
+        assert ack["body"] == {"status": "received", "msg": "test_ping"}
+        assert ack["request_id"] == 7
+        assert reply["request_id"] == 7
+        assert reply["body"] == {"count": 1}
+
+    def test_no_ack(self, ping_handler, mocker):
+        comm, recv = open_inbound_comm(mocker, ack="none")
+        comm.send.reset_mock()
+        recv({"content": {"data": {"msg": "test_ping", "request_id": "abc"}}})
+        (reply,) = sent_messages(comm)
+        assert reply["handler"] == "test_pong"
+        assert reply["request_id"] == "abc"
+
+    def test_unknown_msg_reply(self, mocker):
+        """Test that unknown messages with a request_id still get exactly one reply."""
+        comm = mocker.Mock()
+        handle_msg({"msg": "not_a_real_message", "request_id": "abc"}, comm)
+        (reply,) = sent_messages(comm)
+        assert reply["body"] == {
+            "status": "error",
+            "error": "unknown message: 'not_a_real_message'",
+        }
+        assert reply["request_id"] == "abc"
+
+    def test_non_dict_payload(self, mocker):
+        comm, recv = open_inbound_comm(mocker, ack="id")
+        comm.send.reset_mock()
+        recv({"content": {"data": ["not", "a", "dict"]}})
+        ack, error = sent_messages(comm)
+        assert ack["body"] == {"status": "received", "msg": None}
+        assert error["body"]["status"] == "error"
+
+    def test_error_reply(self, mocker):
+        comm, recv = open_inbound_comm(mocker, ack="none")
+        comm.send.reset_mock()
+        data = {"msg": "update_form_cell", "form_cell_id": "missing", "request_id": "abc"}
+        recv({"content": {"data": data}})
+        (reply,) = sent_messages(comm)
+        assert reply["body"]["status"] == "error"
+        assert "msg" not in reply["body"]
+        assert reply["request_id"] == "abc"
+
+    def test_reply_without_body(self, mocker):
+        """Test that requests with an id get a reply even if the handler has no result."""
+
+        @inbound_handler(Ping)
+        def ping(request: Ping, comm) -> None:
+            return None
+
+        try:
+            comm = mocker.Mock()
+            handle_msg({"msg": "test_ping", "request_id": "abc"}, comm)
+            (reply,) = sent_messages(comm)
+            assert reply["body"] == {"status": "ok"}
+            assert reply["request_id"] == "abc"
+        finally:
+            INBOUND_HANDLERS.unregister("test_ping")
+
+    def test_streamed_replies_tagged(self, mocker):
+        comm = mocker.Mock()
+        msg = {"msg": "get_kernel_variables", "stream": True, "request_id": "abc"}
+        handle_msg(msg, comm)
+        messages = sent_messages(comm)
+        assert messages[-1]["body"]["complete"] is True
+        assert {msg["request_id"] for msg in messages} == {"abc"}
+
+
+class TestBatch:
+    def test_ordered_results(self, ping_handler, mocker):
+        comm = mocker.Mock()
+        operations = [
+            {"msg": "test_ping", "count": 1},
+            {"msg": "test_ping", "count": "not a number"},
+            {"msg": "not_a_real_message"},
+            {"msg": "batch", "operations": []},
+            {"msg": "test_ping", "count": 3},
+        ]
+        handle_msg({"msg": "batch", "operations": operations}, comm)
+        (reply,) = sent_messages(comm)
+        assert reply["handler"] == "batch"
+        body = reply["body"]
+        assert body["ok"] == 2
+        assert body["errors"] == 3
+        results = body["results"]
+        assert [result["index"] for result in results] == [0, 1, 2, 3, 4]
+        assert [result["status"] for result in results] == ["ok", "error", "error", "error", "ok"]
+        assert results[0]["handler"] == "test_pong"
+        assert results[0]["body"] == {"count": 1}
+        assert results[4]["body"] == {"count": 3}
+
+    def test_stop_on_error(self, ping_handler, mocker):
+        comm = mocker.Mock()
+        operations = [{"msg": "not_a_real_message"}, {"msg": "test_ping"}]
+        handle_msg({"msg": "batch", "operations": operations, "stop_on_error": True}, comm)
+        results = sent_messages(comm)[0]["body"]["results"]
+        assert [result["status"] for result in results] == ["error", "skipped"]
+
+    def test_form_cells(self, mocker):
+        """Test that operations see the effects of earlier ones in the same batch."""
+        comm = mocker.Mock()
+        create = {
+            "msg": "create_form_cell",
+            "cell_id": "batch_cell",
+            "input_type": "slider",
+            "model_variable_name": "batch_model",
+            "value_variable_name": "batch_value",
+            "value": 3,
+            "settings": {},
+        }
+        handle_msg({"msg": "batch", "operations": [create]}, comm)
+        result = sent_messages(comm)[0]["body"]["results"][0]
+        assert result["handler"] == "register_form_cell"
+        form_cell_id = result["body"]["id"]
+
+        shell = get_ipython_shell()
+        shell.user_ns["batch_value"] = None
+        assign = {
+            "msg": "assign_value_variable",
+            "form_cell_id": form_cell_id,
+            "value_variable_name": "batch_value",
+        }
+        rename = {"msg": "rename_kernel_variable", "old_name": "batch_value", "new_name": "b2"}
+        handle_msg({"msg": "batch", "operations": [assign, rename]}, comm)
+        assert sent_messages(comm)[-1]["body"]["ok"] == 2
+        assert shell.user_ns["b2"] == 3
+        assert "batch_value" not in shell.user_ns
+
+
+class Slow(InboundRequest):
+    msg: Literal["test_slow"] = "test_slow"
+    steps: int = 3
+    fail: bool = False
+
+
+@pytest.fixture
+def slow_handler():
+    @inbound_handler(Slow, supersede=True)
+    async def slow(request: Slow, comm) -> dict:
+        for _ in range(request.steps):
+            await asyncio.sleep(0)
+        if request.fail:
+            raise ValueError("slow failure")
+        return {"steps": request.steps}
+
+    yield slow
+    INBOUND_HANDLERS.unregister("test_slow")
+
+
+async def settle(ticks: int = 20):
+    """Lets running handler tasks finish."""
+    for _ in range(ticks):
+        await asyncio.sleep(0)
+
+
+class TestAsyncHandlers:
+    def test_without_loop(self, slow_handler, mocker):
+        """Test that async handlers run to completion when there's no running event loop."""
+        comm = mocker.Mock()
+        handle_msg({"msg": "test_slow"}, comm)
+        assert sent_messages(comm)[0]["body"] == {"steps": 3}
+
+    def test_cheap_messages_first(self, slow_handler, ping_handler, mocker):
+        comm = mocker.Mock()
+
+        async def run():
+            handle_msg({"msg": "test_slow"}, comm)
+            handle_msg({"msg": "test_ping"}, comm)
+            assert [msg["handler"] for msg in sent_messages(comm)] == ["test_pong"]
+            await settle()
+
+        asyncio.run(run())
+        assert [msg["handler"] for msg in sent_messages(comm)] == ["test_pong", "test_slow"]
+
+    def test_supersede(self, slow_handler, mocker):
+        comm = mocker.Mock()
+
+        async def run():
+            handle_msg({"msg": "test_slow", "request_id": 1}, comm)
+            await asyncio.sleep(0)
+            handle_msg({"msg": "test_slow", "request_id": 2, "steps": 1}, comm)
+            await settle()
+
+        asyncio.run(run())
+        cancelled, reply = sent_messages(comm)
+        assert cancelled["request_id"] == 1
+        assert cancelled["body"] == {"status": "cancelled"}
+        assert reply["request_id"] == 2
+        assert reply["body"] == {"steps": 1}
+
+    def test_supersede_before_start(self, mocker):
+        """Test that a request cancelled before its task started still gets a reply."""
+        comm = mocker.Mock()
+
+        async def run():
+            # back-to-back, without yielding to the event loop in between
+            handle_msg({"msg": "get_kernel_variables", "request_id": 1}, comm)
+            handle_msg({"msg": "get_kernel_variables", "request_id": 2}, comm)
+            await settle()
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", RuntimeWarning)
+            asyncio.run(run())
+        cancelled, reply = sent_messages(comm)
+        assert cancelled["request_id"] == 1
+        assert cancelled["body"] == {"status": "cancelled"}
+        assert reply["request_id"] == 2
+        assert reply["handler"] == "get_kernel_variables"
+
+    def test_supersede_stream(self, mocker):
+        """Test that a stream superseded midway is ended with a cancelled chunk."""
+        mocker.patch("sidecar_comms.tasks.YIELD_INTERVAL", 0)
+        get_ipython_shell().user_ns.update({f"stream_var_{i}": i for i in range(20)})
+        comm = mocker.Mock()
+        msg = {"msg": "get_kernel_variables", "stream": True, "chunk_bytes": 1}
+
+        async def run():
+            handle_msg(msg, comm)
+            await settle(5)
+            handle_msg(msg, comm)
+            await settle(200)
+
+        asyncio.run(run())
+        chunks = [msg["body"] for msg in sent_messages(comm)]
+        first_stream = [chunk for chunk in chunks if chunk["stream_id"] == chunks[0]["stream_id"]]
+        assert not first_stream[-2]["complete"]
+        assert first_stream[-1]["complete"] is True
+        assert first_stream[-1]["cancelled"] is True
+        assert first_stream[-1]["sequence"] == first_stream[-2]["sequence"] + 1
+        assert chunks[-1]["complete"] is True
+        assert "cancelled" not in chunks[-1]
+
+    def test_metrics(self, mocker):
+        """Test that async handlers record their duration and errors once they're done."""
+
+        class Sleep(InboundRequest):
+            msg: Literal["test_sleep"] = "test_sleep"
+            fail: bool = False
+
+        @inbound_handler(Sleep)
+        async def sleep(request: Sleep, comm) -> dict:
+            await asyncio.sleep(0.05)
+            if request.fail:
+                raise ValueError("sleep failure")
+            return {}
+
+        metrics = comm_metrics()
+        mocker.patch.object(metrics, "enabled", True)
+        metrics.reset()
+
+        async def run():
+            handle_msg({"msg": "test_sleep"}, mocker.Mock())
+            handle_msg({"msg": "test_sleep", "fail": True}, mocker.Mock())
+            await asyncio.sleep(0.1)
+
+        try:
+            asyncio.run(run())
+            histogram = metrics.histograms["inbound.test_sleep"]
+            assert histogram.count == 2
+            # measured until the task was done, not just until it was scheduled
+            assert histogram.min >= 0.05
+            assert metrics.counters["inbound.test_sleep"] == 2
+            assert metrics.counters["inbound.test_sleep.errors"] == 1
+        finally:
+            INBOUND_HANDLERS.unregister("test_sleep")
+            metrics.reset()
+
+    def test_error(self, slow_handler, mocker):
+        comm = mocker.Mock()
+
+        async def run():
+            handle_msg({"msg": "test_slow", "fail": True, "request_id": "x"}, comm)
+            await settle()
+
+        asyncio.run(run())
+        (msg,) = sent_messages(comm)
+        assert msg["request_id"] == "x"
+        assert msg["body"]["status"] == "error"
+        assert "slow failure" in msg["body"]["error"]
+
+    def test_get_kernel_variables_yields(self, ping_handler, mocker):
+        """Test that a snapshot hands control back between variables."""
+        mocker.patch("sidecar_comms.tasks.YIELD_INTERVAL", 0)
+        shell = get_ipython_shell()
+        shell.user_ns.update({f"async_var_{i}": i for i in range(5)})
+        comm = mocker.Mock()
+
+        async def run():
+            handle_msg({"msg": "get_kernel_variables"}, comm)
+            await asyncio.sleep(0)
+            handle_msg({"msg": "test_ping"}, comm)
+            await settle(100)
+
+        asyncio.run(run())
+        pong, variables = sent_messages(comm)
+        assert pong["handler"] == "test_pong"
+        assert variables["handler"] == "get_kernel_variables"
+        assert "async_var_4" in variables["body"]
+
+    def test_batch(self, slow_handler, ping_handler, mocker):
+        """Test that batch operations stay in order around async operations."""
+        comm = mocker.Mock()
+        operations = [
+            {"msg": "test_ping", "count": 1},
+            {"msg": "test_slow"},
+            {"msg": "test_slow", "fail": True},
+            {"msg": "test_ping", "count": 2},
+        ]
+
+        async def run():
+            handle_msg({"msg": "batch", "operations": operations}, comm)
+            await settle()
+
+        asyncio.run(run())
+        (msg,) = sent_messages(comm)
+        results = msg["body"]["results"]
+        assert [result["status"] for result in results] == ["ok", "ok", "error", "ok"]
+        assert results[1]["body"] == {"steps": 3}
+        assert results[3]["body"] == {"count": 2}
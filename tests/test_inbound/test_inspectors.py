@@ -0,0 +1,125 @@
+from collections import OrderedDict
+
+import pandas as pd
+
+from sidecar_comms.handlers.inspectors import InspectorRegistry, qualified_type_name
+from sidecar_comms.handlers.variable_explorer import (
+    INSPECTORS,
+    DataFrameInspector,
+    DictInspector,
+    OtherDataFrameInspector,
+    VariableInspector,
+    get_kernel_variables,
+    register_inspector,
+    variable_inspector,
+)
+from sidecar_comms.shell import get_ipython_shell
+
+
+class Base:
+    pass
+
+
+class Child(Base):
+    pass
+
+
+class TestInspectorRegistry:
+    def test_default(self):
+        """Test that unregistered types resolve to the default inspector."""
+        default = VariableInspector()
+        registry = InspectorRegistry(default=default)
+        assert registry.lookup(123) is default
+
+    def test_register_by_type_and_mro(self):
+        """Test that subclasses resolve to the inspector of their registered base class."""
+        registry = InspectorRegistry(default=VariableInspector())
+        inspector = VariableInspector()
+        registry.register(Base, inspector)
+        assert registry.lookup(Base()) is inspector
+        assert registry.lookup(Child()) is inspector
+
+    def test_register_by_name(self):
+        """Test that module-qualified names can be used instead of the class."""
+        registry = InspectorRegistry(default=VariableInspector())
+        inspector = VariableInspector()
+        registry.register(qualified_type_name(Child), inspector)
+        assert registry.lookup(Child()) is inspector
+        assert registry.lookup(Base()) is registry.default
+
+    def test_register_by_bare_name(self):
+        """Test that bare class names are a fallback after the MRO lookup."""
+        registry = InspectorRegistry(default=VariableInspector())
+        fallback = VariableInspector()
+        registry.register("Child", fallback)
+        assert registry.lookup(Child()) is fallback
+        assert registry.lookup(Base()) is registry.default
+        specific = VariableInspector()
+        registry.register(Base, specific)
+        assert registry.lookup(Child()) is specific
+
+    def test_register_clears_cache(self):
+        """Test that registering after a lookup replaces the cached resolution."""
+        registry = InspectorRegistry(default=VariableInspector())
+        assert registry.lookup(Child()) is registry.default
+        inspector = VariableInspector()
+        registry.register(Child, inspector)
+        assert registry.lookup(Child()) is inspector
+        registry.unregister(Child)
+        assert registry.lookup(Child()) is registry.default
+
+
+class TestBuiltinInspectors:
+    def test_dataframe(self):
+        assert isinstance(variable_inspector(pd.DataFrame()), DataFrameInspector)
+
+    def test_other_dataframe_libraries(self):
+        """Test that DataFrames from other libraries are recognized by their class name."""
+
+        class DataFrame:
+            columns = ["a", "b"]
+
+            @property
+            def index(self):
+                raise AssertionError("the index may be lazy and shouldn't be computed")
+
+            @property
+            def dtypes(self):
+                raise AssertionError("dtypes may be lazy and shouldn't be computed")
+
+        DataFrame.__module__ = "otherlib.frame"
+        frame = DataFrame()
+        inspector = variable_inspector(frame)
+        assert isinstance(inspector, OtherDataFrameInspector)
+        assert inspector.extra(frame) == {"columns": ["a", "b"]}
+        assert inspector.size_bytes(frame) is None
+
+    def test_dict_subclass(self):
+        assert isinstance(variable_inspector(OrderedDict()), DictInspector)
+        assert DictInspector().extra(OrderedDict(a=1)) == {"keys": ["a"]}
+
+
+def test_custom_inspector():
+    """Test that a third-party inspector is used when building variable models."""
+
+    class Heavy:
+        def __len__(self):
+            raise AssertionError("should not be called")
+
+    class HeavyInspector(VariableInspector):
+        def size(self, value):
+            return 42
+
+        def extra(self, value):
+            return {"custom": True}
+
+    register_inspector(Heavy, HeavyInspector())
+    try:
+        get_ipython_shell().user_ns["heavy"] = Heavy()
+        variables = get_kernel_variables()
+        assert variables["heavy"]["error"] is None
+        assert variables["heavy"]["size"] == 42
+        assert variables["heavy"]["extra"] == {"custom": True}
+    finally:
+        INSPECTORS.unregister(Heavy)
+        del get_ipython_shell().user_ns["heavy"]
@@ -0,0 +1,111 @@
+import sys
+
+import numpy as np
+import pandas as pd
+import polars as pl
+
+from sidecar_comms.handlers.memory import MemoryEstimator, estimate_size_bytes
+from sidecar_comms.handlers.variable_explorer import get_kernel_variables
+from sidecar_comms.shell import get_ipython_shell
+
+
+class TestMemoryEstimator:
+    def test_deep_container(self):
+        """Test that items in containers are included in the estimate."""
+        value = [f"{i}" * 100 for i in range(50)]
+        expected = sys.getsizeof(value) + sum(sys.getsizeof(item) for item in value)
+        assert estimate_size_bytes(value) == expected
+
+    def test_dict(self):
+        value = {f"key_{i}": "value" * 10 for i in range(10)}
+        assert estimate_size_bytes(value) > sys.getsizeof(value)
+
+    def test_sampling(self):
+        """Test that large containers are extrapolated from a sample."""
+        value = ["x" * 50 + str(i) for i in range(10_000)]
+        exact = sys.getsizeof(value) + sum(sys.getsizeof(item) for item in value)
+        estimate = MemoryEstimator(sample_size=100).estimate(value)
+        assert abs(estimate - exact) / exact < 0.05
+
+    def test_shared_objects(self):
+        """Test that objects already counted by the same estimator are skipped."""
+        shared = [f"{i}" * 100 for i in range(10)]
+        estimator = MemoryEstimator()
+        first = estimator.estimate({"a": shared})
+        second = estimator.estimate({"b": shared})
+        assert second < first
+        assert second == estimate_size_bytes({"b": None}) - sys.getsizeof(None)
+
+    def test_root_always_counted(self):
+        """Test that a variable referencing an already-counted object still counts itself."""
+        shared = [f"{i}" * 100 for i in range(10)]
+        estimator = MemoryEstimator()
+        estimator.estimate(shared)
+        assert estimator.estimate(shared) == sys.getsizeof(shared)
+
+    def test_interpreter_shared_objects(self):
+        """Test that singletons, small ints and interned strings aren't deduplicated."""
+        estimator = MemoryEstimator()
+        for value in [5, None, True, "x", "name"]:
+            assert estimator.estimate(value) == sys.getsizeof(value)
+            assert estimator.estimate(value) == sys.getsizeof(value)
+        first, second = [1, 2, 3], [1, 2, 3]
+        assert estimator.estimate(first) == estimator.estimate(second)
+
+    def test_object_attributes(self):
+        class Foo:
+            def __init__(self):
+                self.data = "x" * 10_000
+
+        assert estimate_size_bytes(Foo()) > 10_000
+
+    def test_generator_not_consumed(self):
+        gen = (i for i in range(3))
+        assert estimate_size_bytes(gen) == sys.getsizeof(gen)
+        assert list(gen) == [0, 1, 2]
+
+    def test_time_budget(self):
+        """Test that running out of time still returns an estimate."""
+        value = [str(i) for i in range(1000)]
+        estimate = MemoryEstimator(time_budget=0).estimate(value)
+        assert estimate >= sys.getsizeof(value)
+
+
+class TestFastPaths:
+    def test_numpy(self):
+        arr = np.zeros(10_000)
+        assert estimate_size_bytes(arr) >= arr.nbytes
+
+    def test_numpy_view(self):
+        arr = np.zeros(10_000)
+        estimator = MemoryEstimator()
+        estimator.estimate(arr)
+        # the view's data was already counted with the base array
+        assert estimator.estimate(arr[10:]) < arr.nbytes
+
+    def test_pandas(self):
+        df = pd.DataFrame({"a": range(1000)})
+        assert estimate_size_bytes(df) == df.memory_usage(deep=False).sum()
+
+    def test_polars(self):
+        df = pl.DataFrame({"a": range(1000)})
+        assert estimate_size_bytes(df) == df.estimated_size()
+
+
+def test_kernel_variables_size_bytes():
+    """Test that DataFrames now report size_bytes, and that the deep size is used."""
+    shell = get_ipython_shell()
+    shell.user_ns["mem_df"] = pd.DataFrame({"a": range(1000)})
+    shell.user_ns["mem_list"] = [f"{i}" * 100 for i in range(10)]
+    variables = get_kernel_variables()
+    assert variables["mem_df"]["size_bytes"] >= 8000
+    assert variables["mem_list"]["size_bytes"] > sys.getsizeof(shell.user_ns["mem_list"])
+
+
+def test_kernel_variables_equal_scalars():
+    shell = get_ipython_shell()
+    shell.user_ns.update(mem_a=5, mem_b=5, mem_c=None, mem_d=None, mem_l=[1, 2], mem_m=[1, 2])
+    variables = get_kernel_variables()
+    assert variables["mem_b"]["size_bytes"] == variables["mem_a"]["size_bytes"] > 0
+    assert variables["mem_d"]["size_bytes"] == sys.getsizeof(None)
+    assert variables["mem_m"]["size_bytes"] == variables["mem_l"]["size_bytes"]
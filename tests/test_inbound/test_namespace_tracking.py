@@ -0,0 +1,207 @@
+import ast
+import types
+from unittest.mock import Mock
+
+import pytest
+
+from sidecar_comms.handlers.namespace_tracking import (
+    NamespaceTracker,
+    active_namespace_tracker,
+    assigned_names,
+    disable_namespace_tracking,
+    enable_namespace_tracking,
+    namespace_tracker,
+)
+from sidecar_comms.handlers.variable_explorer import rename_kernel_variable, set_kernel_variable
+from sidecar_comms.handlers.variable_snapshot import VariableSnapshot
+from sidecar_comms.inbound import handle_msg
+from sidecar_comms.shell import get_ipython_shell
+
+
+@pytest.fixture
+def tracked_shell():
+    """Enables namespace tracking, disabling it afterwards."""
+    shell = get_ipython_shell()
+    original_ns = shell.user_ns
+    namespace_tracker().global_names.clear()
+    assert enable_namespace_tracking(shell) is True
+    yield shell
+    disable_namespace_tracking(shell)
+    assert shell.user_ns is original_ns
+
+
+class TestAssignedNames:
+    def test_bindings(self):
+        tree = ast.parse(
+            "a = 1\n"
+            "b += 1\n"
+            "c: int = 2\n"
+            "for d in []: pass\n"
+            "with open('f') as e: pass\n"
+            "(f := 1)\n"
+            "del g\n"
+            "import h.sub\n"
+            "from i import j as k\n"
+            "def l(): pass\n"
+            "class m: pass\n"
+            "try: pass\n"
+            "except Exception as n: pass\n"
+            "print(o)\n"
+        )
+        names, global_names, complete = assigned_names(tree)
+        assert names == set("abcdefghklmn")
+        assert global_names == set()
+        assert complete is True
+
+    def test_globals(self):
+        tree = ast.parse("def fn():\n    global a\n    a = 1")
+        names, global_names, complete = assigned_names(tree)
+        assert global_names == {"a"}
+
+    @pytest.mark.parametrize(
+        "cell",
+        [
+            "from os import *",
+            "exec('a = 1')",
+            "globals()['a'] = 1",
+            "get_ipython().run_line_magic('run', 'x')",
+        ],
+    )
+    def test_incomplete(self, cell):
+        assert assigned_names(ast.parse(cell))[2] is False
+
+
+class TestNamespaceTracker:
+    def test_records_changes(self):
+        tracker = NamespaceTracker()
+        dirty = tracker.subscribe()
+        tree = ast.parse("a = 1")
+        assert tracker.visit(tree) is tree
+        assert dirty.drain() == {"a"}
+        assert dirty == set()
+
+    def test_independent_subscribers(self):
+        tracker = NamespaceTracker()
+        first = tracker.subscribe()
+        second = tracker.subscribe()
+        tracker.visit(ast.parse("a = 1"))
+        assert first.drain() == {"a"}
+        assert second.drain() == {"a"}
+
+    def test_pause(self):
+        tracker = NamespaceTracker()
+        dirty = tracker.subscribe()
+        tracker.pause()
+        tracker.visit(ast.parse("a = 1"))
+        assert dirty == set()
+        assert dirty.overflowed is True
+
+    def test_overflow(self):
+        tracker = NamespaceTracker()
+        dirty = tracker.subscribe()
+        tracker.visit(ast.parse("from os import *"))
+        assert dirty.overflowed is True
+
+    def test_global_names_marked_every_cell(self):
+        tracker = NamespaceTracker()
+        dirty = tracker.subscribe()
+        tracker.visit(ast.parse("def fn():\n    global a\n    a = 1"))
+        dirty.drain()
+        tracker.visit(ast.parse("fn()"))
+        assert dirty.drain() == {"a"}
+
+
+class TestShellTracking:
+    def test_executed_code_is_tracked(self, tracked_shell):
+        """Test that names assigned by executed cells are recorded."""
+        dirty = active_namespace_tracker(tracked_shell).subscribe()
+        tracked_shell.run_cell("tracked_a = 1\ndel tracked_a\ntracked_b = 2")
+        assert {"tracked_a", "tracked_b"} <= dirty
+
+    def test_namespace_not_replaced(self, tracked_shell):
+        assert tracked_shell.user_ns is tracked_shell.user_module.__dict__
+        assert type(tracked_shell.user_ns) is dict
+
+    def test_global_function_defined_before(self):
+        """Test that a function using `global` from before tracking was enabled updates
+        the same namespace cells see, and its global is recorded."""
+        shell = get_ipython_shell()
+        shell.run_cell(
+            "tracked_counter = 0\ndef tracked_bump():\n    global tracked_counter\n    tracked_counter += 1"
+        )
+        assert enable_namespace_tracking(shell) is True
+        try:
+            dirty = active_namespace_tracker(shell).subscribe()
+            shell.run_cell("tracked_bump()\ntracked_bump()")
+            shell.run_cell("tracked_seen = tracked_counter")
+            assert shell.user_ns["tracked_seen"] == 2
+            assert "tracked_counter" in dirty
+        finally:
+            disable_namespace_tracking(shell)
+        shell.run_cell("tracked_bump()\ntracked_seen = tracked_counter")
+        assert shell.user_ns["tracked_seen"] == 3
+        shell.run_cell("del tracked_bump")
+
+    def test_global_function_defined_after(self, tracked_shell):
+        """Test that a function using `global` defined while tracking is enabled updates
+        the same namespace cells see, and its global is recorded."""
+        dirty = active_namespace_tracker(tracked_shell).subscribe()
+        tracked_shell.run_cell(
+            "tracked_total = 0\ndef tracked_add():\n    global tracked_total\n    tracked_total += 1"
+        )
+        dirty.drain()
+        tracked_shell.run_cell("tracked_add()")
+        assert "tracked_total" in dirty
+        assert tracked_shell.user_ns["tracked_total"] == 1
+        assert tracked_shell.user_module.__dict__["tracked_total"] == 1
+        disable_namespace_tracking(tracked_shell)
+        tracked_shell.run_cell("tracked_add()\ntracked_seen = tracked_total")
+        assert tracked_shell.user_ns["tracked_seen"] == 2
+        tracked_shell.run_cell("del tracked_add")
+
+    def test_rename_and_set_tracked(self, tracked_shell):
+        dirty = active_namespace_tracker(tracked_shell).subscribe()
+        set_kernel_variable("tracked_old", 1)
+        rename_kernel_variable("tracked_old", "tracked_new")
+        assert dirty.drain() == {"tracked_old", "tracked_new"}
+
+    def test_rejected(self):
+        """Test that the shell is left untouched if it doesn't run AST transformers."""
+        shell = types.SimpleNamespace(user_ns={})
+        assert enable_namespace_tracking(shell) is False
+        assert active_namespace_tracker(shell) is None
+
+
+class TestTrackedSnapshots:
+    def test_only_dirty_names_inspected(self, tracked_shell, mocker):
+        tracked_shell.run_cell("tracked_static = [1, 2, 3]")
+        snapshot = VariableSnapshot()
+        generation = snapshot.changes_since(None)["generation"]
+
+        fingerprint = mocker.patch(
+            "sidecar_comms.handlers.variable_snapshot.variable_fingerprint",
+            return_value=("new",),
+        )
+        tracked_shell.run_cell("tracked_new_var = 1\ndel tracked_static")
+        changes = snapshot.changes_since(generation)
+        assert fingerprint.call_count == 1
+        assert list(changes["added"]) == ["tracked_new_var"]
+        assert changes["removed"] == ["tracked_static"]
+
+    def test_rescan_catches_in_place_changes(self, tracked_shell):
+        tracked_shell.run_cell("tracked_list = [1]")
+        snapshot = VariableSnapshot()
+        generation = snapshot.changes_since(None)["generation"]
+        tracked_shell.user_ns["tracked_list"].append(2)
+        assert snapshot.changes_since(generation)["changed"] == {}
+        changes = snapshot.changes_since(generation, rescan=True)
+        assert list(changes["changed"]) == ["tracked_list"]
+
+
+def test_configure_namespace_tracking_msg(tracked_shell):
+    comm = Mock()
+    handle_msg({"msg": "configure_namespace_tracking", "enabled": False}, comm)
+    assert comm.send.call_args[0][0]["body"] == {"enabled": False}
+    handle_msg({"msg": "configure_namespace_tracking", "enabled": True}, comm)
+    assert comm.send.call_args[0][0]["body"] == {"enabled": True}
+    assert active_namespace_tracker(tracked_shell).recording is True
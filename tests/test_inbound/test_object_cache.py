@@ -0,0 +1,93 @@
+import gc
+
+import pandas as pd
+import polars as pl
+
+from sidecar_comms.handlers.object_cache import ObjectCache
+from sidecar_comms.handlers.variable_explorer import DataFrameInspector
+
+
+class Item:
+    pass
+
+
+class TestObjectCache:
+    def test_get_set(self):
+        cache = ObjectCache()
+        obj = Item()
+        assert cache.get(obj, 1) is None
+        cache.set(obj, 1, "value")
+        assert cache.get(obj, 1) == "value"
+
+    def test_fingerprint_change(self):
+        """Test that a changed fingerprint invalidates the entry."""
+        cache = ObjectCache()
+        obj = Item()
+        cache.set(obj, 1, "value")
+        assert cache.get(obj, 2) is None
+        assert len(cache) == 0
+
+    def test_lru_eviction(self):
+        cache = ObjectCache(maxsize=2)
+        a, b, c = Item(), Item(), Item()
+        cache.set(a, 1, "a")
+        cache.set(b, 1, "b")
+        # mark `a` as recently used so `b` is evicted first
+        cache.get(a, 1)
+        cache.set(c, 1, "c")
+        assert cache.get(a, 1) == "a"
+        assert cache.get(b, 1) is None
+        assert cache.get(c, 1) == "c"
+
+    def test_weakref_eviction(self):
+        """Test that entries are dropped when the object is garbage collected."""
+        cache = ObjectCache()
+        obj = Item()
+        cache.set(obj, 1, "value")
+        del obj
+        gc.collect()
+        assert len(cache) == 0
+
+    def test_not_weak_referenceable(self):
+        cache = ObjectCache()
+        obj = [1, 2, 3]
+        cache.set(obj, 1, "value")
+        assert cache.get(obj, 1) == "value"
+
+
+class TestDataFrameMetadataCache:
+    def test_pandas_cached(self, mocker):
+        """Test that unchanged frames reuse the cached metadata."""
+        inspector = DataFrameInspector()
+        df = pd.DataFrame({"a": [1, 2, 3], "b": ["x", "y", "z"]})
+        extra = inspector.extra(df)
+        assert extra["columns"] == ["a", "b"]
+        assert extra["dtypes"] == {"a": "int64", "b": "object"}
+        assert extra["index"] == [0, 1, 2]
+
+        dtypes = mocker.patch("sidecar_comms.handlers.variable_explorer.variable_extra_dtypes")
+        assert inspector.extra(df) == extra
+        dtypes.assert_not_called()
+
+    def test_structural_change(self):
+        """Test that adding a column invalidates the cached metadata."""
+        inspector = DataFrameInspector()
+        df = pd.DataFrame({"a": [1, 2, 3]})
+        inspector.extra(df)
+        df["b"] = 1.5
+        extra = inspector.extra(df)
+        assert extra["columns"] == ["a", "b"]
+        assert extra["dtypes"]["b"] == "float64"
+
+    def test_polars(self):
+        inspector = DataFrameInspector()
+        df = pl.DataFrame({"a": [1, 2, 3]})
+        extra = inspector.extra(df)
+        assert extra["columns"] == ["a"]
+        assert extra["dtypes"] == {"a": "int64"}
+        assert extra["index"] == []
+
+    def test_datetime_index(self):
+        inspector = DataFrameInspector()
+        df = pd.DataFrame({"a": [1]}, index=pd.to_datetime(["2023-01-01"]))
+        assert inspector.extra(df)["index"] == ["2023-01-01 00:00:00"]
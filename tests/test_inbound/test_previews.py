@@ -0,0 +1,271 @@
+import datetime
+import decimal
+
+import modin.pandas as mpd
+import numpy as np
+import pandas as pd
+import polars as pl
+import pytest
+
+from sidecar_comms.handlers.previews import (
+    MAX_PREVIEW_ROWS,
+    PreviewError,
+    binary_preview,
+    variable_preview,
+)
+from sidecar_comms.inbound import handle_msg
+from sidecar_comms.outbound import SidecarComm
+from sidecar_comms.shell import get_ipython_shell
+
+
+def column_array(header: dict, buffers: list, index: int) -> np.ndarray:
+    column = header["columns"][index]
+    return np.frombuffer(buffers[column["buffer"]], dtype=column["dtype"]).reshape(column["shape"])
+
+
+class TestNumpyPreview:
+    def test_contiguous_not_copied(self):
+        arr = np.arange(100_000, dtype="float64")
+        header, buffers = binary_preview(arr, limit=1000)
+        assert header["kind"] == "ndarray"
+        assert header["shape"] == [100_000]
+        assert header["rows"] == 1000
+        preview = column_array(header, buffers, 0)
+        np.testing.assert_array_equal(preview, arr[:1000])
+        assert np.shares_memory(preview, arr)
+
+    def test_offset_2d(self):
+        arr = np.arange(20).reshape(10, 2)
+        header, buffers = binary_preview(arr, offset=5, limit=2)
+        assert header["columns"][0]["shape"] == [2, 2]
+        np.testing.assert_array_equal(column_array(header, buffers, 0), arr[5:7])
+
+    def test_non_contiguous(self):
+        arr = np.arange(100)[::2]
+        header, buffers = binary_preview(arr, limit=10)
+        np.testing.assert_array_equal(column_array(header, buffers, 0), arr[:10])
+
+    def test_datetimes(self):
+        arr = np.array(["2023-01-01", "2023-01-02"], dtype="datetime64[D]")
+        header, buffers = binary_preview(arr)
+        column = header["columns"][0]
+        assert column["dtype"] == "<M8[D]"
+        values = np.frombuffer(buffers[column["buffer"]], dtype="int64").view(column["dtype"])
+        np.testing.assert_array_equal(values, arr)
+
+    def test_columns(self):
+        arr = np.arange(30).reshape(10, 3)
+        header, buffers = binary_preview(arr, offset=2, limit=2, columns=[0, 2])
+        np.testing.assert_array_equal(column_array(header, buffers, 0), [[6, 8], [9, 11]])
+        with pytest.raises(PreviewError):
+            binary_preview(np.arange(3), columns=[0])
+
+    def test_object_values(self):
+        header, buffers = binary_preview(np.array(["a", None], dtype=object))
+        assert header["columns"][0]["values"] == ["a", None]
+        assert buffers == []
+
+
+class TestDataFramePreview:
+    @pytest.mark.parametrize("df_class", [pd.DataFrame, mpd.DataFrame])
+    def test_pandas(self, df_class):
+        df = df_class({"a": np.arange(1000), "b": np.arange(1000) / 2, "c": ["x"] * 1000})
+        header, buffers = binary_preview(df, offset=10, limit=5)
+        assert header["kind"] == "dataframe"
+        assert header["shape"] == [1000, 3]
+        assert header["rows"] == 5
+        assert [column["name"] for column in header["columns"]] == ["a", "b", "c"]
+        np.testing.assert_array_equal(column_array(header, buffers, 0), np.arange(10, 15))
+        np.testing.assert_array_equal(column_array(header, buffers, 1), np.arange(10, 15) / 2)
+        assert header["columns"][2]["values"] == ["x"] * 5
+        index = header["index"]
+        np.testing.assert_array_equal(
+            np.frombuffer(buffers[index["buffer"]], dtype=index["dtype"]), np.arange(10, 15)
+        )
+
+    def test_pandas_columns(self):
+        df = pd.DataFrame({"a": [1, 2], "b": [3, 4]})
+        header, buffers = binary_preview(df, columns=["b"])
+        assert [column["name"] for column in header["columns"]] == ["b"]
+        np.testing.assert_array_equal(column_array(header, buffers, 0), [3, 4])
+
+    def test_columns_only_select_window(self, mocker):
+        """Test that columns are selected from the window rather than the whole frame."""
+        df = pd.DataFrame({"a": np.arange(100_000), "b": np.arange(100_000)})
+        getitem = mocker.spy(pd.DataFrame, "__getitem__")
+        header, buffers = binary_preview(df, offset=50_000, limit=2, columns=["b"])
+        assert header["shape"] == [100_000, 1]
+        np.testing.assert_array_equal(column_array(header, buffers, 0), [50_000, 50_001])
+        assert len(getitem.call_args[0][0]) == 2
+
+    def test_polars(self):
+        df = pl.DataFrame({"a": np.arange(1000), "b": ["x"] * 1000})
+        header, buffers = binary_preview(df, offset=990, limit=20, columns=["a"])
+        assert header["shape"] == [1000, 1]
+        assert header["rows"] == 10
+        np.testing.assert_array_equal(column_array(header, buffers, 0), np.arange(990, 1000))
+
+    def test_series(self):
+        header, buffers = binary_preview(pl.Series("s", [1.0, 2.0]))
+        assert header["columns"][0]["name"] == "s"
+        header, buffers = binary_preview(pd.Series([1.0, 2.0], name="s"))
+        assert header["columns"][0]["name"] == "s"
+
+    def test_json_columns_not_truncated(self):
+        """Test that columns sent as JSON values have a value for every row."""
+        df = pd.DataFrame(
+            {
+                "x": np.arange(5000),
+                "s": ["v"] * 5000,
+                "tz": pd.date_range("2020-01-01", periods=5000, freq="s", tz="UTC"),
+            }
+        )
+        header, buffers = binary_preview(df, limit=3000)
+        assert header["rows"] == 3000
+        assert len(column_array(header, buffers, 0)) == 3000
+        assert len(header["columns"][1]["values"]) == 3000
+        assert header["columns"][2]["values"][:2] == [
+            "2020-01-01T00:00:00+00:00",
+            "2020-01-01T00:00:01+00:00",
+        ]
+
+    def test_limit_capped(self):
+        header, _ = binary_preview(np.arange(MAX_PREVIEW_ROWS * 2), limit=MAX_PREVIEW_ROWS * 2)
+        assert header["rows"] == MAX_PREVIEW_ROWS
+
+
+def test_unsupported():
+    with pytest.raises(PreviewError):
+        binary_preview([1, 2, 3])
+
+
+def test_binary_preview_msg(mocker):
+    get_ipython_shell().user_ns["preview_arr"] = np.arange(10, dtype="int32")
+    comm = mocker.Mock()
+    handle_msg({"msg": "get_variable_binary_preview", "name": "preview_arr", "limit": 3}, comm)
+    msg = comm.send.call_args[0][0]
+    buffers = comm.send.call_args[1]["buffers"]
+    assert msg["handler"] == "get_variable_binary_preview"
+    assert msg["body"]["name"] == "preview_arr"
+    np.testing.assert_array_equal(column_array(msg["body"], buffers, 0), [0, 1, 2])
+
+    handle_msg({"msg": "get_variable_binary_preview", "name": "missing_var"}, comm)
+    assert "error" in comm.send.call_args[0][0]["body"]
+
+
+def test_sidecar_comm_buffers(mocker):
+    send = mocker.patch("ipykernel.comm.Comm.send")
+    comm = SidecarComm(target_name="preview_test")
+    header, buffers = binary_preview(np.arange(3))
+    comm.send(handler="preview", body=header, buffers=buffers)
+    assert send.call_args[1]["buffers"] == buffers
+    assert send.call_args[1]["data"]["body"] == header
+
+
+class TestVariablePreview:
+    @pytest.mark.parametrize("df_class", [pd.DataFrame, mpd.DataFrame])
+    def test_pandas(self, df_class):
+        df = df_class({"a": range(1000), "b": [1.5, float("nan")] * 500, "c": ["x"] * 1000})
+        preview = variable_preview(df, offset=10, limit=2, columns=["a", "b"])
+        assert preview == {
+            "kind": "dataframe",
+            "offset": 10,
+            "limit": 2,
+            "total": 1000,
+            "columns": ["a", "b"],
+            "dtypes": ["int64", "float64"],
+            "index": [10, 11],
+            "data": [[10, 1.5], [11, None]],
+        }
+
+    def test_large_frame_only_slices_window(self, mocker):
+        df = pd.DataFrame({"a": range(100_000)})
+        itertuples = mocker.spy(pd.DataFrame, "itertuples")
+        preview = variable_preview(df, offset=99_998, limit=10)
+        assert preview["data"] == [[99_998], [99_999]]
+        assert len(itertuples.call_args[0][0]) == 2
+
+    def test_columns_only_select_window(self, mocker):
+        """Test that columns are selected from the window rather than the whole frame."""
+        df = pd.DataFrame({"a": range(100_000), "b": range(100_000), "c": range(100_000)})
+        getitem = mocker.spy(pd.DataFrame, "__getitem__")
+        preview = variable_preview(df, offset=50_000, limit=2, columns=["a", "c"])
+        assert preview["total"] == 100_000
+        assert preview["data"] == [[50_000, 50_000], [50_001, 50_001]]
+        assert len(getitem.call_args[0][0]) == 2
+
+    def test_polars(self):
+        df = pl.DataFrame({"a": range(10), "b": ["x"] * 10})
+        preview = variable_preview(df, offset=8, limit=5)
+        assert preview["total"] == 10
+        assert preview["columns"] == ["a", "b"]
+        assert preview["data"] == [[8, "x"], [9, "x"]]
+
+    def test_numpy(self):
+        arr = np.arange(20, dtype="float64").reshape(10, 2)
+        arr[5, 0] = np.nan
+        preview = variable_preview(arr, offset=5, limit=2)
+        assert preview["total"] == 10
+        assert preview["shape"] == [10, 2]
+        assert preview["data"] == [[None, 11.0], [12.0, 13.0]]
+        assert variable_preview(arr, limit=1, columns=[1])["data"] == [[1.0]]
+
+    def test_sequences(self):
+        assert variable_preview(list(range(100)), offset=98)["data"] == [98, 99]
+        assert variable_preview(range(100), offset=10, limit=2)["data"] == [10, 11]
+        preview = variable_preview({"a": 1, "b": 2, "c": 3}, offset=1, limit=1)
+        assert preview["data"] == [["b", 2]]
+        assert preview["total"] == 3
+        assert variable_preview({1, 2, 3}, limit=5)["total"] == 3
+
+    def test_text(self):
+        preview = variable_preview("x" * 1000 + "abc", offset=1000)
+        assert preview == {
+            "kind": "text",
+            "offset": 1000,
+            "limit": 1000,
+            "total": 1003,
+            "data": "abc",
+        }
+
+    def test_limit_capped(self):
+        assert (
+            len(variable_preview(list(range(100_000)), limit=100_000)["data"]) == MAX_PREVIEW_ROWS
+        )
+
+    def test_non_json_scalars(self):
+        """Test that dates, Decimals and the like are sent as strings instead of None."""
+        df = pd.DataFrame(
+            {
+                "when": pd.to_datetime(["2020-01-01", None]),
+                "day": [datetime.date(2020, 1, 2)] * 2,
+                "amount": [decimal.Decimal("1.50")] * 2,
+            },
+            index=pd.date_range("2021-01-01", periods=2),
+        )
+        preview = variable_preview(df)
+        assert preview["index"] == ["2021-01-01T00:00:00", "2021-01-02T00:00:00"]
+        assert preview["data"] == [
+            ["2020-01-01T00:00:00", "2020-01-02", "1.50"],
+            [None, "2020-01-02", "1.50"],
+        ]
+        assert variable_preview(np.array([np.int64(1)], dtype=object))["data"] == [1]
+
+    def test_iterators_not_consumed(self):
+        gen = (i for i in range(3))
+        with pytest.raises(PreviewError):
+            variable_preview(gen)
+        assert list(gen) == [0, 1, 2]
+
+
+def test_preview_msg(mocker):
+    get_ipython_shell().user_ns["preview_df"] = pd.DataFrame({"a": range(100)})
+    comm = mocker.Mock()
+    msg = {"msg": "get_variable_preview", "name": "preview_df", "offset": 50, "limit": 2}
+    handle_msg(msg, comm)
+    body = comm.send.call_args[0][0]["body"]
+    assert body["name"] == "preview_df"
+    assert body["data"] == [[50], [51]]
+
+    handle_msg({"msg": "get_variable_preview", "name": "preview_df", "columns": ["z"]}, comm)
+    assert "error" in comm.send.call_args[0][0]["body"]
@@ -1,9 +1,28 @@
+import json
+import time
+from collections import namedtuple
+
 import modin.pandas as mpd
 import pandas as pd
 import polars as pl
 import pytest
+from pydantic import ValidationError
 
-from sidecar_comms.handlers.variable_explorer import get_kernel_variables, variable_sample_value
+from sidecar_comms.handlers import variable_explorer
+from sidecar_comms.handlers.memory import MemoryEstimator
+from sidecar_comms.handlers.variable_explorer import (
+    SLOW_TYPES,
+    get_kernel_variable_details,
+    get_kernel_variable_index,
+    get_kernel_variables,
+    get_kernel_variables_page,
+    iter_kernel_variable_chunks,
+    json_clean,
+    variable_sample_value,
+    variable_to_model,
+)
+from sidecar_comms.handlers.variable_snapshot import variable_fingerprint
+from sidecar_comms.inbound import handle_msg
 from sidecar_comms.shell import get_ipython_shell
 
 
@@ -132,6 +151,264 @@ class TestGetKernelVariables:
         assert variables[variable_name].get("error") is not None
 
 
+class TestLazyVariableListing:
+    def test_index(self):
+        """Test that the index only includes basic properties and skips inspection."""
+        get_ipython_shell().user_ns["index_slow"] = SlowLength()
+        SlowLength.calls = 0
+        index = get_kernel_variable_index()
+        assert index["index_slow"] == {
+            "name": "index_slow",
+            "type": "SlowLength",
+            "module": __name__,
+        }
+        assert SlowLength.calls == 0
+
+    def test_details(self):
+        """Test that details are only returned for the requested names."""
+        shell = get_ipython_shell()
+        shell.user_ns["detail_a"] = [1, 2, 3]
+        shell.user_ns["detail_b"] = 2
+        details = get_kernel_variable_details(["detail_a", "missing_variable"])
+        assert set(details) == {"detail_a", "missing_variable"}
+        assert details["detail_a"]["size"] == 3
+        assert details["detail_a"]["sample_value"] == [1, 2, 3]
+        assert details["missing_variable"] is None
+
+
+class TestStreamedVariables:
+    def test_chunks(self):
+        """Test that streamed chunks are size-bounded, ordered, and cover every variable."""
+        shell = get_ipython_shell()
+        for i in range(20):
+            shell.user_ns[f"stream_{i}"] = "x" * 1000
+        chunks = list(iter_kernel_variable_chunks(chunk_bytes=5000))
+        assert len(chunks) > 2
+        assert [chunk["sequence"] for chunk in chunks] == list(range(len(chunks)))
+        assert len({chunk["stream_id"] for chunk in chunks}) == 1
+        assert [chunk["complete"] for chunk in chunks] == [False] * (len(chunks) - 1) + [True]
+
+        streamed = {}
+        for chunk in chunks[:-1]:
+            assert chunk["variables"]
+            # the estimate ignores whitespace, so leave some slack
+            assert len(json.dumps(chunk["variables"])) < 5000 * 1.2
+            streamed.update(chunk["variables"])
+        assert chunks[-1]["variables"] == {}
+        assert chunks[-1]["total"] == len(streamed)
+        assert streamed == get_kernel_variables()
+
+    def test_large_variable(self):
+        """Test that a variable larger than the chunk size still gets sent."""
+        get_ipython_shell().user_ns["stream_large"] = "x" * 10_000
+        chunks = list(iter_kernel_variable_chunks(chunk_bytes=100))
+        assert any("stream_large" in chunk["variables"] for chunk in chunks)
+
+    def test_stream_msg(self, mocker):
+        get_ipython_shell().user_ns["stream_msg_var"] = 1
+        comm = mocker.Mock()
+        handle_msg({"msg": "get_kernel_variables", "stream": True}, comm)
+        messages = [call[0][0] for call in comm.send.call_args_list]
+        assert {msg["handler"] for msg in messages} == {"get_kernel_variables_chunk"}
+        assert messages[-1]["body"]["complete"] is True
+        assert "stream_msg_var" in messages[0]["body"]["variables"]
+
+
+class TestVariableQuery:
+    @pytest.fixture(autouse=True)
+    def variables(self):
+        shell = get_ipython_shell()
+        shell.user_ns["query_small"] = [1]
+        shell.user_ns["query_large"] = list(range(100))
+        shell.user_ns["query_df"] = pd.DataFrame({"a": range(10), "b": range(10)})
+        shell.user_ns["query_str"] = "x" * 10_000
+        yield
+        for name in ["query_small", "query_large", "query_df", "query_str", "query_slow"]:
+            shell.user_ns.pop(name, None)
+
+    def test_name_filters(self):
+        assert set(get_kernel_variables(query={"name": "query_*l*"})) == {
+            "query_small",
+            "query_large",
+        }
+        assert set(get_kernel_variables(query={"name_regex": "^query_(df|str)$"})) == {
+            "query_df",
+            "query_str",
+        }
+
+    def test_type_filters(self):
+        assert list(get_kernel_variables(query={"name": "query_*", "types": ["list"]})) == [
+            "query_small",
+            "query_large",
+        ]
+        query = {"types": ["pandas.core.frame.DataFrame"]}
+        assert "query_df" in get_kernel_variables(query=query)
+        query = {"name": "query_*", "modules": ["pandas"]}
+        assert list(get_kernel_variables(query=query)) == ["query_df"]
+
+    def test_filters_before_inspection(self):
+        """Test that variables not matching the type filter are never inspected."""
+        get_ipython_shell().user_ns["query_slow"] = SlowLength()
+        SlowLength.calls = 0
+        get_kernel_variables(query={"types": ["list"], "sort": "size"})
+        assert SlowLength.calls == 0
+
+    def test_sort_limit(self):
+        query = {"name": "query_*", "sort": "size", "limit": 2}
+        assert list(get_kernel_variables(query=query)) == ["query_str", "query_large"]
+        query = {"name": "query_*", "sort": "size", "descending": False, "limit": 1}
+        assert list(get_kernel_variables(query=query)) == ["query_small"]
+        query = {"name": "query_*", "sort": "name"}
+        assert list(get_kernel_variables(query=query)) == [
+            "query_df",
+            "query_large",
+            "query_small",
+            "query_str",
+        ]
+
+    def test_sort_size_bytes(self):
+        query = {"name": "query_*", "sort": "size_bytes", "limit": 1}
+        assert list(get_kernel_variables(query=query)) == ["query_str"]
+
+    def test_sort_size_bytes_shared(self, mocker):
+        """Test that sizes are sorted by the same (deduplicating) estimates they report,
+        and that each variable is only estimated once."""
+        shell = get_ipython_shell()
+        big = [str(i) * 100 for i in range(1000)]
+        medium = [str(i) * 10 for i in range(1000)]
+        shell.user_ns.update({"shared_a": [big, "tiny"], "shared_b": [big], "shared_c": [medium]})
+        estimate = mocker.spy(MemoryEstimator, "estimate")
+        try:
+            variables = get_kernel_variables(query={"name": "shared_*", "sort": "size_bytes"})
+        finally:
+            for name in ["shared_a", "shared_b", "shared_c"]:
+                shell.user_ns.pop(name)
+        assert list(variables) == ["shared_a", "shared_c", "shared_b"]
+        sizes = [variable["size_bytes"] for variable in variables.values()]
+        assert sizes == sorted(sizes, reverse=True)
+        assert estimate.call_count == 3
+
+    def test_only_top_k_inspected(self, mocker):
+        spy = mocker.spy(variable_explorer, "variable_to_model")
+        get_kernel_variables(query={"name": "query_*", "sort": "name", "limit": 2})
+        assert [call.kwargs["name"] for call in spy.call_args_list] == ["query_df", "query_large"]
+
+    def test_invalid_query(self):
+        with pytest.raises(ValidationError):
+            get_kernel_variables(query={"sort": "color"})
+
+    def test_query_msg(self, mocker):
+        comm = mocker.Mock()
+        msg = {"msg": "get_kernel_variables", "query": {"name": "query_*", "limit": 1}}
+        handle_msg(msg, comm)
+        assert len(comm.send.call_args[0][0]["body"]) == 1
+
+
+class SlowLength:
+    calls = 0
+
+    def __len__(self):
+        SlowLength.calls += 1
+        time.sleep(0.02)
+        return 1
+
+
+class TestBudgetedVariables:
+    @pytest.fixture(autouse=True)
+    def reset_slow_types(self):
+        SlowLength.calls = 0
+        yield
+        SLOW_TYPES.clear()
+
+    def test_variable_time_budget(self):
+        """Test that a variable exceeding its time budget is marked as timed out,
+        and that its type is skipped on subsequent budgeted inspections."""
+        model = variable_to_model("slow", SlowLength(), time_budget=0.001)
+        assert model.timed_out is True
+        assert model.size == 1
+        assert SlowLength in SLOW_TYPES
+        assert SlowLength.calls == 1
+
+        model = variable_to_model("slow", SlowLength(), time_budget=0.001)
+        assert model.timed_out is True
+        assert model.size is None
+        assert model.type == "SlowLength"
+        assert SlowLength.calls == 1
+
+    def test_no_budget(self):
+        """Test that unbudgeted inspection ignores slow types."""
+        SLOW_TYPES.add(SlowLength)
+        model = variable_to_model("slow", SlowLength())
+        assert model.timed_out is False
+        assert model.size == 1
+
+    def test_builtins_not_recorded(self):
+        """Test that a slow builtin instance doesn't mark its type as slow."""
+        big = [{"a": i} for i in range(100_000)]
+        assert variable_to_model("big", big, time_budget=0.0001).timed_out is True
+        assert list not in SLOW_TYPES
+        model = variable_to_model("small", [1, 2], time_budget=1.0)
+        assert model.timed_out is False
+        assert model.size == 2
+
+    def test_slow_types_expire(self, mocker):
+        SLOW_TYPES.add(SlowLength)
+        assert SlowLength in SLOW_TYPES
+        mocker.patch("time.monotonic", return_value=time.monotonic() + SLOW_TYPES.ttl)
+        assert SlowLength not in SLOW_TYPES
+
+    def test_slow_dataframe_fingerprint(self):
+        """Test that slow types with O(1) sizes still have their size fingerprinted."""
+        SLOW_TYPES.add(pd.DataFrame)
+        SLOW_TYPES.add(SlowLength)
+        assert variable_fingerprint(pd.DataFrame({"a": [1, 2]}))[2] is not None
+        assert variable_fingerprint(SlowLength())[2] is None
+
+    def test_snapshot_cursor(self):
+        """Test that a snapshot exceeding its time budget returns a cursor for the rest."""
+        shell = get_ipython_shell()
+        for i in range(3):
+            shell.user_ns[f"slow_{i}"] = SlowLength()
+
+        seen = {}
+        cursor = None
+        pages = 0
+        while True:
+            page = get_kernel_variables_page(cursor=cursor, time_budget=0.001)
+            pages += 1
+            seen.update(page["variables"])
+            cursor = page["cursor"]
+            if cursor is None:
+                break
+        assert pages > 1
+        assert all(f"slow_{i}" in seen for i in range(3))
+        assert seen.keys() == get_kernel_variables().keys()
+
+    def test_cursor_namespace_changes(self):
+        """Test that variables added or deleted between pages don't shift the cursor."""
+        shell = get_ipython_shell()
+        for name in ["page_a", "page_b", "page_c", "page_d"]:
+            shell.user_ns[name] = 1
+
+        returned = []
+        cursor = None
+        while True:
+            # a zero budget returns one variable per page
+            page = get_kernel_variables_page(cursor=cursor, time_budget=0)
+            returned.extend(page["variables"])
+            cursor = page["cursor"]
+            if cursor == "page_b":
+                del shell.user_ns["page_a"]
+                shell.user_ns["page_0"] = 1
+                shell.user_ns["page_z"] = 1
+            if cursor is None:
+                break
+        assert len(returned) == len(set(returned))
+        assert {"page_a", "page_b", "page_c", "page_d", "page_z"} <= set(returned)
+        assert "page_0" not in returned
+        del shell.user_ns["page_0"]
+
+
 class TestDataFrameVariables:
     @pytest.fixture
     def pandas_dataframe(self):
@@ -174,3 +451,69 @@ class TestDataFrameVariables:
             if "dtypes" in variables[variable_name]["extra"]:
                 assert isinstance(variables[variable_name]["extra"]["dtypes"], dict)
                 assert "a" in variables[variable_name]["extra"]["dtypes"]
+
+    @pytest.mark.parametrize("df_class", [pd.DataFrame, mpd.DataFrame])
+    def test_in_place_changes(self, df_class):
+        """Test that cached extras are refreshed when dtypes or the index change in place."""
+        df = df_class({"a": [1, 2, 3], "b": [4, 5, 6]})
+        extra = variable_to_model("df", df).extra
+        assert extra["dtypes"]["a"] == "int64"
+        assert extra["index"] == [0, 1, 2]
+
+        df["a"] = df["a"].astype(str)
+        df.index = ["x", "y", "z"]
+        extra = variable_to_model("df", df).extra
+        assert extra["dtypes"]["a"] != "int64"
+        assert extra["index"] == ["x", "y", "z"]
+
+
+class TestSampleValue:
+    def test_large_list_not_copied(self):
+        """Test that sampling only iterates over the first few items of a container."""
+
+        class CountingList(list):
+            iterated = 0
+
+            def __iter__(self):
+                for item in super().__iter__():
+                    CountingList.iterated += 1
+                    yield item
+
+        value = CountingList(range(1_000_000))
+        assert variable_sample_value(value) == [0, 1, 2, 3, 4]
+        assert CountingList.iterated == 5
+
+    def test_large_dict_bounded(self):
+        """Test that only part of a large dict is checked before it's truncated."""
+        value = {i: list(range(100)) for i in range(100_000)}
+        start = time.perf_counter()
+        sample = variable_sample_value(value)
+        assert time.perf_counter() - start < 0.5
+        assert sample.startswith("{0: [0, 1, 2")
+        assert sample.endswith("...")
+
+    def test_namedtuple(self):
+        """Test that tuple subclasses are sampled as plain tuples."""
+        Point = namedtuple("Point", ["x", "y"])
+        assert variable_sample_value(Point(1, 2)) == (1, 2)
+
+    def test_generator_not_consumed(self):
+        """Test that one-shot iterators are not consumed when sampled."""
+        gen = (i for i in range(3))
+        assert variable_sample_value(gen) is None
+        assert list(gen) == [0, 1, 2]
+
+    def test_generator_variable(self):
+        gen = (i for i in range(3))
+        get_ipython_shell().user_ns["sample_gen"] = gen
+        variables = get_kernel_variables()
+        assert variables["sample_gen"]["type"] == "generator"
+        assert variables["sample_gen"]["error"] is None
+        assert list(gen) == [0, 1, 2]
+
+
+def test_json_clean_max_length():
+    value = {"a": "x" * 1000, "b": print}
+    assert json_clean(value) == {"a": "x" * 1000, "b": None}
+    cleaned = json_clean(value, max_length=100)
+    assert len(json.dumps(cleaned)) <= 110
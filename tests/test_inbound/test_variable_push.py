@@ -0,0 +1,89 @@
+import asyncio
+from unittest.mock import Mock
+
+import pytest
+
+from sidecar_comms.handlers.variable_push import VariablePusher
+from sidecar_comms.inbound import handle_msg
+from sidecar_comms.shell import get_ipython_shell
+
+
+@pytest.fixture
+def mock_comm(mocker) -> Mock:
+    comm = Mock()
+    manager = mocker.patch("sidecar_comms.handlers.variable_push.comm_manager")
+    manager.return_value.open_comm.return_value = comm
+    return comm
+
+
+@pytest.fixture
+def pusher():
+    pusher = VariablePusher()
+    yield pusher
+    pusher.disable()
+
+
+class TestVariablePusher:
+    def test_push_without_event_loop(self, pusher: VariablePusher, mock_comm: Mock):
+        """Test that a post_run_cell event pushes immediately when there's no running loop."""
+        shell = get_ipython_shell()
+        pusher.enable(window=1)
+        shell.user_ns["push_a"] = 1
+        shell.events.trigger("post_run_cell", None)
+
+        mock_comm.send.assert_called_once()
+        kwargs = mock_comm.send.call_args.kwargs
+        assert kwargs["handler"] == "variable_changes"
+        assert kwargs["body"]["full"] is True
+        assert "push_a" in kwargs["body"]["added"]
+
+    def test_no_push_without_changes(self, pusher: VariablePusher, mock_comm: Mock):
+        """Test that nothing is sent if no variables changed since the last push."""
+        shell = get_ipython_shell()
+        pusher.enable(window=0)
+        shell.events.trigger("post_run_cell", None)
+        shell.events.trigger("post_run_cell", None)
+        assert mock_comm.send.call_count == 1
+
+        shell.user_ns["push_b"] = 2
+        shell.events.trigger("post_run_cell", None)
+        assert mock_comm.send.call_count == 2
+        body = mock_comm.send.call_args.kwargs["body"]
+        assert body["full"] is False
+        assert list(body["added"]) == ["push_b"]
+
+    def test_debounce(self, pusher: VariablePusher, mock_comm: Mock):
+        """Test that rapid executions within the window are coalesced into one push."""
+        shell = get_ipython_shell()
+        pusher.enable(window=0.05)
+
+        async def run_cells():
+            for i in range(10):
+                shell.user_ns[f"push_loop_{i}"] = i
+                shell.events.trigger("post_run_cell", None)
+            await asyncio.sleep(0.1)
+
+        asyncio.run(run_cells())
+        mock_comm.send.assert_called_once()
+        body = mock_comm.send.call_args.kwargs["body"]
+        assert all(f"push_loop_{i}" in body["added"] for i in range(10))
+
+    def test_disable(self, pusher: VariablePusher, mock_comm: Mock):
+        """Test that disabling unregisters the post_run_cell callback."""
+        shell = get_ipython_shell()
+        pusher.enable(window=0)
+        pusher.disable()
+        shell.events.trigger("post_run_cell", None)
+        mock_comm.send.assert_not_called()
+
+
+def test_configure_variable_push_msg(mock_comm: Mock):
+    """Test that the configure_variable_push message toggles automatic pushes."""
+    comm = Mock()
+    handle_msg({"msg": "configure_variable_push", "enabled": True, "window": 0.25}, comm)
+    body = comm.send.call_args[0][0]["body"]
+    assert body == {"enabled": True, "window": 0.25}
+
+    handle_msg({"msg": "configure_variable_push", "enabled": False}, comm)
+    body = comm.send.call_args[0][0]["body"]
+    assert body["enabled"] is False
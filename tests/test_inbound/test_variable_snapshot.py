@@ -0,0 +1,96 @@
+from unittest.mock import Mock
+
+from sidecar_comms.handlers.variable_snapshot import VariableSnapshot, variable_fingerprint
+from sidecar_comms.inbound import handle_msg
+from sidecar_comms.shell import get_ipython_shell
+
+
+class TestVariableSnapshot:
+    def test_initial_snapshot_is_full(self):
+        """Test that the first delta request returns every variable as added."""
+        get_ipython_shell().user_ns["snap_a"] = 1
+        snapshot = VariableSnapshot()
+        changes = snapshot.changes_since(None)
+        assert changes["full"] is True
+        assert changes["generation"] == 1
+        assert "snap_a" in changes["added"]
+        assert changes["added"]["snap_a"]["sample_value"] == 1
+
+    def test_added_changed_removed(self):
+        """Test that only added, changed, and removed variables are returned
+        for a known generation."""
+        shell = get_ipython_shell()
+        shell.user_ns["snap_keep"] = "same"
+        shell.user_ns["snap_change"] = [1, 2]
+        shell.user_ns["snap_remove"] = 3
+        snapshot = VariableSnapshot()
+        generation = snapshot.changes_since(None)["generation"]
+
+        shell.user_ns["snap_change"].append(3)
+        shell.user_ns["snap_new"] = 4
+        del shell.user_ns["snap_remove"]
+        changes = snapshot.changes_since(generation)
+
+        assert changes["full"] is False
+        assert changes["generation"] == generation + 1
+        assert list(changes["added"]) == ["snap_new"]
+        assert list(changes["changed"]) == ["snap_change"]
+        assert changes["changed"]["snap_change"]["size"] == 3
+        assert changes["removed"] == ["snap_remove"]
+
+    def test_no_changes_keeps_generation(self):
+        """Test that scanning an unchanged namespace doesn't bump the generation
+        or re-inspect any variables."""
+        get_ipython_shell().user_ns["snap_static"] = 1
+        snapshot = VariableSnapshot()
+        generation = snapshot.changes_since(None)["generation"]
+        changes = snapshot.changes_since(generation)
+        assert changes["generation"] == generation
+        assert changes["added"] == {}
+        assert changes["changed"] == {}
+        assert changes["removed"] == []
+
+    def test_unknown_generation_is_full(self):
+        """Test that a generation from the future falls back to a full snapshot."""
+        snapshot = VariableSnapshot()
+        changes = snapshot.changes_since(100)
+        assert changes["full"] is True
+
+    def test_trimmed_history_is_full(self):
+        """Test that a generation older than the retained removal history
+        falls back to a full snapshot."""
+        shell = get_ipython_shell()
+        shell.user_ns["snap_x"] = 1
+        shell.user_ns["snap_y"] = 2
+        snapshot = VariableSnapshot(max_removed_history=1)
+        generation = snapshot.changes_since(None)["generation"]
+        del shell.user_ns["snap_x"]
+        snapshot.update()
+        del shell.user_ns["snap_y"]
+        changes = snapshot.changes_since(generation)
+        assert changes["full"] is True
+        assert "snap_x" not in changes["added"]
+
+    def test_fingerprint_version(self):
+        """Test that a version counter is part of the fingerprint where available."""
+
+        class Versioned:
+            _version = 0
+
+        value = Versioned()
+        before = variable_fingerprint(value)
+        value._version += 1
+        assert variable_fingerprint(value) != before
+
+
+def test_get_kernel_variable_changes_msg():
+    """Test that the get_kernel_variable_changes comm message returns a delta body."""
+    get_ipython_shell().user_ns["snap_msg"] = 1
+    comm = Mock()
+    handle_msg({"msg": "get_kernel_variable_changes"}, comm)
+    comm.send.assert_called_once()
+    sent = comm.send.call_args[0][0]
+    assert sent["handler"] == "get_kernel_variable_changes"
+    assert sent["body"]["full"] is True
+    assert "snap_msg" in sent["body"]["added"]
+    assert sent["body"]["generation"] >= 1
@@ -0,0 +1,101 @@
+import pytest
+from ipykernel.comm import Comm
+
+from sidecar_comms.form_cells.base import Slider
+from sidecar_comms.inbound import handle_msg
+from sidecar_comms.metrics import (
+    LATENCY_BUCKETS,
+    OTHER_METRIC,
+    SIZE_BUCKETS,
+    CommMetrics,
+    Histogram,
+    comm_metrics,
+)
+from sidecar_comms.outbound import SidecarComm
+
+
+@pytest.fixture
+def metrics():
+    metrics = comm_metrics()
+    metrics.reset()
+    metrics.enabled = True
+    yield metrics
+    metrics.enabled = False
+    metrics.reset()
+
+
+class TestHistogram:
+    def test_buckets(self):
+        histogram = Histogram(buckets=(1, 10))
+        for value in (0.5, 1, 5, 100):
+            histogram.observe(value)
+        assert histogram.counts == [2, 1, 1]
+        assert histogram.count == 4
+        assert histogram.total == 106.5
+        assert histogram.min == 0.5
+        assert histogram.max == 100
+
+
+class TestCommMetrics:
+    def test_name_cap(self):
+        metrics = CommMetrics(enabled=True, max_names=2)
+        for name in ("a", "b", "c", "d"):
+            metrics.increment(name)
+        metrics.increment("a")
+        assert metrics.counters == {"a": 2, "b": 1, OTHER_METRIC: 2}
+
+    def test_disabled_by_default(self, sample_comm: Comm):
+        metrics = comm_metrics()
+        metrics.reset()
+        handle_msg({"msg": "get_kernel_variable_index"}, sample_comm)
+        assert metrics.snapshot()["counters"] == {}
+
+
+class TestInstrumentation:
+    def test_handle_msg(self, metrics: CommMetrics, sample_comm: Comm):
+        handle_msg({"msg": "get_kernel_variable_index"}, sample_comm)
+        handle_msg({"msg": "get_kernel_variable_index"}, sample_comm)
+        assert metrics.counters["inbound.get_kernel_variable_index"] == 2
+        histogram = metrics.histograms["inbound.get_kernel_variable_index"]
+        assert histogram.count == 2
+        assert histogram.buckets == LATENCY_BUCKETS
+
+    def test_handle_msg_errors(self, metrics: CommMetrics, sample_comm: Comm):
+        with pytest.raises(KeyError):
+            handle_msg({"msg": "update_form_cell", "form_cell_id": "missing"}, sample_comm)
+        assert metrics.counters["inbound.update_form_cell.errors"] == 1
+        assert metrics.histograms["inbound.update_form_cell"].count == 1
+
+    def test_outbound_send(self, metrics: CommMetrics):
+        comm = SidecarComm(target_name="metrics_test")
+        comm.send(handler="test_handler", body={"data": "x" * 2000})
+        assert metrics.counters["outbound.test_handler"] == 1
+        sizes = metrics.histograms["outbound.test_handler.bytes"]
+        assert sizes.buckets == SIZE_BUCKETS
+        assert sizes.min > 2000
+
+    def test_form_cell_sync(self, metrics: CommMetrics):
+        form_cell = Slider(settings={})
+        metrics.reset()
+        form_cell.value = 5
+        form_cell.settings.max = 20
+        assert metrics.counters["form_cell.sync"] == 2
+        assert metrics.histograms["form_cell.sync"].count == 2
+
+
+def test_get_comm_metrics_msg(metrics: CommMetrics, mocker):
+    comm = mocker.Mock()
+    handle_msg({"msg": "get_comm_metrics"}, comm)
+    body = comm.send.call_args[0][0]["body"]
+    assert body["enabled"] is True
+    assert body["counters"] == {"inbound.get_comm_metrics": 1}
+
+    handle_msg({"msg": "get_comm_metrics", "reset": True}, comm)
+    assert metrics.counters == {}
+
+
+def test_configure_comm_metrics_msg(metrics: CommMetrics, mocker):
+    comm = mocker.Mock()
+    handle_msg({"msg": "configure_comm_metrics", "enabled": False}, comm)
+    assert comm.send.call_args[0][0]["body"] == {"enabled": False}
+    assert metrics.enabled is False
@@ -0,0 +1,65 @@
+import pytest
+from pydantic import ValidationError
+
+from sidecar_comms.models import CommMessage, comm_message
+from sidecar_comms.outbound import CommManager, SidecarComm
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {},
+        {"body": {"a": 1}, "handler": "test"},
+        {"body": {}, "comm_id": "abc", "target_name": "target", "request_id": 3},
+        {"handler": "test", "request_id": "x"},
+    ],
+)
+def test_comm_message_wire_format(kwargs: dict):
+    msg = comm_message(**kwargs)
+    expected = CommMessage(**kwargs).dict()
+    assert msg == expected
+    assert list(msg) == list(expected)
+
+
+def test_comm_message_body_by_reference():
+    body = {"values": list(range(10))}
+    assert comm_message(body=body)["body"] is body
+
+
+def test_comm_message_validation(mocker):
+    # not validated by default
+    assert comm_message(body=["not", "a", "dict"])["body"] == ["not", "a", "dict"]
+    mocker.patch("sidecar_comms.models.VALIDATE_MESSAGES", True)
+    with pytest.raises(ValidationError):
+        comm_message(body=["not", "a", "dict"])
+    with pytest.raises(ValidationError):
+        comm_message(request_id=1.5)
+    assert comm_message(body={"a": 1}, request_id=1)["request_id"] == 1
+
+
+def test_sidecar_comm_send(mocker):
+    send = mocker.patch("ipykernel.comm.Comm.send")
+    comm = SidecarComm(target_name="models_test")
+    comm.send(handler="test", body={"a": 1})
+    expected = CommMessage(
+        body={"a": 1},
+        handler="test",
+        comm_id=comm.comm_id,
+        target_name="models_test",
+    )
+    assert send.call_args[1]["data"] == expected.dict()
+
+
+def test_open_comm_registers_once(mocker):
+    send = mocker.patch("ipykernel.comm.Comm.send")
+    manager = CommManager()
+    try:
+        comm = manager.open_comm("models_open_test")
+        assert manager.open_comm("models_open_test") is comm
+    finally:
+        manager.comms.pop("models_open_test", None)
+    (call,) = send.call_args_list
+    data = call[1]["data"]
+    assert data["handler"] == "register_comm_target"
+    assert data["body"] == {"target": "models_open_test"}
+    assert data["comm_id"] == comm.comm_id
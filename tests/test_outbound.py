@@ -0,0 +1,143 @@
+import asyncio
+
+import pytest
+
+from sidecar_comms.inbound import handle_msg
+from sidecar_comms.models import CommMessage
+from sidecar_comms.outbound import (
+    BATCH_HANDLER,
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_BATCH_WINDOW,
+    SidecarComm,
+    comm_manager,
+)
+from sidecar_comms.shell import get_ipython_shell
+
+
+@pytest.fixture
+def send(mocker):
+    return mocker.patch("ipykernel.comm.Comm.send")
+
+
+@pytest.fixture
+def comm(send) -> SidecarComm:
+    comm = SidecarComm(target_name="batching_test")
+    comm.enable_batching(size=10, window=60)
+    yield comm
+    comm.disable_batching()
+
+
+def sent_payloads(send) -> list:
+    return [call.kwargs["data"] for call in send.call_args_list]
+
+
+def test_send_comm_message_dict(send):
+    """Test that a CommMessage dict can still be passed as keyword arguments."""
+    comm = SidecarComm(target_name="send_test")
+    comm.send(**CommMessage(body={"a": 1}, handler="test").dict())
+    assert sent_payloads(send)[0] == {
+        "source": "sidecar_comms",
+        "body": {"a": 1},
+        "comm_id": comm.comm_id,
+        "target_name": "send_test",
+        "handler": "test",
+        "request_id": None,
+    }
+
+
+class TestOutboundBatching:
+    def test_without_loop(self, comm: SidecarComm, send):
+        """Test that messages are sent right away when there's no running event loop."""
+        comm.send(handler="test", body={"a": 1})
+        assert sent_payloads(send)[0]["handler"] == "test"
+
+    def test_flush(self, comm: SidecarComm, send):
+        async def run():
+            for i in range(3):
+                comm.send(handler="test", body={"i": i})
+            send.assert_not_called()
+            comm.flush()
+
+        asyncio.run(run())
+        (batch,) = sent_payloads(send)
+        assert batch["handler"] == BATCH_HANDLER
+        assert batch["comm_id"] == comm.comm_id
+        messages = batch["body"]["messages"]
+        assert [msg["body"]["i"] for msg in messages] == [0, 1, 2]
+        assert all(msg["target_name"] == "batching_test" for msg in messages)
+
+    def test_size_threshold(self, comm: SidecarComm, send):
+        comm.batch_size = 2
+
+        async def run():
+            for i in range(3):
+                comm.send(handler="test", body={"i": i})
+
+        asyncio.run(run())
+        (batch,) = sent_payloads(send)
+        assert len(batch["body"]["messages"]) == 2
+        # the rest is still queued
+        comm.flush()
+        assert len(sent_payloads(send)[-1]["body"]["messages"]) == 1
+
+    def test_window(self, comm: SidecarComm, send):
+        comm.batch_window = 0.01
+
+        async def run():
+            comm.send(handler="test", body={})
+            comm.send(handler="test", body={})
+            await asyncio.sleep(0.05)
+
+        asyncio.run(run())
+        (batch,) = sent_payloads(send)
+        assert len(batch["body"]["messages"]) == 2
+
+    def test_buffers_keep_order(self, comm: SidecarComm, send):
+        async def run():
+            comm.send(handler="first", body={})
+            comm.send(handler="binary", body={}, buffers=[memoryview(b"abc")])
+
+        asyncio.run(run())
+        batch, binary = send.call_args_list
+        assert batch.kwargs["data"]["body"]["messages"][0]["handler"] == "first"
+        assert binary.kwargs["data"]["handler"] == "binary"
+        assert binary.kwargs["buffers"] == [memoryview(b"abc")]
+
+    def test_post_run_cell(self, comm: SidecarComm, send):
+        async def run():
+            comm.send(handler="test", body={})
+            get_ipython_shell().events.trigger("post_run_cell", None)
+
+        asyncio.run(run())
+        assert sent_payloads(send)[0]["handler"] == BATCH_HANDLER
+
+    def test_disable_flushes(self, comm: SidecarComm, send):
+        async def run():
+            comm.send(handler="test", body={})
+            comm.disable_batching()
+            comm.send(handler="after", body={})
+
+        asyncio.run(run())
+        assert [payload["handler"] for payload in sent_payloads(send)] == [BATCH_HANDLER, "after"]
+
+
+def test_configure_outbound_batching(send, mocker):
+    manager = comm_manager()
+    try:
+        comm = manager.open_comm("batching_configure_test")
+        reply_comm = mocker.Mock()
+        handle_msg({"msg": "configure_outbound_batching", "size": 5, "window": 1}, reply_comm)
+        assert reply_comm.send.call_args[0][0]["body"] == {
+            "enabled": True,
+            "size": 5,
+            "window": 1,
+        }
+        assert comm.batching
+        assert comm.batch_size == 5
+        # comms opened later are batched too
+        assert manager.open_comm("batching_configure_later").batching
+    finally:
+        manager.configure_batching(False, size=DEFAULT_BATCH_SIZE, window=DEFAULT_BATCH_WINDOW)
+        manager.comms.pop("batching_configure_test", None)
+        manager.comms.pop("batching_configure_later", None)
+    assert not comm.batching
@@ -0,0 +1,89 @@
+import datetime
+import json
+
+from sidecar_comms.serialization import (
+    DEFAULT_MAX_ITEMS,
+    BoundedJSONSerializer,
+    is_json_safe,
+    to_json_safe,
+)
+
+
+class TestToJSONSafe:
+    def test_passthrough(self):
+        value = {"a": [1, 2.5, "three", None, True], "b": {"c": (4, 5)}}
+        assert to_json_safe(value) == {"a": [1, 2.5, "three", None, True], "b": {"c": [4, 5]}}
+
+    def test_unserializable_leaves(self):
+        """Test that unserializable leaves and keys are replaced/dropped."""
+        value = {"fn": print, "items": [1, {2, 3}, object()], ("bad", "key"): 1, 2: "ok"}
+        assert to_json_safe(value) == {"fn": None, "items": [1, None, None], 2: "ok"}
+
+    def test_placeholder(self):
+        assert to_json_safe([print], placeholder="<unserializable>") == ["<unserializable>"]
+
+    def test_allow_nan(self):
+        value = [1.5, float("nan"), float("inf")]
+        assert to_json_safe(value, allow_nan=False) == [1.5, None, None]
+        assert to_json_safe(value)[2] == float("inf")
+
+    def test_default(self):
+        value = [datetime.date(2020, 1, 1), print]
+        assert to_json_safe(value, default=str) == ["2020-01-01", str(print)]
+        # only JSON scalars are accepted from `default`
+        assert to_json_safe(value, default=lambda item: [item]) == [None, None]
+
+    def test_max_depth(self):
+        value = [[[[1]]]]
+        assert to_json_safe(value, max_depth=2) == [[None]]
+
+    def test_circular_reference(self):
+        value = {"a": 1}
+        value["self"] = value
+        assert to_json_safe(value) == {"a": 1, "self": None}
+
+    def test_max_items(self):
+        serializer = BoundedJSONSerializer(max_items=3)
+        assert serializer.serialize(list(range(10))) == [0, 1, 2]
+        assert serializer.truncated is True
+
+    def test_max_bytes(self):
+        """Test that output stops growing once the byte budget is used up."""
+        value = ["x" * 100 for _ in range(100)]
+        result = to_json_safe(value, max_bytes=1000)
+        assert len(json.dumps(result)) < 1200
+        assert result[0] == "x" * 100
+
+    def test_nbytes_estimate(self):
+        value = {"key": ["abc", 123, 4.5, None], "other": {"nested": "value"}}
+        serializer = BoundedJSONSerializer()
+        serializer.serialize(value)
+        assert abs(serializer.nbytes - len(json.dumps(value))) < 30
+
+
+class TestIsJSONSafe:
+    def test_safe(self):
+        assert is_json_safe({"a": [1, 2, (3, "4")], 5: None}) is True
+
+    def test_unsafe(self):
+        assert is_json_safe([1, 2, print]) is False
+        assert is_json_safe({1, 2}) is False
+        assert is_json_safe({("a",): 1}) is False
+
+    def test_circular_reference(self):
+        value = []
+        value.append(value)
+        assert is_json_safe(value) is False
+
+    def test_limits(self):
+        """Test that only items within the limits are checked."""
+        assert is_json_safe(list(range(10)) + [print], max_items=5) is True
+        assert is_json_safe(list(range(10)) + [print], max_items=None) is False
+        assert is_json_safe(["x" * 100, print], max_bytes=50) is True
+        assert is_json_safe(["x" * 100, print], max_bytes=None) is False
+
+    def test_default_limits(self):
+        assert is_json_safe(list(range(DEFAULT_MAX_ITEMS)) + [print]) is True
+        value = [["x" * 1000] * 10 for _ in range(DEFAULT_MAX_ITEMS)]
+        value[-1].append(print)
+        assert is_json_safe(value) is True
@@ -0,0 +1,53 @@
+import asyncio
+
+from sidecar_comms.tasks import cooperative, run_eagerly, run_sync
+
+
+def test_cooperative_yields():
+    ticks = []
+
+    async def ticker():
+        while True:
+            ticks.append(len(ticks))
+            await asyncio.sleep(0)
+
+    async def consume(interval: float) -> list:
+        task = asyncio.ensure_future(ticker())
+        await asyncio.sleep(0)
+        start = len(ticks)
+        items = [item async for item in cooperative(range(5), interval=interval)]
+        task.cancel()
+        return items, len(ticks) - start
+
+    # without yielding, nothing else gets to run while iterating
+    assert asyncio.run(consume(60)) == ([0, 1, 2, 3, 4], 0)
+    items, other = asyncio.run(consume(0))
+    assert items == [0, 1, 2, 3, 4]
+    assert other == 5
+
+
+def test_run_eagerly_sync():
+    def steps():
+        return "done"
+        yield
+
+    assert run_eagerly(steps()) == "done"
+
+
+def test_run_eagerly_async():
+    run = []
+
+    async def double(value: int) -> int:
+        return value * 2
+
+    def steps():
+        run.append("before")
+        value = yield double(2)
+        run.append("after")
+        return value + 1
+
+    result = run_eagerly(steps())
+    # everything up to the first awaitable already ran
+    assert run == ["before"]
+    assert run_sync(result) == 5
+    assert run == ["before", "after"]